@@ -88,6 +88,9 @@ def _build_argparser() -> argparse.ArgumentParser:
     p.add_argument("-e", "--extract", action="store_true", help="Perform only the extraction operation.")
     p.add_argument("-t", "--convert", action="store_true", help="Convert a tar/zip/rar/7zip file to an archive file.")
     p.add_argument("-r", "--repack", action="store_true", help="Re-concatenate files, fixing checksum errors if any.")
+    p.add_argument("-I", "--index", action="store_true", help="Build a sidecar .idx index for fast member lookup in an existing archive file (plus a .zidx seek index for gzip/zlib archives and a .cat catalog for stacked archives).")
+    p.add_argument("--include", action="append", default=None, help="Only extract members matching this pattern; may be given more than once.")
+    p.add_argument("--exclude", action="append", default=None, help="Do not extract members matching this pattern; may be given more than once.")
     p.add_argument("-S", "--filestart", type=int, default=0, help="Start reading file at.")
 
     # File manipulation options
@@ -106,6 +109,9 @@ def _build_argparser() -> argparse.ArgumentParser:
     p.add_argument("-P", "--compression", default="auto", help="Specify the compression method to use for concatenation.")
     p.add_argument("-L", "--level", default=None, help="Specify the compression level for concatenation.")
     p.add_argument("-W", "--wholefile", action="store_true", help="Whole file compression method to use for concatenation.")
+    p.add_argument("--policy", default=None, help="Learn which codec auto compression picks for each file type in this file and reuse it on later runs.")
+    p.add_argument("--toc", action="store_true", help="Write an end-of-archive table of contents for fast member lookup.")
+    p.add_argument("--durability", type=pyarchivefile.ArchiveDurability.from_spec, default=pyarchivefile.DEFAULT_DURABILITY, help="When to sync written archives and extracted files to disk: none, end, every_n_entries[:N], every_n_bytes[:N] or full. The default is end.")
 
     # Checksum and validation
     p.add_argument("-v", "--validate", action="store_true", help="Validate archive file checksums.")
@@ -113,6 +119,7 @@ def _build_argparser() -> argparse.ArgumentParser:
     p.add_argument("-s", "--skipchecksum", action="store_true", help="Skip the checksum check of files.")
     p.add_argument("-k", "--insecretkey", default=None, help="Secretkey to use for checksum input.")
     p.add_argument("-K", "--outsecretkey", default=None, help="Secretkey to use for checksum output.")
+    p.add_argument("-j", "--jobs", type=int, default=1, help="Number of threads to verify content checksums with when validating, or of processes to compress members with when creating.")
 
     # Permissions and metadata
     p.add_argument("-p", "--preserve", action="store_false", help="Do not preserve permissions and timestamps of files.")
@@ -159,9 +166,12 @@ def main(argv: Optional[list[str]] = None) -> int:
     getargs = argparser.parse_args(argv)
 
     fnamedict = _resolve_format(getargs)
+    pyarchivefile.SetArchiveDurability(getargs.durability)
+    if getargs.policy is not None:
+        pyarchivefile.SetCompressionPolicy(getargs.policy)
 
     # Determine the primary action based on user input (same order/behavior as original)
-    actions = ("create", "extract", "list", "repack", "validate")
+    actions = ("create", "extract", "list", "repack", "validate", "index")
     active_action = next((a for a in actions if getattr(getargs, a)), None)
 
     input_file = getargs.input[0]
@@ -237,6 +247,8 @@ def main(argv: Optional[list[str]] = None) -> int:
                 getargs.outsecretkey,
                 getargs.verbose,
                 False,
+                getargs.toc,
+                workers=getargs.jobs,
             )
 
     elif active_action == "repack":
@@ -379,6 +391,8 @@ def main(argv: Optional[list[str]] = None) -> int:
             False,
             getargs.verbose,
             False,
+            getargs.include,
+            getargs.exclude,
         )
 
     elif active_action == "list":
@@ -497,12 +511,31 @@ def main(argv: Optional[list[str]] = None) -> int:
             False,
             getargs.verbose,
             False,
+            getargs.jobs,
         )
         if fvalid:
             pyarchivefile.VerbosePrintOut("File is valid: \n" + str(input_file))
         else:
             pyarchivefile.VerbosePrintOut("File is invalid: \n" + str(input_file))
 
+    elif active_action == "index":
+        fidx = pyarchivefile.ArchiveFileBuildIndex(
+            input_file,
+            getargs.output,
+            "auto",
+            getargs.filestart,
+            getargs.skipchecksum,
+            fnamedict,
+            getargs.insecretkey,
+            getargs.verbose,
+        )
+        if not fidx:
+            return 1
+        # whole-file gzip/zlib archives also get a .zidx seek index
+        pyarchivefile.ArchiveFileBuildInflateIndex(input_file, None, getargs.verbose)
+        # and a .cat catalog of where each stacked archive starts
+        pyarchivefile.ArchiveFileBuildStackCatalog(input_file, None, "auto", getargs.filestart, getargs.skipchecksum, fnamedict, getargs.insecretkey, getargs.verbose)
+
     return 0
 
 
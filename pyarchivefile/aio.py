@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+'''
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the Revised BSD License.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    Revised BSD License for more details.
+
+    Copyright 2018-2026 Cool Dude 2k - http://idb.berlios.de/
+    Copyright 2018-2026 Game Maker 2k - http://intdb.sourceforge.net/
+    Copyright 2018-2026 Kazuki Przyborowski - https://github.com/KazukiPrzyborowski
+
+    $FileInfo: aio.py - Last Update: 3/14/2026 Ver. 0.30.14 RC 1 - Author: cooldude2k $
+'''
+
+# asyncio front end.  Blocking file I/O, hashing and (de)compression run on
+# one bounded thread pool shared by the whole process, so many concurrent
+# archive requests never need a thread each.  Entry iteration hands control
+# back to the event loop between batches of entries.
+
+import os
+import asyncio
+import functools
+import threading
+import concurrent.futures
+
+from . import pyarchivefile
+
+DEFAULT_AIO_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+# entries pulled per executor hop when only headers are read
+DEFAULT_AIO_LIST_BATCH = 64
+
+_executor = None
+_executor_workers = DEFAULT_AIO_WORKERS
+_executor_lock = threading.Lock()
+
+
+def GetExecutor():
+    global _executor
+    with _executor_lock:
+        if(_executor is None):
+            _executor = concurrent.futures.ThreadPoolExecutor(max_workers=_executor_workers, thread_name_prefix=pyarchivefile.__program_name__ + "-aio")
+        return _executor
+
+
+def SetExecutor(executor=None, maxworkers=None):
+    """
+    Use executor for all blocking work, or a new pool of maxworkers
+    threads when executor is None.  The previous pool is shut down
+    without waiting if this module created it.
+    """
+    global _executor, _executor_workers
+    with _executor_lock:
+        oldexecutor = _executor
+        if(maxworkers is not None):
+            _executor_workers = maxworkers
+        _executor = executor
+    if(oldexecutor is not None and oldexecutor is not executor):
+        oldexecutor.shutdown(wait=False)
+    return GetExecutor()
+
+
+def ShutdownExecutor(wait=True):
+    global _executor
+    with _executor_lock:
+        oldexecutor = _executor
+        _executor = None
+    if(oldexecutor is not None):
+        oldexecutor.shutdown(wait=wait)
+    return True
+
+
+async def RunInExecutor(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(GetExecutor(), functools.partial(func, *args, **kwargs))
+
+
+def _offload(func):
+    @functools.wraps(func)
+    async def _offloaded(*args, **kwargs):
+        return await RunInExecutor(func, *args, **kwargs)
+    return _offloaded
+
+
+def _next_entries(archiveiter, batchsize):
+    entries = []
+    for curentry in archiveiter:
+        entries.append(curentry)
+        if(len(entries) >= batchsize):
+            break
+    return entries
+
+
+class AsyncArchiveFileIterator(object):
+    """
+    Async iterator over the entries of every (stacked) archive in infile,
+    see pyarchivefile.IterArchiveFile.  Entries are pulled on the executor
+    batchsize at a time.  Their 'fcontents' share the archive file object,
+    so read them with read() rather than directly from another task.
+    """
+
+    def __init__(self, infile, fmttype="auto", filestart=0, seekstart=0, seekend=0, listonly=False, uncompress=True, skipchecksum=False, formatspecs=pyarchivefile.__file_format_multi_dict__, saltkey=None, archivelist=None, namefilter=None, batchsize=None):
+        if(batchsize is None):
+            batchsize = DEFAULT_AIO_LIST_BATCH if listonly else 1
+        self.batchsize = max(1, batchsize)
+        self._archiveiter = pyarchivefile.IterArchiveFile(infile, fmttype, filestart, seekstart, seekend, listonly, uncompress, skipchecksum, formatspecs, saltkey, archivelist, True, namefilter)
+        self._pending = []
+        self._done = False
+        self._lock = asyncio.Lock()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        # the batch is fetched and taken from under one lock, so tasks
+        # sharing the iterator never drop or repeat entries
+        async with self._lock:
+            if(not self._pending and not self._done):
+                nextentries = await RunInExecutor(_next_entries, self._archiveiter, self.batchsize)
+                if(len(nextentries) < self.batchsize):
+                    self._done = True
+                self._pending.extend(nextentries)
+            if(self._pending):
+                return self._pending.pop(0)
+        await self.aclose()
+        raise StopAsyncIteration
+
+    async def read(self, entry, size=-1):
+        fcontents = entry.get('fcontents')
+        if(fcontents is None):
+            return b""
+        if(isinstance(fcontents, (bytes, bytearray, memoryview))):
+            return bytes(fcontents)
+        async with self._lock:
+            return await RunInExecutor(fcontents.read, size)
+
+    async def aclose(self):
+        self._done = True
+        self._pending = []
+        if(self._archiveiter is not None):
+            archiveiter = self._archiveiter
+            self._archiveiter = None
+            async with self._lock:
+                await RunInExecutor(archiveiter.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.aclose()
+        return False
+
+
+def IterArchiveFile(infile, fmttype="auto", filestart=0, seekstart=0, seekend=0, listonly=False, uncompress=True, skipchecksum=False, formatspecs=pyarchivefile.__file_format_multi_dict__, saltkey=None, archivelist=None, namefilter=None, batchsize=None):
+    return AsyncArchiveFileIterator(infile, fmttype, filestart, seekstart, seekend, listonly, uncompress, skipchecksum, formatspecs, saltkey, archivelist, namefilter, batchsize)
+
+
+async def ReadEntryContents(entry, size=-1):
+    fcontents = entry.get('fcontents')
+    if(fcontents is None):
+        return b""
+    if(isinstance(fcontents, (bytes, bytearray, memoryview))):
+        return bytes(fcontents)
+    return await RunInExecutor(fcontents.read, size)
+
+
+# whole-call wrappers, same arguments as the blocking functions
+ReadInFileWithContentToArray = _offload(pyarchivefile.ReadInFileWithContentToArray)
+ArchiveFileToArray = _offload(pyarchivefile.ArchiveFileToArray)
+ArchiveFileOpenStackMember = _offload(pyarchivefile.ArchiveFileOpenStackMember)
+ArchiveFileValidate = _offload(pyarchivefile.ArchiveFileValidate)
+AppendFilesWithContentToOutFile = _offload(pyarchivefile.AppendFilesWithContentToOutFile)
+AppendFilesWithContentToStackedOutFile = _offload(pyarchivefile.AppendFilesWithContentToStackedOutFile)
+PackArchiveFile = _offload(pyarchivefile.PackArchiveFile)
+RePackArchiveFile = _offload(pyarchivefile.RePackArchiveFile)
+UnPackArchiveFile = _offload(pyarchivefile.UnPackArchiveFile)
+ExtractMember = _offload(pyarchivefile.ExtractMember)
+ArchiveFileOpenMember = _offload(pyarchivefile.ArchiveFileOpenMember)
@@ -25,19 +25,28 @@ import time
 import hmac
 import json
 import stat
+import mmap
+import math
+import marshal
 import atexit
 import shutil
 import base64
+import bisect
+import heapq
+import array
 import struct
 import logging
 import hashlib
 import inspect
 import platform
 import datetime
+import fnmatch
 import binascii
-import resource
 import tempfile
 import configparser
+import threading
+import collections
+import concurrent.futures
 from io import open, StringIO, BytesIO
 from decimal import Decimal, ROUND_HALF_UP
 __enable_pywwwget__ = True
@@ -109,6 +118,14 @@ try:
 except (ImportError, OSError):
     pass
 
+# NumPy export of columnar listings
+numpy_support = False
+try:
+    import numpy
+    numpy_support = True
+except (ImportError, OSError):
+    pass
+
 # TAR file checking
 try:
     from safetar import is_tarfile
@@ -572,6 +589,8 @@ __use_spooldir__ = tempfile.gettempdir()
 __use_new_style__ = True
 __use_advanced_list__ = True
 __use_alt_inode__ = False
+__use_toc__ = False
+__use_mmap__ = False
 BYTES_PER_KiB = 1024
 BYTES_PER_MiB = 1024 * BYTES_PER_KiB
 # Spool: not tiny, but won’t blow up RAM if many are in use
@@ -580,6 +599,39 @@ __spoolfile_size__ = DEFAULT_SPOOL_MAX
 # Buffer: bigger than stdlib default (16 KiB), but still modest
 DEFAULT_BUFFER_MAX = 256 * BYTES_PER_KiB   # 256 KiB copy buffer
 __filebuff_size__ = DEFAULT_BUFFER_MAX
+# Header read-ahead: one read usually covers the size prefix and the header
+DEFAULT_HEADER_READAHEAD = 1 * BYTES_PER_KiB
+__header_readahead_size__ = DEFAULT_HEADER_READAHEAD
+# Member checkpoints: zlib/gzip members get a restart point every 1 MiB
+DEFAULT_MEMBER_CHECKPOINT = 1 * BYTES_PER_MiB
+__member_checkpoint_size__ = DEFAULT_MEMBER_CHECKPOINT
+# Whole-file gzip/zlib reads keep an inflater copy every 4 MiB for seeking
+DEFAULT_INFLATE_SPACING = 4 * BYTES_PER_MiB
+__inflate_access_spacing__ = DEFAULT_INFLATE_SPACING
+# zstd output is written as independent frames of this many input bytes
+# plus a seek table; 0 writes one frame as before
+DEFAULT_ZSTD_FRAME_SIZE = 4 * BYTES_PER_MiB
+__zstd_frame_size__ = DEFAULT_ZSTD_FRAME_SIZE
+# Streaming writer: each member keeps at most this much content in memory
+# while it is read, compressed and written; the rest spills to disk
+DEFAULT_WRITE_INFLIGHT = 16 * BYTES_PER_MiB
+__write_inflight_size__ = DEFAULT_WRITE_INFLIGHT
+# Durability: writers sync once per archive unless told otherwise, see
+# ArchiveDurability for the other modes
+DEFAULT_DURABILITY = "end"
+DEFAULT_DURABILITY_ENTRIES = 1000
+DEFAULT_DURABILITY_BYTES = 64 * BYTES_PER_MiB
+__durability__ = DEFAULT_DURABILITY
+# auto compression: codecs are tried on up to three samples of this many
+# bytes from the start, middle and end of a member, not the whole of it,
+# and samples above this many bits per byte of entropy are stored as is
+DEFAULT_AUTO_SAMPLE_SIZE = 64 * BYTES_PER_KiB
+__auto_sample_size__ = DEFAULT_AUTO_SAMPLE_SIZE
+DEFAULT_AUTO_MAX_ENTROPY = 7.9
+__auto_max_entropy__ = DEFAULT_AUTO_MAX_ENTROPY
+# a CompressionPolicy re-runs the sampled trial for every 64th member of
+# a file type it has already learned
+DEFAULT_POLICY_EXPLORE = 64
 __program_name__ = "Py"+__file_format_default__
 __use_env_file__ = True
 __use_ini_file__ = True
@@ -1203,11 +1255,127 @@ def CheckSumSupport(checkfor, guaranteed=True):
     else:
         return False
 
+# Opt-in instrumentation.  While no profiler is registered every hook is
+# a single "is None" test; see SetArchiveProfiler.
+_profiler = None
+
+
+class ArchiveProfiler(object):
+    """
+    Collects time and bytes per phase ('header', 'json', 'checksum',
+    'decompress', 'copy', 'fsync') and per operation ('read', 'write',
+    'validate', 'unpack'), and keeps the topn slowest entries.  Register
+    it with SetArchiveProfiler or use it as a context manager.
+    """
+    PHASES = ('header', 'json', 'checksum', 'decompress', 'copy', 'fsync')
+
+    def __init__(self, topn=10):
+        self.topn = topn
+        self._lock = threading.Lock()
+        self._previous = []
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.phases = {}
+            self.operations = {}
+            self._slowest = []
+            self._counter = 0
+
+    def add(self, phase, seconds, nbytes=0):
+        with self._lock:
+            curphase = self.phases.get(phase)
+            if(curphase is None):
+                curphase = self.phases[phase] = [0, 0.0, 0]
+            curphase[0] += 1
+            curphase[1] += seconds
+            curphase[2] += nbytes
+
+    def entry(self, operation, fname, seconds, nbytes=0):
+        with self._lock:
+            curop = self.operations.get(operation)
+            if(curop is None):
+                curop = self.operations[operation] = [0, 0.0, 0]
+            curop[0] += 1
+            curop[1] += seconds
+            curop[2] += nbytes
+            if(self.topn > 0):
+                # min-heap of the slowest entries; the counter keeps ties
+                # from comparing names
+                self._counter += 1
+                curitem = (seconds, self._counter, operation, fname, nbytes)
+                if(len(self._slowest) < self.topn):
+                    heapq.heappush(self._slowest, curitem)
+                elif(seconds > self._slowest[0][0]):
+                    heapq.heapreplace(self._slowest, curitem)
+
+    def slowest(self, operation=None):
+        with self._lock:
+            curitems = sorted(self._slowest, reverse=True)
+        return [{'operation': curitem[2], 'fname': curitem[3], 'seconds': curitem[0], 'bytes': curitem[4]}
+                for curitem in curitems if operation is None or curitem[2] == operation]
+
+    def report(self):
+        with self._lock:
+            phases = dict((phase, {'count': curphase[0], 'seconds': curphase[1], 'bytes': curphase[2]})
+                          for phase, curphase in self.phases.items())
+            operations = dict((operation, {'count': curop[0], 'seconds': curop[1], 'bytes': curop[2]})
+                              for operation, curop in self.operations.items())
+        return {'phases': phases, 'operations': operations, 'slowest': self.slowest()}
+
+    def format_report(self):
+        outreport = self.report()
+        outlines = ["%-12s %10s %12s %14s %12s" % ("phase", "count", "seconds", "bytes", "MiB/s")]
+        for sectionname in ('phases', 'operations'):
+            for name, curstats in sorted(outreport[sectionname].items(), key=lambda item: -item[1]['seconds']):
+                rate = 0.0
+                if(curstats['seconds'] > 0):
+                    rate = curstats['bytes'] / curstats['seconds'] / BYTES_PER_MiB
+                outlines.append("%-12s %10d %12.6f %14d %12.2f" % (name, curstats['count'], curstats['seconds'], curstats['bytes'], rate))
+            if(sectionname == 'phases'):
+                outlines.append("%-12s %10s %12s %14s %12s" % ("operation", "count", "seconds", "bytes", "MiB/s"))
+        if(outreport['slowest']):
+            outlines.append("slowest entries:")
+            for curitem in outreport['slowest']:
+                outlines.append("  %-8s %12.6f %14d  %s" % (curitem['operation'], curitem['seconds'], curitem['bytes'], curitem['fname']))
+        return "\n".join(outlines)
+
+    def __enter__(self):
+        self._previous.append(SetArchiveProfiler(self))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        SetArchiveProfiler(self._previous.pop())
+        return False
+
+
+def SetArchiveProfiler(profiler=None):
+    """Register profiler for all reads, writes, validations and unpacks
+    (None turns profiling off).  Returns the previous profiler."""
+    global _profiler
+    oldprofiler = _profiler
+    _profiler = profiler
+    return oldprofiler
+
+
+def GetArchiveProfiler():
+    return _profiler
+
+
 def GetHeaderChecksum(inlist=None, checksumtype="md5", encodedata=True, formatspecs=__file_format_dict__, saltkey=None):
     """
     Serialize header fields (list/tuple => joined with delimiter + trailing delimiter;
     or a single field) and compute the requested checksum. Returns lowercase hex.
     """
+    profiler = _profiler
+    if(profiler is None):
+        return _get_header_checksum(inlist, checksumtype, encodedata, formatspecs, saltkey)
+    pstart = time.perf_counter()
+    outchecksum = _get_header_checksum(inlist, checksumtype, encodedata, formatspecs, saltkey)
+    profiler.add('checksum', time.perf_counter() - pstart, sum(len(field) for field in (inlist or [])))
+    return outchecksum
+
+def _get_header_checksum(inlist=None, checksumtype="md5", encodedata=True, formatspecs=__file_format_dict__, saltkey=None):
     algo_key = (checksumtype or "md5").lower()
 
     delim = formatspecs.get('format_delimiter', u"\0")
@@ -1245,6 +1413,27 @@ def GetFileChecksum(inbytes, checksumtype="md5", encodedata=True, formatspecs=__
       - CRC algos (crc16_ansi/ccitt/x25/kermit, crc64_iso/ecma): streamed via CRCContext for file-like.
       - Falls back to one-shot for non-file-like inputs.
     """
+    profiler = _profiler
+    if(profiler is None):
+        return _get_file_checksum(inbytes, checksumtype, encodedata, formatspecs, saltkey)
+    pstart = time.perf_counter()
+    if(hasattr(inbytes, "read")):
+        try:
+            nbytes = inbytes.tell()
+        except (io.UnsupportedOperation, AttributeError, OSError):
+            nbytes = None
+    else:
+        nbytes = len(inbytes)
+    outchecksum = _get_file_checksum(inbytes, checksumtype, encodedata, formatspecs, saltkey)
+    if(hasattr(inbytes, "read")):
+        try:
+            nbytes = inbytes.tell() - nbytes
+        except (io.UnsupportedOperation, AttributeError, OSError, TypeError):
+            nbytes = 0
+    profiler.add('checksum', time.perf_counter() - pstart, nbytes)
+    return outchecksum
+
+def _get_file_checksum(inbytes, checksumtype="md5", encodedata=True, formatspecs=__file_format_dict__, saltkey=None):
     algo_key = (checksumtype or "md5").lower()
     saltkeyval = None
     if(hasattr(saltkey, "read")):
@@ -1365,7 +1554,48 @@ def _read_exact(fp, n):
     return data
 
 
-def ReadFileHeaderDataBySize(fp, delimiter="\x00", encoding="utf-8", errors="strict"):
+_seek_directive_re = re.compile("^([+-]?)([0-9]+)")
+_seek_directive_cache = {}
+_header_size_end_re = re.compile(b"[^\x20-\x7e]")
+
+
+def _parse_seek_directive(seekdirective):
+    # "+N"/"-N" seek relative to the current position, "N" is absolute;
+    # archives reuse a handful of directives so parsed ones are cached
+    seekparsed = _seek_directive_cache.get(seekdirective)
+    if(seekparsed is not None):
+        return seekparsed
+    seekmatch = _seek_directive_re.match(seekdirective)
+    if(not seekmatch):
+        return None
+    if(seekmatch.group(1) == "+"):
+        seekparsed = (int(seekmatch.group(2)), 1)
+    elif(seekmatch.group(1) == "-"):
+        seekparsed = (-int(seekmatch.group(2)), 1)
+    else:
+        seekparsed = (int(seekmatch.group(2)), 0)
+    if(len(_seek_directive_cache) < 1024):
+        _seek_directive_cache[seekdirective] = seekparsed
+    return seekparsed
+
+
+def _seek_by_directive(fp, seekdirective):
+    seekparsed = _parse_seek_directive(seekdirective)
+    if(seekparsed is None):
+        return False
+    fp.seek(seekparsed[0], seekparsed[1])
+    return True
+
+
+def _find_header_size_end(block):
+    # The size prefix is printable ASCII; return where it stops or -1
+    sizeend = _header_size_end_re.search(block)
+    if(sizeend is None):
+        return -1
+    return sizeend.start()
+
+
+def ReadFileHeaderDataBySize(fp, delimiter="\x00", encoding="utf-8", errors="strict", readahead=__header_readahead_size__):
     # Normalize delimiter to bytes for reliable multi-byte/multi-char matching
     if isinstance(delimiter, str):
         delimiter_b = delimiter.encode(encoding)
@@ -1377,33 +1607,43 @@ def ReadFileHeaderDataBySize(fp, delimiter="\x00", encoding="utf-8", errors="str
     if not delimiter_b:
         raise ValueError("delimiter must not be empty")
 
-    # Read the initial hex field as printable ASCII-ish bytes (same intent as .isprintable()).
-    # Hex digits are ASCII, so this is appropriate and avoids per-byte decoding.
-    numhex_bytes = bytearray()
-    while True:
-        b = fp.read(1)
-        if not b:
-            # EOF before terminator
+    # Read ahead a block that normally holds the hex size prefix, the
+    # delimiter and the whole header, instead of reading the prefix one
+    # byte at a time.  Any surplus is handed back with a relative seek.
+    block = fp.read(readahead)
+    numhexend = _find_header_size_end(block)
+    while numhexend < 0 and len(block) > 0 and len(block) % readahead == 0:
+        moreblock = fp.read(readahead)
+        if not moreblock:
             break
-        c = b[0]
-        if 32 <= c <= 126:  # printable ASCII range
-            numhex_bytes.append(c)
-            continue
-
-        # Hit the terminator (likely the delimiter); rewind so delimiter read aligns
-        fp.seek(-1, 1)
-        break
+        block = block + moreblock
+        numhexend = _find_header_size_end(block)
+    if numhexend < 0:
+        # EOF before terminator
+        numhexend = len(block)
 
-    numhex = numhex_bytes.decode(encoding, errors)
+    numhex = block[:numhexend].decode(encoding, errors)
     numdec = int(numhex, 16)
 
     # Consume exactly one delimiter (supports multi-byte delimiters)
-    got = fp.read(len(delimiter_b))
+    delimend = numhexend + len(delimiter_b)
+    headerend = delimend + numdec
+    if len(block) < delimend:
+        block = block + fp.read(delimend - len(block))
+    got = block[numhexend:delimend]
     if got != delimiter_b:
+        if len(block) > delimend:
+            fp.seek(delimend - len(block), 1)
         raise ValueError("Delimiter mismatch: expected %r, got %r" % (delimiter_b, got))
 
     # Read header payload by size
-    headerdata = fp.read(numdec).decode(encoding, errors)
+    if len(block) < headerend:
+        headerdata = block[delimend:] + fp.read(headerend - len(block))
+    else:
+        headerdata = block[delimend:headerend]
+        if len(block) > headerend:
+            fp.seek(headerend - len(block), 1)
+    headerdata = headerdata.decode(encoding, errors)
 
     # Split using delimiter as text (matches original behavior)
     headerdatasplit = headerdata.split(delimiter_t)
@@ -2164,7 +2404,11 @@ _SI_UNITS  = (" B", " kB",  " MB",  " GB",  " TB",  " PB",  " EB",  " ZB",  " YB
 
 def _format_readable(value, suffix, precision):
     # Keep behavior close to original: format with width 3 and precision, then clean up
-    s = ("%3." + str(precision) + "f%s") % (value, suffix)
+    s = ("%3." + str(precision) + "f") % value
+    if "." in s:
+        # Same result as the regex cleanup below without its per-call cost
+        return s.rstrip("0").rstrip(".") + suffix
+    s = s + suffix
     s = _RE_ZERO_SPACE_UNIT.sub(r" \2", s)
     s = _RE_DOT_SPACE_UNIT.sub(r" \1", s)
     return s
@@ -2823,6 +3067,283 @@ class SharedMemoryFile(object):
         return False
 
 
+# ---------- Seekable inflate with access points ----------
+# Sidecar (.zidx) for whole-file zlib/gzip archives: the compressed file's
+# size and mtime, the uncompressed size, and the (uncompressed, compressed)
+# offset of every member start.
+ZIDX_MAGIC = b"PYARCZIX"
+ZIDX_VERSION = 1
+# magic, version, reserved, compressed size, compressed mtime_ns,
+# uncompressed size, number of member records
+ZIDX_HEADER_STRUCT = struct.Struct("<8sHHQqQQ")
+ZIDX_RECORD_STRUCT = struct.Struct("<QQ")
+
+
+class _InflateSeekReader(io.RawIOBase):
+    """
+    Lazily inflated, seekable view of a (multi-member) zlib or gzip stream.
+    Access points are recorded while reading forward: every member start,
+    plus a copy of the inflater every `spacing` output bytes.  seek()
+    resumes from the nearest access point at or before the target rather
+    than inflating again from byte zero.  Inflater copies cannot be saved,
+    as CPython's zlib has no inflatePrime(), so only member starts and the
+    total size are kept in a .zidx sidecar.
+    """
+
+    def __init__(self, fileobj, wbits, headercheck, tolerant_read=False, scan_bytes=(64 << 10), spacing=None):
+        super().__init__()
+        self._file = fileobj
+        self._wbits = wbits
+        # gzip streams may be padded with NULs after the last member
+        self._gzip = 24 < wbits < 32
+        self._headercheck = headercheck
+        self._tolerant = tolerant_read
+        self._scanbytes = scan_bytes
+        self._scanned = 0
+        self._spacing = spacing if spacing else __inflate_access_spacing__
+        # (uoffset, coffset, inflater copy or None for a member start)
+        self._points = []
+        self._pointoffsets = []
+        self.size = None
+        self._restore((0, 0, None))
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def _restore(self, point):
+        self._upos = point[0]
+        self._cpos = point[1]
+        self._d = point[2].copy() if point[2] is not None else None
+        self._cbuf = b""
+        self._out = b""
+        self._outoff = 0
+        self._pos = point[0]
+        self._eof = False
+        self._aftermember = point[1] > 0
+
+    def _add_point(self, inflater):
+        if(self._points and self._upos <= self._points[-1][0]):
+            return
+        self._points.append((self._upos, self._cpos, inflater.copy() if inflater is not None else None))
+        self._pointoffsets.append(self._upos)
+
+    def _nearest_point(self, target):
+        i = bisect.bisect_right(self._pointoffsets, target) - 1
+        if(i < 0):
+            return (0, 0, None)
+        return self._points[i]
+
+    def _end_of_members(self):
+        self._cbuf = b""
+        self._eof = True
+        self.size = self._upos
+        return False
+
+    def _fill_member_header(self):
+        while(True):
+            if(self._gzip and self._aftermember):
+                # skip trailing zero padding like gzip._GzipReader
+                cbufdata = self._cbuf.lstrip(b"\x00")
+                self._cpos += len(self._cbuf) - len(cbufdata)
+                self._cbuf = cbufdata
+            if(len(self._cbuf) >= 2):
+                break
+            self._file.seek(self._cpos + len(self._cbuf), 0)
+            moredata = self._file.read(__filebuff_size__)
+            if(not moredata):
+                break
+            self._cbuf = self._cbuf + moredata
+        if(len(self._cbuf) >= 2 and self._headercheck(self._cbuf)):
+            return True
+        if(self._aftermember and (not self._cbuf or not self._gzip)):
+            # nothing but padding left, or data after the final zlib
+            # member, which zlib.decompress ignores as well
+            return self._end_of_members()
+        if(self._tolerant and self._scanned < self._scanbytes):
+            self._cbuf = self._cbuf[1:]
+            self._cpos += 1
+            self._scanned += 1
+            return False
+        raise ValueError("Invalid compressed member header near byte offset %d" % self._cpos)
+
+    def _inflate_some(self):
+        if(not self._cbuf):
+            self._file.seek(self._cpos, 0)
+            self._cbuf = self._file.read(__filebuff_size__)
+            if(not self._cbuf):
+                if(self._d is not None):
+                    raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+                self._eof = True
+                self.size = self._upos
+                return b""
+        if(self._d is None):
+            if(not self._fill_member_header()):
+                return b""
+            self._add_point(None)
+            self._d = zlib.decompressobj(self._wbits)
+        cbufsize = len(self._cbuf)
+        try:
+            data = self._d.decompress(self._cbuf, __filebuff_size__)
+        except zlib.error as e:
+            raise ValueError("Decompression error near offset %d: %s" % (self._cpos, e))
+        if(self._d.eof):
+            self._cbuf = self._d.unused_data
+            self._d = None
+            self._aftermember = True
+        else:
+            self._cbuf = self._d.unconsumed_tail
+        self._cpos += cbufsize - len(self._cbuf)
+        self._upos += len(data)
+        if(self._d is not None and self._upos >= self._pointoffsets[-1] + self._spacing):
+            self._add_point(self._d)
+        return data
+
+    def readinto(self, b):
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        while(self._outoff >= len(self._out)):
+            if(self._eof):
+                return 0
+            self._out = self._inflate_some()
+            self._outoff = 0
+        n = min(len(b), len(self._out) - self._outoff)
+        b[:n] = self._out[self._outoff:self._outoff + n]
+        self._outoff += n
+        self._pos += n
+        return n
+
+    def _skip_to(self, target):
+        if(target is not None and self.size is not None and target >= self.size):
+            # nothing left to inflate, e.g. SEEK_END with a size from .zidx
+            self._upos = self._pos = self.size
+            self._out = b""
+            self._outoff = 0
+            self._d = None
+            self._eof = True
+            return
+        if(target is not None):
+            point = self._nearest_point(target)
+            if(target < self._pos or point[0] > self._upos):
+                self._restore(point)
+            avail = len(self._out) - self._outoff
+            if(target - self._pos <= avail):
+                self._outoff += target - self._pos
+                self._pos = target
+                return
+            self._pos += avail
+            self._out = b""
+            self._outoff = 0
+        while((target is None or self._pos < target) and not self._eof):
+            data = self._inflate_some()
+            if(target is not None and self._pos + len(data) > target):
+                self._out = data
+                self._outoff = target - self._pos
+                self._pos = target
+                return
+            self._pos += len(data)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        if whence == os.SEEK_SET:
+            target = int(offset)
+        elif whence == os.SEEK_CUR:
+            target = self._pos + int(offset)
+        elif whence == os.SEEK_END:
+            if(self.size is None):
+                self._skip_to(None)
+            target = self.size + int(offset)
+        else:
+            raise ValueError("invalid whence (%r)" % (whence,))
+        if target < 0:
+            raise ValueError("negative seek position %r" % (target,))
+        self._skip_to(target)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        self._points = []
+        self._pointoffsets = []
+        super().close()
+
+    def member_points(self):
+        return [(x[0], x[1]) for x in self._points if x[2] is None]
+
+    def load_member_points(self, memberpoints, size=None):
+        if(self._points or self._upos != 0):
+            return False
+        for uoffset, coffset in memberpoints:
+            self._points.append((uoffset, coffset, None))
+            self._pointoffsets.append(uoffset)
+        self.size = size
+        return True
+
+
+def _open_inflate_reader(fileobj, wbits, headercheck, tolerant_read=False, scan_bytes=(64 << 10), file_path=None):
+    rawreader = _InflateSeekReader(fileobj, wbits, headercheck, tolerant_read, scan_bytes)
+    # only trust a sidecar for real files, sections of an archive share its name
+    if(file_path is not None or isinstance(fileobj, (io.BufferedReader, io.FileIO))):
+        zidxdata = ReadInflateIndexData(fileobj)
+        if(zidxdata):
+            rawreader.load_member_points(zidxdata[1], zidxdata[0])
+    return io.BufferedReader(rawreader, buffer_size=__filebuff_size__)
+
+
+def ReadInflateIndexData(fp, zidxfile=None):
+    if(zidxfile is None):
+        zidxfile = GetFileIndexPath(fp, ".zidx")
+    if(zidxfile is None or not os.path.isfile(zidxfile)):
+        return False
+    with open(zidxfile, "rb") as zidxfp:
+        zidxdata = zidxfp.read()
+    if(len(zidxdata) < ZIDX_HEADER_STRUCT.size):
+        return False
+    zidxheader = ZIDX_HEADER_STRUCT.unpack_from(zidxdata, 0)
+    if(zidxheader[0] != ZIDX_MAGIC or zidxheader[1] != ZIDX_VERSION):
+        return False
+    if((zidxheader[3], zidxheader[4]) != _archive_fingerprint(fp)):
+        return False
+    recsize = zidxheader[6] * ZIDX_RECORD_STRUCT.size
+    if(len(zidxdata) < ZIDX_HEADER_STRUCT.size + recsize):
+        return False
+    memberpoints = list(ZIDX_RECORD_STRUCT.iter_unpack(zidxdata[ZIDX_HEADER_STRUCT.size:ZIDX_HEADER_STRUCT.size + recsize]))
+    return (zidxheader[5], memberpoints)
+
+
+def ArchiveFileBuildInflateIndex(infile, outfile=None, verbose=False):
+    """Scan a whole-file gzip/zlib archive once and write its .zidx sidecar."""
+    if(hasattr(infile, "read") or not os.path.isfile(infile)):
+        return False
+    infile = RemoveWindowsPath(infile)
+    compresscheck = CheckCompressionType(infile, __file_format_multi_dict__, 0, True)
+    if(compresscheck == "gzip"):
+        wbits, headercheck = (31, lambda buf: buf[0:2] == GzipFile.GZIP_MAGIC)
+    elif(compresscheck == "zlib"):
+        wbits, headercheck = (zlib.MAX_WBITS, lambda buf: _is_valid_zlib_header(buf[0], buf[1]) and not buf[1] & 0x20)
+    else:
+        return False
+    if(outfile is None):
+        outfile = GetFileIndexPath(infile, ".zidx")
+    with open(infile, "rb") as fp:
+        rawreader = _InflateSeekReader(fp, wbits, headercheck)
+        try:
+            rawreader.seek(0, os.SEEK_END)
+            memberpoints = rawreader.member_points()
+            fsize, fmtime = _archive_fingerprint(fp)
+            zidxout = ZIDX_HEADER_STRUCT.pack(ZIDX_MAGIC, ZIDX_VERSION, 0, fsize, fmtime, rawreader.size, len(memberpoints)) + b"".join(ZIDX_RECORD_STRUCT.pack(*x) for x in memberpoints)
+        finally:
+            rawreader.close()
+    if(verbose):
+        VerbosePrintOut("%s: %d member(s), %d bytes" % (infile, len(memberpoints), rawreader.size))
+    _atomic_write(outfile, zidxout)
+    return True
+
+
 # ---------- ZlibFile ----------
 class ZlibFile(object):
     """
@@ -2859,7 +3380,7 @@ class ZlibFile(object):
 
         self._compressor = None
         self._write_buf = bytearray()
-        self._spool = None
+        self._inflated = None
         self._text_reader = None
         self._position = 0
         self.closed = False
@@ -2890,7 +3411,7 @@ class ZlibFile(object):
         elif "r" in internal_mode:
             if self.wbits <= 0:
                 raise ValueError("wbits must be > 0 for zlib wrapper")
-            self._load_all_members_spooled()
+            self._open_members_seekable()
 
         else:
             raise ValueError("Unsupported mode: %r" % (mode,))
@@ -2906,85 +3427,25 @@ class ZlibFile(object):
         return any(ch in self.mode for ch in ("w", "a", "x"))
 
     def seekable(self):
-        return True if self._spool is not None else bool(getattr(self.file, "seek", None))
+        return True if self._inflated is not None else bool(getattr(self.file, "seek", None))
 
     def _normalize_newlines_for_write(self, s):
         nl = self.newline if self.newline is not None else "\n"
         return s.replace("\r\n", "\n").replace("\r", "\n").replace("\n", nl)
 
     def _reader(self):
-        return self._text_reader if self._text_mode else self._spool
-
-    def _load_all_members_spooled(self):
-        try:
-            self.file.seek(0)
-        except Exception:
-            pass
-
-        self._spool = tempfile.SpooledTemporaryFile(max_size=self.spool_threshold)
-
-        pending = b""
-        d = None
-        scanned_leading = 0
-        absolute_offset = 0
-
-        while True:
-            data = self.file.read(__filebuff_size__)
-            if not data:
-                if d is not None:
-                    self._spool.write(d.flush())
-                break
-
-            buf = pending + data
-            absolute_offset += len(data)
+        return self._text_reader if self._text_mode else self._inflated
 
-            while True:
-                if d is None:
-                    if len(buf) < 2:
-                        pending = buf
-                        break
-
-                    cmf = buf[0]
-                    flg = buf[1]
-
-                    if not _is_valid_zlib_header(cmf, flg):
-                        if self.tolerant_read and scanned_leading < self.scan_bytes:
-                            buf = buf[1:]
-                            scanned_leading += 1
-                            if len(buf) < 2:
-                                pending = buf
-                                break
-                            continue
-                        start_off = absolute_offset - len(buf)
-                        raise ValueError("Invalid zlib header near byte offset %d" % start_off)
-
-                    if (flg & 0x20) != 0:
-                        start_off = absolute_offset - len(buf)
-                        raise ValueError("Preset dictionary (FDICT) not supported (offset %d)" % start_off)
-
-                    d = zlib.decompressobj(self.wbits)
-
-                out = d.decompress(buf)
-                if out:
-                    self._spool.write(out)
-
-                if d.unused_data:
-                    self._spool.write(d.flush())
-                    buf = d.unused_data
-                    d = None
-                    if not buf:
-                        break
-                    continue
-
-                pending = b""
-                break
-
-        self._spool.seek(0)
+    def _open_members_seekable(self):
+        self._inflated = _open_inflate_reader(
+            self.file, self.wbits,
+            lambda buf: _is_valid_zlib_header(buf[0], buf[1]) and not buf[1] & 0x20,
+            self.tolerant_read, self.scan_bytes, self.file_path)
 
         if self._text_mode:
             enc = self.encoding or "utf-8"
             errs = self.errors or "strict"
-            self._text_reader = io.TextIOWrapper(self._spool, encoding=enc, errors=errs, newline=self.newline)
+            self._text_reader = io.TextIOWrapper(self._inflated, encoding=enc, errors=errs, newline=self.newline)
             self._text_reader.seek(0)
 
         self._position = 0
@@ -3066,6 +3527,7 @@ class ZlibFile(object):
                 raise TypeError("write() expects bytes-like in binary mode")
 
         self._write_buf += data_b
+        self._position += len(data_b)
         if len(self._write_buf) >= __filebuff_size__:
             chunk = self._compressor.compress(bytes(self._write_buf))
             if chunk:
@@ -3117,8 +3579,8 @@ class ZlibFile(object):
             except Exception:
                 pass
             try:
-                if self._spool is not None:
-                    self._spool.close()
+                if self._inflated is not None:
+                    self._inflated.close()
             except Exception:
                 pass
             self.closed = True
@@ -3204,12 +3666,13 @@ def _gzip_decompress_multimember(data):
     return b"".join(out)
 
 
-# ---------- Streaming, spooled GzipFile ----------
+# ---------- Streaming, seekable GzipFile ----------
 class GzipFile(object):
     """
     Gzip reader/writer using zlib (wbits=31) with:
       - streaming writes
-      - spooled reads with multi-member support (seek/tell/iter)
+      - lazy reads with multi-member support (seek/tell/iter), resumed
+        from the nearest access point on seek
       - text ('t') vs binary modes
       - 'a' appends a new gzip member
 
@@ -3244,7 +3707,7 @@ class GzipFile(object):
 
         self._compressor = None
         self._write_buf = bytearray()
-        self._spool = None
+        self._inflated = None
         self._text_reader = None
         self._position = 0
         self.closed = False
@@ -3270,7 +3733,7 @@ class GzipFile(object):
             self._compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
 
         elif "r" in internal_mode:
-            self._load_all_members_spooled()
+            self._open_members_seekable()
         else:
             raise ValueError("Unsupported mode: %r" % (mode,))
 
@@ -3285,83 +3748,24 @@ class GzipFile(object):
         return any(ch in self.mode for ch in ("w", "a", "x"))
 
     def seekable(self):
-        return True if self._spool is not None else bool(getattr(self.file, "seek", None))
+        return True if self._inflated is not None else bool(getattr(self.file, "seek", None))
 
     def _normalize_newlines_for_write(self, s):
         nl = self.newline if self.newline is not None else "\n"
         return s.replace("\r\n", "\n").replace("\r", "\n").replace("\n", nl)
 
     def _reader(self):
-        return self._text_reader if self._text_mode else self._spool
-
-    def _load_all_members_spooled(self):
-        try:
-            self.file.seek(0)
-        except Exception:
-            pass
-
-        self._spool = tempfile.SpooledTemporaryFile(max_size=self.spool_threshold)
-
-        pending = b""
-        d = None
-        absolute_offset = 0
-        scanned = 0
-
-        while True:
-            chunk = self.file.read(__filebuff_size__)
-            if not chunk:
-                if d is not None:
-                    self._spool.write(d.flush())
-                break
-
-            buf = pending + chunk
-            absolute_offset += len(chunk)
-
-            while True:
-                if d is None:
-                    if len(buf) < 2:
-                        pending = buf
-                        break
-
-                    if buf[0:2] != self.GZIP_MAGIC:
-                        if self.tolerant_read and scanned < self.scan_bytes:
-                            buf = buf[1:]
-                            scanned += 1
-                            if len(buf) < 2:
-                                pending = buf
-                                break
-                            continue
-                        # not tolerant: let zlib raise
-
-                    d = zlib.decompressobj(31)
-
-                try:
-                    out = d.decompress(buf)
-                except zlib.error as e:
-                    start_off = absolute_offset - len(buf)
-                    raise ValueError("GZIP decompression error near offset %d: %s"
-                                     % (start_off, e))
-
-                if out:
-                    self._spool.write(out)
-
-                if d.unused_data:
-                    self._spool.write(d.flush())
-                    buf = d.unused_data
-                    d = None
-                    if not buf:
-                        break
-                    continue
-
-                pending = b""
-                break
+        return self._text_reader if self._text_mode else self._inflated
 
-        self._spool.seek(0)
+    def _open_members_seekable(self):
+        self._inflated = _open_inflate_reader(
+            self.file, 31, lambda buf: buf[0:2] == self.GZIP_MAGIC,
+            self.tolerant_read, self.scan_bytes, self.file_path)
 
         if self._text_mode:
             enc = self.encoding or "utf-8"
             errs = self.errors or "strict"
-            self._text_reader = io.TextIOWrapper(self._spool, encoding=enc, errors=errs, newline=self.newline)
+            self._text_reader = io.TextIOWrapper(self._inflated, encoding=enc, errors=errs, newline=self.newline)
             self._text_reader.seek(0)
 
         self._position = 0
@@ -3443,6 +3847,7 @@ class GzipFile(object):
                 raise TypeError("write() expects bytes-like in binary mode")
 
         self._write_buf += data_b
+        self._position += len(data_b)
         if len(self._write_buf) >= __filebuff_size__:
             out = self._compressor.compress(bytes(self._write_buf))
             if out:
@@ -3493,8 +3898,8 @@ class GzipFile(object):
             except Exception:
                 pass
             try:
-                if self._spool is not None:
-                    self._spool.close()
+                if self._inflated is not None:
+                    self._inflated.close()
             except Exception:
                 pass
             self.closed = True
@@ -3579,6 +3984,235 @@ def gzip_decompress_bytes_all_members(blob):
         raise TypeError("expects bytes-like")
     return _gzip_decompress_multimember(blob)
 
+# ---------- Seekable zstd (multi-frame + seek table) ----------
+ZSTD_SKIPPABLE_SEEKTABLE_MAGIC = 0x184D2A5E
+ZSTD_SEEKABLE_MAGIC = 0x8F92EAB1
+# number of frames, descriptor (bit 7: checksums present), seekable magic
+ZSTD_SEEKTABLE_FOOTER_STRUCT = struct.Struct("<IBI")
+ZSTD_SEEKTABLE_ENTRY_STRUCT = struct.Struct("<II")
+
+
+def _zstd_compress_frame(data, level=None):
+    compressor = zstd.ZstdCompressor(level=level)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _read_zstd_seek_table(fp, basestart=0):
+    # Returns a list of (compressed size, decompressed size) or None when
+    # the stream does not end in a seek table.
+    try:
+        fp.seek(0, 2)
+        fileend = fp.tell()
+    except (io.UnsupportedOperation, AttributeError, OSError):
+        return None
+    if(fileend - basestart < ZSTD_SEEKTABLE_FOOTER_STRUCT.size + 8):
+        return None
+    fp.seek(fileend - ZSTD_SEEKTABLE_FOOTER_STRUCT.size, 0)
+    numframes, descriptor, magic = ZSTD_SEEKTABLE_FOOTER_STRUCT.unpack(fp.read(ZSTD_SEEKTABLE_FOOTER_STRUCT.size))
+    if(magic != ZSTD_SEEKABLE_MAGIC or descriptor & 0x7c):
+        return None
+    entrysize = 12 if descriptor & 0x80 else 8
+    tablesize = numframes * entrysize + ZSTD_SEEKTABLE_FOOTER_STRUCT.size
+    if(fileend - basestart < tablesize + 8):
+        return None
+    fp.seek(fileend - tablesize - 8, 0)
+    skipmagic, skipsize = struct.unpack("<II", fp.read(8))
+    if(skipmagic != ZSTD_SKIPPABLE_SEEKTABLE_MAGIC or skipsize != tablesize):
+        return None
+    tabledata = fp.read(tablesize - ZSTD_SEEKTABLE_FOOTER_STRUCT.size)
+    return [ZSTD_SEEKTABLE_ENTRY_STRUCT.unpack_from(tabledata, i * entrysize) for i in range(numframes)]
+
+
+class SeekableZstdFile(io.RawIOBase):
+    """
+    zstd seekable format (contrib/seekable_format in the zstd tree):
+    independent frames of `framesize` input bytes followed by a skippable
+    frame holding the seek table.  Plain zstd decoders read the output as
+    an ordinary multi-frame stream.  Reading back with this class decodes
+    only the frame that holds the requested offset; with workers > 1 a
+    read spanning several frames decodes them on a thread pool.
+
+    Modes: 'rb', 'wb'
+    """
+
+    def __init__(self, file_path=None, fileobj=None, mode="rb", level=None, framesize=None, workers=1):
+        super().__init__()
+        if (file_path is None) == (fileobj is None):
+            raise ValueError("Provide exactly one of file_path or fileobj")
+        self.file_path = file_path
+        self.mode = mode.replace("t", "")
+        if "b" not in self.mode:
+            self.mode += "b"
+        if file_path is not None:
+            self.file = open(file_path, self.mode)
+        else:
+            self.file = fileobj
+        self.level = level
+        self.framesize = int(framesize) if framesize else __zstd_frame_size__
+        self.workers = max(1, int(workers))
+        self._pos = 0
+        self._frames = []
+        if "r" in self.mode:
+            self._basestart = self.file.tell()
+            seektable = _read_zstd_seek_table(self.file, self._basestart)
+            if seektable is None:
+                if file_path is not None:
+                    self.file.close()
+                raise ValueError("zstd stream has no seek table")
+            self._cstarts = [self._basestart]
+            self._ustarts = [0]
+            for csize, usize in seektable:
+                self._cstarts.append(self._cstarts[-1] + csize)
+                self._ustarts.append(self._ustarts[-1] + usize)
+            self._frames = seektable
+            self.size = self._ustarts[-1]
+            # all frames but the last share one size, so lookup is a division
+            self._uniform = None
+            if len(seektable) > 1 and all(x[1] == seektable[0][1] for x in seektable[:-1]):
+                self._uniform = seektable[0][1]
+            self._cacheidx = None
+            self._cachedata = b""
+        elif "w" in self.mode:
+            self._write_buf = bytearray()
+        else:
+            raise ValueError("Unsupported mode: %r" % (mode,))
+
+    @property
+    def name(self):
+        return self.file_path
+
+    def readable(self):
+        return "r" in self.mode
+
+    def writable(self):
+        return "w" in self.mode
+
+    def seekable(self):
+        return "r" in self.mode
+
+    def _frame_index(self, offset):
+        if self._uniform:
+            return min(offset // self._uniform, len(self._frames) - 1)
+        return bisect.bisect_right(self._ustarts, offset) - 1
+
+    def _decode_frame(self, frameidx, pread=None):
+        if pread is not None:
+            cdata = pread(self._cstarts[frameidx], self._frames[frameidx][0])
+        else:
+            self.file.seek(self._cstarts[frameidx], 0)
+            cdata = self.file.read(self._frames[frameidx][0])
+        return zstd.ZstdDecompressor().decompress(cdata)
+
+    def _frame_data(self, frameidx):
+        if frameidx != self._cacheidx:
+            self._cachedata = self._decode_frame(frameidx)
+            self._cacheidx = frameidx
+        return self._cachedata
+
+    def read(self, size=-1):
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        if not self.readable():
+            raise io.UnsupportedOperation("File not open for reading")
+        if size is None or size < 0 or self._pos + size > self.size:
+            size = self.size - self._pos
+        if size <= 0:
+            return b""
+        firstidx = self._frame_index(self._pos)
+        lastidx = self._frame_index(self._pos + size - 1)
+        pread = _get_positional_reader(self.file) if self.workers > 1 and lastidx - firstidx > 1 else None
+        if pread is not None:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+                framedata = list(executor.map(lambda i: self._decode_frame(i, pread), range(firstidx, lastidx + 1)))
+        else:
+            framedata = [self._frame_data(i) for i in range(firstidx, lastidx + 1)]
+        skipsize = self._pos - self._ustarts[firstidx]
+        data = b"".join(framedata)[skipsize:skipsize + size]
+        self._pos += len(data)
+        return data
+
+    def readall(self):
+        return self.read(-1)
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        n = len(data)
+        b[:n] = data
+        return n
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        if not self.seekable():
+            raise io.UnsupportedOperation("seek")
+        if whence == os.SEEK_SET:
+            newpos = int(offset)
+        elif whence == os.SEEK_CUR:
+            newpos = self._pos + int(offset)
+        elif whence == os.SEEK_END:
+            newpos = self.size + int(offset)
+        else:
+            raise ValueError("invalid whence (%r)" % (whence,))
+        if newpos < 0:
+            raise ValueError("negative seek position %r" % (newpos,))
+        self._pos = newpos
+        return newpos
+
+    def tell(self):
+        return self._pos
+
+    def _write_frame(self, data):
+        cdata = _zstd_compress_frame(bytes(data), self.level)
+        self.file.write(cdata)
+        self._frames.append((len(cdata), len(data)))
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+        if not self.writable():
+            raise io.UnsupportedOperation("File not open for writing")
+        self._write_buf += data
+        self._pos += len(data)
+        while len(self._write_buf) >= self.framesize:
+            self._write_frame(self._write_buf[:self.framesize])
+            del self._write_buf[:self.framesize]
+        return len(data)
+
+    def flush(self):
+        # frames stay full sized, the buffered tail goes out on close()
+        if not self.closed and hasattr(self.file, "flush"):
+            self.file.flush()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self.writable():
+                if self._write_buf or not self._frames:
+                    self._write_frame(self._write_buf)
+                    del self._write_buf[:]
+                seektable = b"".join(ZSTD_SEEKTABLE_ENTRY_STRUCT.pack(*x) for x in self._frames)
+                seektable += ZSTD_SEEKTABLE_FOOTER_STRUCT.pack(len(self._frames), 0, ZSTD_SEEKABLE_MAGIC)
+                self.file.write(struct.pack("<II", ZSTD_SKIPPABLE_SEEKTABLE_MAGIC, len(seektable)) + seektable)
+                if hasattr(self.file, "flush"):
+                    self.file.flush()
+        finally:
+            self._cachedata = b""
+            super().close()
+            if self.file_path is not None:
+                self.file.close()
+
+
+def _open_zstd_reader(fp):
+    # Seekable streams get random access, anything else the plain decoder
+    curloc = fp.tell()
+    try:
+        return SeekableZstdFile(fileobj=fp, mode="rb")
+    except ValueError:
+        fp.seek(curloc, 0)
+    return zstd.ZstdFile(fp, mode="rb")
+
+
 def UncompressFileAlt(fp, formatspecs=__file_format_multi_dict__, filestart=0):
     if not hasattr(fp, "read"):
         return False
@@ -3597,7 +4231,7 @@ def UncompressFileAlt(fp, formatspecs=__file_format_multi_dict__, filestart=0):
 
     # Build logical stream (or passthrough)
     if   kind == "gzip"   and "gzip"   in compressionsupport:
-        wrapped = gzip.GzipFile(fileobj=src, mode="rb")
+        wrapped = GzipFile(fileobj=src, mode="rb")
         wrapped.seek(0, 0)
     elif kind == "bzip2"  and ("bzip2" in compressionsupport or "bz2" in compressionsupport):
         wrapped = bz2.BZ2File(src)
@@ -3607,7 +4241,7 @@ def UncompressFileAlt(fp, formatspecs=__file_format_multi_dict__, filestart=0):
         wrapped.seek(0, 0)
     elif kind == "zstd"   and ("zstd" in compressionsupport or "zstandard" in compressionsupport):
         if 'zstd' in compressionsupport:
-            wrapped = zstd.ZstdFile(src, mode="rb")
+            wrapped = _open_zstd_reader(src)
             wrapped.seek(0, 0)
         else:
             return False
@@ -3641,7 +4275,10 @@ def UncompressFile(infile, formatspecs=__file_format_multi_dict__, mode="rb",
             fp.seek(0, 0)
         elif (compresscheck == "zstd" and "zstandard" in compressionsupport):
             if 'zstd' in compressionsupport:
-                fp = zstd.ZstdFile(infile, mode=mode)
+                try:
+                    fp = SeekableZstdFile(infile, mode=mode)
+                except ValueError:
+                    fp = zstd.ZstdFile(infile, mode=mode)
                 fp.seek(0, 0)
             else:
                 return False
@@ -3700,9 +4337,14 @@ def CompressOpenFileAlt(fp, compression="auto", compressionlevel=None,
         elif compression == "zstd" and "zstandard" in compressionsupport:
             bytesfp = MkTempFile()
             level = _lvl(compressionlevel)
-            compressor = zstd.ZstdCompressor(level=level)
-            bytesfp.write(compressor.compress(fp.read()))
-            bytesfp.write(compressor.flush())
+            if __zstd_frame_size__ > 0:
+                zstdfp = SeekableZstdFile(fileobj=bytesfp, mode="wb", level=level)
+                shutil.copyfileobj(fp, zstdfp, length=__filebuff_size__)
+                zstdfp.close()
+            else:
+                compressor = zstd.ZstdCompressor(level=level)
+                bytesfp.write(compressor.compress(fp.read()))
+                bytesfp.write(compressor.flush())
         elif compression == "lzma" and "lzma" in compressionsupport:
             bytesfp = MkTempFile()
             level = _lvl(compressionlevel)
@@ -3735,6 +4377,75 @@ def CompressOpenFileAlt(fp, compression="auto", compressionlevel=None,
 
     return bytesfp
 
+def _compress_member_with_checkpoints(fp, compression="zlib", compressionlevel=None, interval=None, outfp=None):
+    """
+    Deflate fp as a zlib or gzip stream with a full flush every `interval`
+    uncompressed bytes.  Each flush leaves the stream byte aligned with an
+    empty window, so raw inflation can restart there.  Returns the
+    compressed temp file (outfp when given) and a list of
+    [uncompressed, compressed] offsets.
+    """
+    if interval is None:
+        interval = __member_checkpoint_size__
+    level = 9 if compressionlevel is None else int(compressionlevel)
+    if compression == "gzip":
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        headersize = 10
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS)
+        headersize = 2
+    fp.seek(0, 0)
+    bytesfp = outfp
+    if(bytesfp is None):
+        bytesfp = MkTempFile()
+    checkpoints = [[0, headersize]]
+    uoffset = 0
+    chunk = fp.read(interval)
+    while chunk:
+        bytesfp.write(compressor.compress(chunk))
+        uoffset = uoffset + len(chunk)
+        chunk = fp.read(interval)
+        if chunk:
+            bytesfp.write(compressor.flush(zlib.Z_FULL_FLUSH))
+            checkpoints.append([uoffset, bytesfp.tell()])
+    bytesfp.write(compressor.flush())
+    bytesfp.seek(0, 0)
+    return (bytesfp, checkpoints)
+
+def _compress_member_stream(fp, compression="zlib", compressionlevel=None, outfp=None):
+    """
+    Compress fp into outfp (a new temp file when None) one buffer at a
+    time with the incremental zlib, bz2 and lzma compressors, writing the
+    same formats as CompressOpenFileAlt.  Returns False for codecs that
+    have no incremental compressor here.
+    """
+    level = 9 if compressionlevel is None else int(compressionlevel)
+    if(compression not in compressionsupport):
+        return False
+    if(compression == "gzip"):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    elif(compression == "zlib"):
+        compressor = zlib.compressobj(level)
+    elif(compression == "bzip2"):
+        compressor = bz2.BZ2Compressor(level)
+    elif(compression == "lzma"):
+        compressor = lzma.LZMACompressor(format=lzma.FORMAT_ALONE, filters=[{"id": lzma.FILTER_LZMA1, "preset": level}])
+    elif(compression == "xz"):
+        compressor = lzma.LZMACompressor(format=lzma.FORMAT_XZ, filters=[{"id": lzma.FILTER_LZMA2, "preset": level}])
+    else:
+        return False
+    bytesfp = outfp
+    if(bytesfp is None):
+        bytesfp = MkTempFile()
+    fp.seek(0, 0)
+    chunk = fp.read(__filebuff_size__)
+    while chunk:
+        bytesfp.write(compressor.compress(chunk))
+        chunk = fp.read(__filebuff_size__)
+    bytesfp.write(compressor.flush())
+    bytesfp.seek(0, 0)
+    return bytesfp
+
 def CompressOpenFile(outfile, compressionenable=True, compressionlevel=None):
     if outfile is None:
         return False
@@ -3756,7 +4467,9 @@ def CompressOpenFile(outfile, compressionenable=True, compressionlevel=None):
             outfp = bz2.open(outfile, mode, compressionlevel)
 
         elif (fextname == ".zst" and "zstandard" in compressionsupport):
-            if 'zstd' in compressionsupport:
+            if 'zstd' in compressionsupport and __zstd_frame_size__ > 0:
+                outfp = SeekableZstdFile(outfile, mode=mode, level=compressionlevel)
+            elif 'zstd' in compressionsupport:
                 outfp = zstd.ZstdFile(outfile, mode=mode, level=compressionlevel)
             else:
                 return False  # fix: 'False' -> False
@@ -4191,16 +4904,210 @@ def multiopen(parts, mode="r+b", buffering=io.DEFAULT_BUFFER_SIZE,
 
     return io.BufferedRandom(raw, buffering)
 
-# ========= pushback-aware delimiter reader =========
-class _DelimiterReader:
+class FileSectionReader(io.RawIOBase):
     """
-    Chunked reader that consumes up to N occurrences of a byte delimiter.
-    - Works with non-seekable streams by stashing over-read bytes on fp._read_until_delim_pushback
-    - For seekable streams, rewinds over-read via seek(-n, SEEK_CUR)
+    Read-only view of `length` bytes of `fp` starting at `offset`.
+    The source is re-positioned before every read, so several sections of
+    one archive can be consumed in any order without copying them out.
     """
-    _PB_ATTR = "_read_until_delim_pushback"
 
-    def __init__(self, fp, delimiter, chunk_size=8192, max_read=64 * 1024 * 1024):
+    def __init__(self, fp, offset=0, length=None):
+
+        super().__init__()
+
+        self._fp = fp
+        self._offset = int(offset)
+        if length is None:
+            cur = fp.tell()
+            fp.seek(0, os.SEEK_END)
+            length = fp.tell() - self._offset
+            fp.seek(cur)
+        self._length = max(0, int(length))
+        self._pos = 0
+        # Over a mapping, keep a view of the section so it stays readable
+        # without touching (or needing) the archive file object
+        self._buffer = None
+        if isinstance(fp, FileMmapReader):
+            self._buffer = fp.getbuffer(self._offset, self._length)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    @property
+    def name(self):
+        return getattr(self._fp, "name", None)
+
+    def close(self):
+        self._buffer = None
+        super().close()
+
+    def _check_open(self):
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+
+    def read(self, size=-1):
+        self._check_open()
+        remaining = self._length - self._pos
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        if size <= 0:
+            return b""
+        if self._buffer is not None:
+            data = self._buffer[self._pos:self._pos + size].tobytes()
+            self._pos += size
+            return data
+        self._fp.seek(self._offset + self._pos, os.SEEK_SET)
+        data = self._fp.read(size)
+        self._pos += len(data)
+        return data
+
+    def readall(self):
+        return self.read(-1)
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        n = len(data)
+        b[:n] = data
+        return n
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        self._check_open()
+        if whence == os.SEEK_SET:
+            newpos = int(offset)
+        elif whence == os.SEEK_CUR:
+            newpos = self._pos + int(offset)
+        elif whence == os.SEEK_END:
+            newpos = self._length + int(offset)
+        else:
+            raise ValueError("invalid whence (%r)" % (whence,))
+        if newpos < 0:
+            raise ValueError("negative seek position %r" % (newpos,))
+        self._pos = newpos
+        return newpos
+
+    def tell(self):
+        self._check_open()
+        return self._pos
+
+    def getbuffer(self):
+        """Read-only buffer of the section; zero-copy over a FileMmapReader."""
+        self._check_open()
+        if self._buffer is not None:
+            return self._buffer
+        self._fp.seek(self._offset, os.SEEK_SET)
+        return memoryview(self._fp.read(self._length)).toreadonly()
+
+
+class FileMmapReader(io.RawIOBase):
+    """
+    Read-only file object over a memory-mapped regular file.
+    getbuffer() hands out memoryview slices of the mapping, so stored
+    member content can be used without copying it out of the archive.
+    The mapping stays alive until every slice handed out is released.
+    """
+
+    def __init__(self, infile):
+
+        super().__init__()
+
+        self._file = open(infile, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            self._file.close()
+            raise
+        self._view = memoryview(self._mmap)
+        self._length = len(self._mmap)
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    @property
+    def name(self):
+        return self._file.name
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def _check_open(self):
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+
+    def read(self, size=-1):
+        self._check_open()
+        remaining = self._length - self._pos
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        if size <= 0:
+            return b""
+        data = self._view[self._pos:self._pos + size].tobytes()
+        self._pos += size
+        return data
+
+    def readall(self):
+        return self.read(-1)
+
+    def readinto(self, b):
+        self._check_open()
+        n = min(len(b), max(0, self._length - self._pos))
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        self._check_open()
+        if whence == os.SEEK_SET:
+            newpos = int(offset)
+        elif whence == os.SEEK_CUR:
+            newpos = self._pos + int(offset)
+        elif whence == os.SEEK_END:
+            newpos = self._length + int(offset)
+        else:
+            raise ValueError("invalid whence (%r)" % (whence,))
+        if newpos < 0:
+            raise ValueError("negative seek position %r" % (newpos,))
+        self._pos = newpos
+        return newpos
+
+    def tell(self):
+        self._check_open()
+        return self._pos
+
+    def getbuffer(self, offset=0, length=None):
+        self._check_open()
+        if length is None:
+            length = self._length - offset
+        return self._view[offset:offset + length]
+
+    def close(self):
+        if not self.closed:
+            try:
+                self._view.release()
+                self._mmap.close()
+            except BufferError:
+                # Slices are still exported; the mapping goes away with them
+                pass
+            self._file.close()
+        super().close()
+
+
+# ========= pushback-aware delimiter reader =========
+class _DelimiterReader:
+    """
+    Chunked reader that consumes up to N occurrences of a byte delimiter.
+    - Works with non-seekable streams by stashing over-read bytes on fp._read_until_delim_pushback
+    - For seekable streams, rewinds over-read via seek(-n, SEEK_CUR)
+    """
+    _PB_ATTR = "_read_until_delim_pushback"
+
+    def __init__(self, fp, delimiter, chunk_size=8192, max_read=64 * 1024 * 1024):
         if not hasattr(fp, "read"):
             raise ValueError("fp must be a readable file-like object")
 
@@ -4561,22 +5468,7 @@ def ReadFileHeaderDataWithContent(fp, listonly=False, contentasfile=False, uncom
                 fextrafieldslist = json.loads(fextrafieldslist[0])
             except (binascii.Error, json.decoder.JSONDecodeError, UnicodeDecodeError):
                 pass
-    if(re.findall("^\\+([0-9]+)", fseektojson)):
-        fseektojsonasnum = int(fseektojson.replace("+", ""))
-        if(abs(fseektojsonasnum) == 0):
-            pass
-        fp.seek(fseektojsonasnum, 1)
-    elif(re.findall("^\\-([0-9]+)", fseektojson)):
-        fseektojsonasnum = int(fseektojson)
-        if(abs(fseektojsonasnum) == 0):
-            pass
-        fp.seek(fseektojsonasnum, 1)
-    elif(re.findall("^([0-9]+)", fseektojson)):
-        fseektojsonasnum = int(fseektojson)
-        if(abs(fseektojsonasnum) == 0):
-            pass
-        fp.seek(fseektojsonasnum, 0)
-    else:
+    if(not _seek_by_directive(fp, fseektojson)):
         return False
     fjstart = fp.tell()
     if(fjsontype=="json"):
@@ -4644,22 +5536,7 @@ def ReadFileHeaderDataWithContent(fp, listonly=False, contentasfile=False, uncom
                     fjsoncontent = json.loads(fjsoncontent[0])
                 except (binascii.Error, json.decoder.JSONDecodeError, UnicodeDecodeError):
                     pass
-    if(re.findall("^\\+([0-9]+)", fseektocontent)):
-        fseektocontentasnum = int(fseektocontent.replace("+", ""))
-        if(abs(fseektocontentasnum) == 0):
-            pass
-        fp.seek(fseektocontentasnum, 1)
-    elif(re.findall("^\\-([0-9]+)", fseektocontent)):
-        fseektocontentasnum = int(fseektocontent)
-        if(abs(fseektocontentasnum) == 0):
-            pass
-        fp.seek(fseektocontentasnum, 1)
-    elif(re.findall("^([0-9]+)", fseektocontent)):
-        fseektocontentasnum = int(fseektocontent)
-        if(abs(fseektocontentasnum) == 0):
-            pass
-        fp.seek(fseektocontentasnum, 0)
-    else:
+    if(not _seek_by_directive(fp, fseektocontent)):
         return False
     fjend = fp.tell() - len(delimiter)
     jsonfcs = GetFileChecksum(fprejsoncontent, fjsonchecksumtype, True, formatspecs, saltkey)
@@ -4678,33 +5555,33 @@ def ReadFileHeaderDataWithContent(fp, listonly=False, contentasfile=False, uncom
         return False
     fhend = fp.tell() - len(delimiter)
     fcontentstart = fp.tell()
-    fcontents = MkTempFile()
     pyhascontents = False
-    if(fsize > 0 and not listonly):
-        if(fcompression == "none" or fcompression == "" or fcompression == "auto"):
-            fcontents.write(fp.read(fsize))
-        else:
-            fcontents.write(fp.read(fcsize))
-        pyhascontents = True
-    elif(fsize > 0 and listonly):
-        if(fcompression == "none" or fcompression == "" or fcompression == "auto"):
-            fp.seek(fsize, 1)
-        else:
-            fp.seek(fcsize, 1)
-        pyhascontents = False
-    fcontents.seek(0, 0)
-    newfccs = GetFileChecksum(fcontents, HeaderOut[-3].lower(), False, formatspecs, saltkey)
-    fcontents.seek(0, 0)
-    if(not CheckChecksums(fccs, newfccs) and not skipchecksum and not listonly):
-        VerbosePrintOut("File Content Checksum Error with file " +
-                        fname + " at offset " + str(fcontentstart))
-        VerbosePrintOut("'" + fccs + "' != " + "'" + newfccs + "'")
-        return False
-    if(fcompression == "none" or fcompression == "" or fcompression == "auto"):
-        pass
+    if(listonly):
+        # Header-only traversal: jump over the stored bytes without reading
+        # or hashing them
+        fcontents = io.BytesIO()
+        if(fsize > 0):
+            if(fcompression == "none" or fcompression == "" or fcompression == "auto"):
+                fp.seek(fsize, 1)
+            else:
+                fp.seek(fcsize, 1)
     else:
+        fcontents = MkTempFile()
+        if(fsize > 0):
+            if(fcompression == "none" or fcompression == "" or fcompression == "auto"):
+                fcontents.write(fp.read(fsize))
+            else:
+                fcontents.write(fp.read(fcsize))
+            pyhascontents = True
+        fcontents.seek(0, 0)
+        newfccs = GetFileChecksum(fcontents, HeaderOut[-3].lower(), False, formatspecs, saltkey)
         fcontents.seek(0, 0)
-        if(uncompress):
+        if(not CheckChecksums(fccs, newfccs) and not skipchecksum):
+            VerbosePrintOut("File Content Checksum Error with file " +
+                            fname + " at offset " + str(fcontentstart))
+            VerbosePrintOut("'" + fccs + "' != " + "'" + newfccs + "'")
+            return False
+        if(fcompression != "none" and fcompression != "" and fcompression != "auto" and uncompress):
             cfcontents = UncompressFileAlt(
                 fcontents, formatspecs)
             cfcontents.seek(0, 0)
@@ -4714,22 +5591,7 @@ def ReadFileHeaderDataWithContent(fp, listonly=False, contentasfile=False, uncom
             fcontents.seek(0, 0)
             fccs = GetFileChecksum(fcontents, HeaderOut[-3].lower(), False, formatspecs, saltkey)
     fcontentend = fp.tell()
-    if(re.findall("^\\+([0-9]+)", fseeknextfile)):
-        fseeknextasnum = int(fseeknextfile.replace("+", ""))
-        if(abs(fseeknextasnum) == 0):
-            pass
-        fp.seek(fseeknextasnum, 1)
-    elif(re.findall("^\\-([0-9]+)", fseeknextfile)):
-        fseeknextasnum = int(fseeknextfile)
-        if(abs(fseeknextasnum) == 0):
-            pass
-        fp.seek(fseeknextasnum, 1)
-    elif(re.findall("^([0-9]+)", fseeknextfile)):
-        fseeknextasnum = int(fseeknextfile)
-        if(abs(fseeknextasnum) == 0):
-            pass
-        fp.seek(fseeknextasnum, 0)
-    else:
+    if(not _seek_by_directive(fp, fseeknextfile)):
         return False
     fcontents.seek(0, 0)
     if(not contentasfile):
@@ -4738,16 +5600,376 @@ def ReadFileHeaderDataWithContent(fp, listonly=False, contentasfile=False, uncom
     return HeaderOut
 
 
+def _decode_file_json(fprejsoncontent, fjsontype="json", fjsonlen=0, delimiter=__file_format_dict__['format_delimiter']):
+    profiler = _profiler
+    if(profiler is None or len(fprejsoncontent) == 0):
+        return _decode_file_json_data(fprejsoncontent, fjsontype, fjsonlen, delimiter)
+    pstart = time.perf_counter()
+    outjson = _decode_file_json_data(fprejsoncontent, fjsontype, fjsonlen, delimiter)
+    profiler.add('json', time.perf_counter() - pstart, len(fprejsoncontent))
+    return outjson
+
+
+def _decode_file_json_data(fprejsoncontent, fjsontype="json", fjsonlen=0, delimiter=__file_format_dict__['format_delimiter']):
+    fjsonrawcontent = fprejsoncontent
+    fjsoncontent = {}
+    if(len(fprejsoncontent) == 0):
+        return (fjsonrawcontent, fjsoncontent, fjsonlen)
+    if(fjsontype=="json"):
+        try:
+            fjsonrawcontent = base64.b64decode(fprejsoncontent)
+            fjsoncontent = json.loads(fjsonrawcontent.decode("UTF-8"))
+        except (binascii.Error, json.decoder.JSONDecodeError, UnicodeDecodeError):
+            try:
+                fjsonrawcontent = fprejsoncontent
+                fjsoncontent = json.loads(fprejsoncontent.decode("UTF-8"))
+            except (binascii.Error, json.decoder.JSONDecodeError, UnicodeDecodeError):
+                fjsonrawcontent = "".encode("UTF-8")
+                fjsoncontent = {}
+    elif(testyaml and fjsontype == "yaml"):
+        try:
+            fjsonrawcontent = base64.b64decode(fprejsoncontent)
+            fjsoncontent = yaml.safe_load(fjsonrawcontent) or {}
+        except (binascii.Error, UnicodeDecodeError, yaml.YAMLError):
+            try:
+                fjsonrawcontent = fprejsoncontent
+                fjsoncontent = yaml.safe_load(fjsonrawcontent) or {}
+            except (UnicodeDecodeError, yaml.YAMLError):
+                fjsonrawcontent = "".encode("UTF-8")
+                fjsoncontent = {}
+    elif(fjsontype=="list"):
+        fjsoncontent = fprejsoncontent.decode("UTF-8").split(delimiter)[:fjsonlen]
+        fjsonrawcontent = fjsoncontent
+        if(fjsonlen==1):
+            try:
+                fjsonrawcontent = base64.b64decode(fjsoncontent[0]).decode("UTF-8")
+                fjsoncontent = json.loads(fjsonrawcontent)
+                fjsonlen = len(fjsoncontent)
+            except (binascii.Error, json.decoder.JSONDecodeError, UnicodeDecodeError):
+                try:
+                    fjsonrawcontent = fjsoncontent[0]
+                    fjsoncontent = json.loads(fjsoncontent[0])
+                except (binascii.Error, json.decoder.JSONDecodeError, UnicodeDecodeError):
+                    pass
+    return (fjsonrawcontent, fjsoncontent, fjsonlen)
+
+
+class ArchiveEntry(object):
+    """
+    Lazily decoded archive entry.  Only the raw header fields and the
+    offsets of the JSON and content sections are kept; content,
+    decompression, checksum checks and derived fields (readable sizes,
+    permission strings, decoded JSON/extra fields) are worked out when
+    they are asked for.  Supports the mapping interface of the entry
+    dicts built by ReadFileHeaderDataWithContentToArray.
+    """
+    __slots__ = ("frawheader", "fhstart", "fjstart", "fcontentstart", "fp",
+                 "fformatspecs", "fsaltkey", "funcompress", "_fjsonbytes", "_fvalues")
+
+    _FIELD_INDEX = {
+        'fheadersize': 0, 'ftype': 2, 'fsize': 7, 'fblksize': 8, 'fblocks': 9,
+        'fflags': 10, 'fatime_ns': 11, 'fmtime_ns': 12, 'fctime_ns': 13,
+        'fbtime_ns': 14, 'fmode': 15, 'fwinattributes': 16, 'fcsize': 18,
+        'fuid': 19, 'fgid': 21, 'finode': 24, 'flinkcount': 25, 'fdev': 26,
+        'fdev_major': 27, 'fdev_minor': 28, 'frdev': 29, 'frdev_major': 30,
+        'frdev_minor': 31, 'fjsonsize': 37, 'fextrafieldsize': 40,
+    }
+    _STRING_INDEX = {
+        'fencoding': 3, 'fcencoding': 4, 'fname': 5, 'flinkname': 6,
+        'fcompression': 17, 'funame': 20, 'fgname': 22, 'fseektojson': 32,
+        'fseektocontent': 33, 'fseeknextfile': 34, 'fjsontype': 35,
+        'fjsonchecksumtype': 38, 'fjsonchecksum': 39,
+        'fheaderchecksumtype': -4, 'fcontentchecksumtype': -3,
+        'fheaderchecksum': -2, 'fcontentchecksum': -1,
+    }
+    _DERIVED = (
+        'fhstart', 'fhend', 'fbasedir', 'fsize_si', 'fsize_iec', 'fatime', 'fmtime',
+        'fctime', 'fbtime', 'fchmode', 'fstrmode', 'ftypemod', 'fcsize_si',
+        'fcsize_iec', 'fid', 'fnumfields', 'frawheader', 'fvendorfields',
+        'fvendordata', 'fextrafields', 'fextradata', 'fjsonlen', 'fjsonrawdata',
+        'fjsondata', 'fjstart', 'fjend', 'fhascontents', 'fcontentstart',
+        'fcontentend', 'fcontentasfile', 'fcontents',
+    )
+
+    def __init__(self, frawheader, fhstart=0, fjstart=0, fcontentstart=0, fjsonbytes=b"",
+                 fp=None, formatspecs=__file_format_dict__, saltkey=None, uncompress=True):
+        self.frawheader = frawheader
+        self.fhstart = fhstart
+        self.fjstart = fjstart
+        self.fcontentstart = fcontentstart
+        self.fp = fp
+        self.fformatspecs = formatspecs
+        self.fsaltkey = saltkey
+        self.funcompress = uncompress
+        self._fjsonbytes = fjsonbytes
+        self._fvalues = None
+
+    def _stored_size(self):
+        fcompression = self.frawheader[17]
+        if(fcompression == "none" or fcompression == "" or fcompression == "auto"):
+            return int(self.frawheader[7], 16)
+        return int(self.frawheader[18], 16)
+
+    def _extra_fields(self):
+        fextrafields = int(self.frawheader[41], 16)
+        fextrafieldslist = self.frawheader[42:42 + fextrafields]
+        if(fextrafields==1):
+            try:
+                fextrafieldslist = json.loads(base64.b64decode(fextrafieldslist[0]).decode("UTF-8"))
+                fextrafields = len(fextrafieldslist)
+            except (binascii.Error, json.decoder.JSONDecodeError, UnicodeDecodeError):
+                try:
+                    fextrafieldslist = json.loads(fextrafieldslist[0])
+                except (binascii.Error, json.decoder.JSONDecodeError, UnicodeDecodeError):
+                    pass
+        return (fextrafields, fextrafieldslist)
+
+    def _vendor_fields(self):
+        extraend = 42 + int(self.frawheader[41], 16)
+        return self.frawheader[extraend:len(self.frawheader) - 4]
+
+    def _json(self):
+        return _decode_file_json(self._fjsonbytes, self.frawheader[35], int(self.frawheader[36], 16), self.fformatspecs['format_delimiter'])
+
+    def _derived(self, key):
+        if(key == 'fhstart'):
+            return self.fhstart
+        elif(key == 'fhend' or key == 'fjend'):
+            return self.fcontentstart - len(self.fformatspecs['format_delimiter'])
+        elif(key == 'fbasedir'):
+            return os.path.dirname(self.frawheader[5])
+        elif(key == 'fsize_si' or key == 'fsize_iec'):
+            return get_readable_size(int(self.frawheader[7], 16), unit=key.rsplit("_", 1)[1].upper())
+        elif(key == 'fcsize_si' or key == 'fcsize_iec'):
+            return get_readable_size(int(self.frawheader[18], 16), unit=key.rsplit("_", 1)[1].upper())
+        elif(key in ('fatime', 'fmtime', 'fctime', 'fbtime')):
+            return divmod(self[key + "_ns"], 10**9)[0]
+        elif(key == 'fchmode'):
+            return stat.S_IMODE(int(self.frawheader[15], 16))
+        elif(key == 'ftypemod'):
+            return stat.S_IFMT(int(self.frawheader[15], 16))
+        elif(key == 'fstrmode'):
+            return PrintPermissionString(int(self.frawheader[15], 16), int(self.frawheader[2], 16))
+        elif(key == 'fid'):
+            return int(self.frawheader[23], 16)
+        elif(key == 'fnumfields'):
+            return int(self.frawheader[1], 16) + 2
+        elif(key == 'frawheader'):
+            return self.frawheader
+        elif(key == 'fvendorfields'):
+            return len(self._vendor_fields())
+        elif(key == 'fvendordata'):
+            return self._vendor_fields()
+        elif(key == 'fextrafields'):
+            return self._extra_fields()[0]
+        elif(key == 'fextradata'):
+            return self._extra_fields()[1]
+        elif(key == 'fjsonlen'):
+            return self._json()[2]
+        elif(key == 'fjsonrawdata'):
+            return self._json()[0]
+        elif(key == 'fjsondata'):
+            return self._json()[1]
+        elif(key == 'fjstart'):
+            return self.fjstart
+        elif(key == 'fhascontents'):
+            return self.fp is not None and int(self.frawheader[7], 16) > 0
+        elif(key == 'fcontentstart'):
+            return self.fcontentstart
+        elif(key == 'fcontentend'):
+            return self.fcontentstart + self._stored_size()
+        elif(key == 'fcontentasfile'):
+            return True
+        elif(key == 'fcontents'):
+            return self.open_contents(self.funcompress)
+        raise KeyError(key)
+
+    def __getitem__(self, key):
+        if(self._fvalues is not None and key in self._fvalues):
+            return self._fvalues[key]
+        if(key in self._FIELD_INDEX):
+            return int(self.frawheader[self._FIELD_INDEX[key]], 16)
+        if(key in self._STRING_INDEX):
+            return self.frawheader[self._STRING_INDEX[key]]
+        return self._derived(key)
+
+    def __setitem__(self, key, value):
+        if(self._fvalues is None):
+            self._fvalues = {}
+        self._fvalues[key] = value
+
+    def __contains__(self, key):
+        return (key in self._FIELD_INDEX or key in self._STRING_INDEX or key in self._DERIVED
+                or (self._fvalues is not None and key in self._fvalues))
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __repr__(self):
+        return "ArchiveEntry(%r, fhstart=%d)" % (self.frawheader[5], self.fhstart)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        outkeys = list(self._FIELD_INDEX) + list(self._STRING_INDEX) + list(self._DERIVED)
+        if(self._fvalues is not None):
+            outkeys.extend(key for key in self._fvalues if key not in outkeys)
+        return outkeys
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def open_contents(self, uncompress=True):
+        if(self.fp is None):
+            return None
+        fcontents = FileSectionReader(self.fp, self.fcontentstart, self._stored_size())
+        fcompression = self.frawheader[17]
+        if(uncompress and fcompression != "none" and fcompression != "" and fcompression != "auto"):
+            profiler = _profiler
+            if(profiler is not None):
+                pstart = time.perf_counter()
+            fcontents = UncompressFileAlt(fcontents, self.fformatspecs)
+            fcontents.seek(0, 0)
+            if(profiler is not None):
+                profiler.add('decompress', time.perf_counter() - pstart, int(self.frawheader[7], 16))
+        return fcontents
+
+    def verify_header(self):
+        newfcs = GetHeaderChecksum(self.frawheader[:-2], self.frawheader[-4].lower(), True, self.fformatspecs, self.fsaltkey)
+        return CheckChecksums(self.frawheader[-2].lower(), newfcs)
+
+    def verify_json(self):
+        jsonfcs = GetFileChecksum(self._fjsonbytes, self.frawheader[38], True, self.fformatspecs, self.fsaltkey)
+        return CheckChecksums(self.frawheader[39], jsonfcs)
+
+    def verify_contents(self):
+        fcontents = self.open_contents(False)
+        if(fcontents is None):
+            return False
+        newfccs = GetFileChecksum(fcontents, self.frawheader[-3].lower(), False, self.fformatspecs, self.fsaltkey)
+        return CheckChecksums(self.frawheader[-1].lower(), newfccs)
+
+    def verify(self):
+        return self.verify_header() and self.verify_json() and self.verify_contents()
+
+
+def ReadFileHeaderDataToEntry(fp, uncompress=True, skipchecksum=False, formatspecs=__file_format_dict__, saltkey=None, headerfilter=None):
+    if(not hasattr(fp, "read")):
+        return False
+    profiler = _profiler
+    if(profiler is not None):
+        start_real = time.perf_counter()
+    delimiter = formatspecs['format_delimiter']
+    fheaderstart = fp.tell()
+    HeaderOut = ReadFileHeaderDataBySize(fp, delimiter)
+    if(len(HeaderOut) == 0):
+        return False
+    if(profiler is not None):
+        profiler.add('header', time.perf_counter() - start_real, fp.tell() - fheaderstart)
+    if(headerfilter is not None and not headerfilter(HeaderOut)):
+        # rejected on the raw header fields: skip the JSON and the content
+        # without reading or checking them and return None
+        if(not _seek_by_directive(fp, HeaderOut[32])):
+            return False
+        fp.seek(int(HeaderOut[37], 16), 1)
+        if(not _seek_by_directive(fp, HeaderOut[33])):
+            return False
+        if(HeaderOut[17] == "none" or HeaderOut[17] == "" or HeaderOut[17] == "auto"):
+            fp.seek(int(HeaderOut[7], 16), 1)
+        else:
+            fp.seek(int(HeaderOut[18], 16), 1)
+        if(not _seek_by_directive(fp, HeaderOut[34])):
+            return False
+        return None
+    if(not _seek_by_directive(fp, HeaderOut[32])):
+        return False
+    fjstart = fp.tell()
+    fprejsoncontent = fp.read(int(HeaderOut[37], 16))
+    if(not _seek_by_directive(fp, HeaderOut[33])):
+        return False
+    fcontentstart = fp.tell()
+    outentry = ArchiveEntry(HeaderOut, fheaderstart, fjstart, fcontentstart, fprejsoncontent, fp, formatspecs, saltkey, uncompress)
+    if(not skipchecksum):
+        if(not outentry.verify_json()):
+            VerbosePrintOut("File JSON Data Checksum Error with file " +
+                            HeaderOut[5] + " at offset " + str(fheaderstart))
+            return False
+        if(not outentry.verify_header()):
+            VerbosePrintOut("File Header Checksum Error with file " +
+                            HeaderOut[5] + " at offset " + str(fheaderstart))
+            return False
+    fp.seek(outentry._stored_size(), 1)
+    if(not _seek_by_directive(fp, HeaderOut[34])):
+        return False
+    if(profiler is not None):
+        profiler.entry('read', HeaderOut[5], time.perf_counter() - start_real, int(HeaderOut[7], 16))
+    return outentry
+
+
+def _uncompress_entry_contents(fcontents, checksumtype="md5", formatspecs=__file_format_dict__, saltkey=None):
+    # Decompress one member's stored bytes into a temp file; returns the
+    # file and the checksum of the decompressed data
+    if(not hasattr(fcontents, "read")):
+        cfcontents = MkTempFile()
+        cfcontents.write(fcontents)
+        fcontents = cfcontents
+    fcontents.seek(0, 0)
+    profiler = _profiler
+    if(profiler is not None):
+        pstart = time.perf_counter()
+    cfcontents = UncompressFileAlt(
+        fcontents, formatspecs)
+    cfcontents.seek(0, 0)
+    fcontents = MkTempFile()
+    shutil.copyfileobj(cfcontents, fcontents, length=__filebuff_size__)
+    cfcontents.close()
+    if(profiler is not None):
+        profiler.add('decompress', time.perf_counter() - pstart, fcontents.tell())
+    fcontents.seek(0, 0)
+    fccs = GetFileChecksum(fcontents, checksumtype, False, formatspecs, saltkey)
+    fcontents.seek(0, 0)
+    return (fcontents, fccs)
+
+
+def _finish_uncompress_entry(pendingentry, contentasfile=True):
+    curentry, curfuture = pendingentry
+    fcontents, fccs = curfuture.result()
+    if(not contentasfile):
+        fcontents = fcontents.read()
+    curentry.update({'fcontents': fcontents, 'fcontentchecksum': fccs})
+    return curentry
+
+
 def ReadFileHeaderDataWithContentToArray(fp, listonly=False, contentasfile=True, uncompress=True, skipchecksum=False, formatspecs=__file_format_dict__, saltkey=None):
     if(not hasattr(fp, "read")):
         return False
-    start_real = time.perf_counter()
-    start_usage = resource.getrusage(resource.RUSAGE_SELF)
+    profiler = _profiler
+    if(profiler is not None):
+        start_real = pstart = time.perf_counter()
     delimiter = formatspecs['format_delimiter']
     fheaderstart = fp.tell()
     HeaderOut = ReadFileHeaderDataBySize(fp, delimiter)
     if(len(HeaderOut) == 0):
         return False
+    if(profiler is not None):
+        profiler.add('header', time.perf_counter() - pstart, fp.tell() - fheaderstart)
     fheadsize = int(HeaderOut[0], 16)
     fnumfields = int(HeaderOut[1], 16)
     ftype = int(HeaderOut[2], 16)
@@ -4817,24 +6039,11 @@ def ReadFileHeaderDataWithContentToArray(fp, listonly=False, contentasfile=True,
                 fextrafieldslist = json.loads(fextrafieldslist[0])
             except (binascii.Error, json.decoder.JSONDecodeError, UnicodeDecodeError):
                 pass
-    if(re.findall("^\\+([0-9]+)", fseektojson)):
-        fseektojsonasnum = int(fseektojson.replace("+", ""))
-        if(abs(fseektojsonasnum) == 0):
-            pass
-        fp.seek(fseektojsonasnum, 1)
-    elif(re.findall("^\\-([0-9]+)", fseektojson)):
-        fseektojsonasnum = int(fseektojson)
-        if(abs(fseektojsonasnum) == 0):
-            pass
-        fp.seek(fseektojsonasnum, 1)
-    elif(re.findall("^([0-9]+)", fseektojson)):
-        fseektojsonasnum = int(fseektojson)
-        if(abs(fseektojsonasnum) == 0):
-            pass
-        fp.seek(fseektojsonasnum, 0)
-    else:
+    if(not _seek_by_directive(fp, fseektojson)):
         return False
     fjstart = fp.tell()
+    if(profiler is not None):
+        pstart = time.perf_counter()
     if(fjsontype=="json"):
         fjsoncontent = {}
         fprejsoncontent = fp.read(fjsonsize)
@@ -4900,22 +6109,9 @@ def ReadFileHeaderDataWithContentToArray(fp, listonly=False, contentasfile=True,
                     fjsoncontent = json.loads(fjsoncontent[0])
                 except (binascii.Error, json.decoder.JSONDecodeError, UnicodeDecodeError):
                     pass
-    if(re.findall("^\\+([0-9]+)", fseektocontent)):
-        fseektocontentasnum = int(fseektocontent.replace("+", ""))
-        if(abs(fseektocontentasnum) == 0):
-            pass
-        fp.seek(fseektocontentasnum, 1)
-    elif(re.findall("^\\-([0-9]+)", fseektocontent)):
-        fseektocontentasnum = int(fseektocontent)
-        if(abs(fseektocontentasnum) == 0):
-            pass
-        fp.seek(fseektocontentasnum, 1)
-    elif(re.findall("^([0-9]+)", fseektocontent)):
-        fseektocontentasnum = int(fseektocontent)
-        if(abs(fseektocontentasnum) == 0):
-            pass
-        fp.seek(fseektocontentasnum, 0)
-    else:
+    if(profiler is not None):
+        profiler.add('json', time.perf_counter() - pstart, fjsonsize)
+    if(not _seek_by_directive(fp, fseektocontent)):
         return False
     fjend = fp.tell() - len(delimiter)
     jsonfcs = GetFileChecksum(fprejsoncontent, fjsonchecksumtype, True, formatspecs, saltkey)
@@ -4934,72 +6130,70 @@ def ReadFileHeaderDataWithContentToArray(fp, listonly=False, contentasfile=True,
         return False
     fhend = fp.tell() - len(delimiter)
     fcontentstart = fp.tell()
-    fcontents = MkTempFile()
     pyhascontents = False
-    if(fsize > 0 and not listonly):
-        if(fcompression == "none" or fcompression == "" or fcompression == "auto"):
-            fcontents.write(fp.read(fsize))
-        else:
-            fcontents.write(fp.read(fcsize))
-        pyhascontents = True
-    elif(fsize > 0 and listonly):
-        if(fcompression == "none" or fcompression == "" or fcompression == "auto"):
-            fp.seek(fsize, 1)
-        else:
-            fp.seek(fcsize, 1)
-        pyhascontents = False
-    fcontents.seek(0, 0)
-    newfccs = GetFileChecksum(fcontents, HeaderOut[-3].lower(), False, formatspecs, saltkey)
-    fcontents.seek(0, 0)
-    if(not CheckChecksums(fccs, newfccs) and not skipchecksum and not listonly):
-        VerbosePrintOut("File Content Checksum Error with file " +
-                        fname + " at offset " + str(fcontentstart))
-        VerbosePrintOut("'" + fccs + "' != " + "'" + newfccs + "'")
-        return False
-    if(fcompression == "none" or fcompression == "" or fcompression == "auto"):
-        pass
+    if(listonly):
+        # Header-only traversal: jump over the stored bytes without reading
+        # or hashing them
+        fcontents = io.BytesIO()
+        if(fsize > 0):
+            if(fcompression == "none" or fcompression == "" or fcompression == "auto"):
+                fp.seek(fsize, 1)
+            else:
+                fp.seek(fcsize, 1)
+    elif(isinstance(fp, FileMmapReader) and (not uncompress or fcompression == "none" or fcompression == "" or fcompression == "auto")):
+        # Zero-copy: checksum and hand out the mapped stored bytes in place
+        fstoredsize = 0
+        if(fsize > 0):
+            if(fcompression == "none" or fcompression == "" or fcompression == "auto"):
+                fstoredsize = fsize
+            else:
+                fstoredsize = fcsize
+            pyhascontents = True
+        fcontents = FileSectionReader(fp, fcontentstart, fstoredsize)
+        fp.seek(fstoredsize, 1)
+        newfccs = GetFileChecksum(fcontents.getbuffer(), HeaderOut[-3].lower(), False, formatspecs, saltkey)
+        if(not CheckChecksums(fccs, newfccs) and not skipchecksum):
+            VerbosePrintOut("File Content Checksum Error with file " +
+                            fname + " at offset " + str(fcontentstart))
+            VerbosePrintOut("'" + fccs + "' != " + "'" + newfccs + "'")
+            return False
     else:
+        if(profiler is not None):
+            pstart = time.perf_counter()
+        fcontents = MkTempFile()
+        if(fsize > 0):
+            if(fcompression == "none" or fcompression == "" or fcompression == "auto"):
+                fcontents.write(fp.read(fsize))
+            else:
+                fcontents.write(fp.read(fcsize))
+            pyhascontents = True
+        if(profiler is not None):
+            profiler.add('copy', time.perf_counter() - pstart, fcontents.tell())
         fcontents.seek(0, 0)
-        if(uncompress):
-            cfcontents = UncompressFileAlt(
-                fcontents, formatspecs)
-            cfcontents.seek(0, 0)
-            fcontents = MkTempFile()
-            shutil.copyfileobj(cfcontents, fcontents, length=__filebuff_size__)
-            cfcontents.close()
-            fcontents.seek(0, 0)
-            fccs = GetFileChecksum(fcontents, HeaderOut[-3].lower(), False, formatspecs, saltkey)
+        newfccs = GetFileChecksum(fcontents, HeaderOut[-3].lower(), False, formatspecs, saltkey)
+        fcontents.seek(0, 0)
+        if(not CheckChecksums(fccs, newfccs) and not skipchecksum):
+            VerbosePrintOut("File Content Checksum Error with file " +
+                            fname + " at offset " + str(fcontentstart))
+            VerbosePrintOut("'" + fccs + "' != " + "'" + newfccs + "'")
+            return False
+        if(fcompression != "none" and fcompression != "" and fcompression != "auto" and uncompress):
+            fcontents, fccs = _uncompress_entry_contents(fcontents, HeaderOut[-3].lower(), formatspecs, saltkey)
     fcontentend = fp.tell()
-    if(re.findall("^\\+([0-9]+)", fseeknextfile)):
-        fseeknextasnum = int(fseeknextfile.replace("+", ""))
-        if(abs(fseeknextasnum) == 0):
-            pass
-        fp.seek(fseeknextasnum, 1)
-    elif(re.findall("^\\-([0-9]+)", fseeknextfile)):
-        fseeknextasnum = int(fseeknextfile)
-        if(abs(fseeknextasnum) == 0):
-            pass
-        fp.seek(fseeknextasnum, 1)
-    elif(re.findall("^([0-9]+)", fseeknextfile)):
-        fseeknextasnum = int(fseeknextfile)
-        if(abs(fseeknextasnum) == 0):
-            pass
-        fp.seek(fseeknextasnum, 0)
-    else:
+    if(not _seek_by_directive(fp, fseeknextfile)):
         return False
     fcontents.seek(0, 0)
-    if(not contentasfile):
+    if(not contentasfile and isinstance(fcontents, FileSectionReader)):
+        fcontents = fcontents.getbuffer()
+    elif(not contentasfile):
         fcontents = fcontents.read()
-    end_real = time.perf_counter()
-    end_usage = resource.getrusage(resource.RUSAGE_SELF)
+    if(profiler is not None):
+        profiler.entry('read', fname, time.perf_counter() - start_real, fsize)
     iecsize = get_readable_size(fsize, unit="IEC")
     sisize = get_readable_size(fsize, unit="SI")
     ieccsize = get_readable_size(fcsize, unit="IEC")
     sicsize = get_readable_size(fcsize, unit="SI")
-    real_time = end_real - start_real
-    user_time = end_usage.ru_utime - start_usage.ru_utime
-    sys_time = end_usage.ru_stime - start_usage.ru_stime
-    outlist = {'fheadersize': fheadsize, 'fhstart': fheaderstart, 'fhend': fhend, 'ftype': ftype, 'fencoding': fencoding, 'fcencoding': fcencoding, 'fname': fname, 'fbasedir': fbasedir, 'flinkname': flinkname, 'fsize': fsize, 'fsize_si': sisize, 'fsize_iec': iecsize, 'fblksize': fblksize, 'fblocks': fblocks, 'fflags': fflags, 'fatime': divmod(int(fatime), 10**9)[0], 'fmtime': divmod(int(fmtime), 10**9)[0], 'fctime': divmod(int(fctime), 10**9)[0], 'fbtime': divmod(int(fbtime), 10**9)[0], 'fatime_ns': fatime, 'fmtime_ns': fmtime, 'fctime_ns': fctime, 'fbtime_ns': fbtime, 'fmode': fmode, 'fchmode': fchmode, 'fstrmode': PrintPermissionString(fmode, ftype), 'ftypemod': ftypemod, 'fwinattributes': fwinattributes, 'fcompression': fcompression, 'fcsize': fcsize, 'fcsize_si': sicsize, 'fcsize_iec': ieccsize, 'fuid': fuid, 'funame': funame, 'fgid': fgid, 'fgname': fgname, 'finode': finode, 'flinkcount': flinkcount, 'fdev': fdev, 'fdev_major': fdev_major, 'fdev_minor': fdev_minor, 'frdev': frdev, 'frdev_major': frdev_major, 'frdev_minor': frdev_minor, 'fseektojson': fseektojson, 'fseektocontent': fseektocontent, 'fseeknextfile': fseeknextfile, 'fheaderchecksumtype': HeaderOut[-4], 'fjsonchecksumtype': fjsonchecksumtype, 'fcontentchecksumtype': HeaderOut[-3], 'fnumfields': fnumfields + 2, 'frawheader': HeaderOut, 'fvendorfields': fvendorfields, 'fvendordata': fvendorfieldslist, 'fextrafields': fextrafields, 'fextrafieldsize': fextrasize, 'fextradata': fextrafieldslist, 'fjsontype': fjsontype, 'fjsonlen': fjsonlen, 'fjsonsize': fjsonsize, 'fjsonrawdata': fjsonrawcontent, 'fjsondata': fjsoncontent, 'fjstart': fjstart, 'fjend': fjend, 'fheaderchecksum': fcs, 'fjsonchecksum': fjsonchecksum, 'fcontentchecksum': fccs, 'fhascontents': pyhascontents, 'fcontentstart': fcontentstart, 'fcontentend': fcontentend, 'fcontentasfile': contentasfile, 'fcontents': fcontents, 'optime': {'real': "{:.6f}".format(real_time), 'user': "{:.6f}".format(user_time), 'sys': "{:.6f}".format(sys_time)}}
+    outlist = {'fheadersize': fheadsize, 'fhstart': fheaderstart, 'fhend': fhend, 'ftype': ftype, 'fencoding': fencoding, 'fcencoding': fcencoding, 'fname': fname, 'fbasedir': fbasedir, 'flinkname': flinkname, 'fsize': fsize, 'fsize_si': sisize, 'fsize_iec': iecsize, 'fblksize': fblksize, 'fblocks': fblocks, 'fflags': fflags, 'fatime': divmod(int(fatime), 10**9)[0], 'fmtime': divmod(int(fmtime), 10**9)[0], 'fctime': divmod(int(fctime), 10**9)[0], 'fbtime': divmod(int(fbtime), 10**9)[0], 'fatime_ns': fatime, 'fmtime_ns': fmtime, 'fctime_ns': fctime, 'fbtime_ns': fbtime, 'fmode': fmode, 'fchmode': fchmode, 'fstrmode': PrintPermissionString(fmode, ftype), 'ftypemod': ftypemod, 'fwinattributes': fwinattributes, 'fcompression': fcompression, 'fcsize': fcsize, 'fcsize_si': sicsize, 'fcsize_iec': ieccsize, 'fuid': fuid, 'funame': funame, 'fgid': fgid, 'fgname': fgname, 'finode': finode, 'flinkcount': flinkcount, 'fdev': fdev, 'fdev_major': fdev_major, 'fdev_minor': fdev_minor, 'frdev': frdev, 'frdev_major': frdev_major, 'frdev_minor': frdev_minor, 'fseektojson': fseektojson, 'fseektocontent': fseektocontent, 'fseeknextfile': fseeknextfile, 'fheaderchecksumtype': HeaderOut[-4], 'fjsonchecksumtype': fjsonchecksumtype, 'fcontentchecksumtype': HeaderOut[-3], 'fnumfields': fnumfields + 2, 'frawheader': HeaderOut, 'fvendorfields': fvendorfields, 'fvendordata': fvendorfieldslist, 'fextrafields': fextrafields, 'fextrafieldsize': fextrasize, 'fextradata': fextrafieldslist, 'fjsontype': fjsontype, 'fjsonlen': fjsonlen, 'fjsonsize': fjsonsize, 'fjsonrawdata': fjsonrawcontent, 'fjsondata': fjsoncontent, 'fjstart': fjstart, 'fjend': fjend, 'fheaderchecksum': fcs, 'fjsonchecksum': fjsonchecksum, 'fcontentchecksum': fccs, 'fhascontents': pyhascontents, 'fcontentstart': fcontentstart, 'fcontentend': fcontentend, 'fcontentasfile': contentasfile, 'fcontents': fcontents}
     return outlist
 
 
@@ -5080,22 +6274,7 @@ def ReadFileHeaderDataWithContentToList(fp, listonly=False, contentasfile=False,
                 fextrafieldslist = json.loads(fextrafieldslist[0])
             except (binascii.Error, json.decoder.JSONDecodeError, UnicodeDecodeError):
                 pass
-    if(re.findall("^\\+([0-9]+)", fseektojson)):
-        fseektojsonasnum = int(fseektojson.replace("+", ""))
-        if(abs(fseektojsonasnum) == 0):
-            pass
-        fp.seek(fseektojsonasnum, 1)
-    elif(re.findall("^\\-([0-9]+)", fseektojson)):
-        fseektojsonasnum = int(fseektojson)
-        if(abs(fseektojsonasnum) == 0):
-            pass
-        fp.seek(fseektojsonasnum, 1)
-    elif(re.findall("^([0-9]+)", fseektojson)):
-        fseektojsonasnum = int(fseektojson)
-        if(abs(fseektojsonasnum) == 0):
-            pass
-        fp.seek(fseektojsonasnum, 0)
-    else:
+    if(not _seek_by_directive(fp, fseektojson)):
         return False
     fjstart = fp.tell()
     if(fjsontype=="json"):
@@ -5163,22 +6342,7 @@ def ReadFileHeaderDataWithContentToList(fp, listonly=False, contentasfile=False,
                     fjsoncontent = json.loads(fjsoncontent[0])
                 except (binascii.Error, json.decoder.JSONDecodeError, UnicodeDecodeError):
                     pass
-    if(re.findall("^\\+([0-9]+)", fseektocontent)):
-        fseektocontentasnum = int(fseektocontent.replace("+", ""))
-        if(abs(fseektocontentasnum) == 0):
-            pass
-        fp.seek(fseektocontentasnum, 1)
-    elif(re.findall("^\\-([0-9]+)", fseektocontent)):
-        fseektocontentasnum = int(fseektocontent)
-        if(abs(fseektocontentasnum) == 0):
-            pass
-        fp.seek(fseektocontentasnum, 1)
-    elif(re.findall("^([0-9]+)", fseektocontent)):
-        fseektocontentasnum = int(fseektocontent)
-        if(abs(fseektocontentasnum) == 0):
-            pass
-        fp.seek(fseektocontentasnum, 0)
-    else:
+    if(not _seek_by_directive(fp, fseektocontent)):
         return False
     fjend = fp.tell() - len(delimiter)
     jsonfcs = GetFileChecksum(fprejsoncontent, fjsonchecksumtype, True, formatspecs, saltkey)
@@ -5197,33 +6361,33 @@ def ReadFileHeaderDataWithContentToList(fp, listonly=False, contentasfile=False,
         return False
     fhend = fp.tell() - len(delimiter)
     fcontentstart = fp.tell()
-    fcontents = MkTempFile()
     pyhascontents = False
-    if(fsize > 0 and not listonly):
-        if(fcompression == "none" or fcompression == "" or fcompression == "auto"):
-            fcontents.write(fp.read(fsize))
-        else:
-            fcontents.write(fp.read(fcsize))
-        pyhascontents = True
-    elif(fsize > 0 and listonly):
-        if(fcompression == "none" or fcompression == "" or fcompression == "auto"):
-            fp.seek(fsize, 1)
-        else:
-            fp.seek(fcsize, 1)
-        pyhascontents = False
-    fcontents.seek(0, 0)
-    newfccs = GetFileChecksum(fcontents, HeaderOut[-3].lower(), False, formatspecs, saltkey)
-    fcontents.seek(0, 0)
-    if(not CheckChecksums(fccs, newfccs) and not skipchecksum and not listonly):
-        VerbosePrintOut("File Content Checksum Error with file " +
-                        fname + " at offset " + str(fcontentstart))
-        VerbosePrintOut("'" + fccs + "' != " + "'" + newfccs + "'")
-        return False
-    if(fcompression == "none" or fcompression == "" or fcompression == "auto"):
-        pass
+    if(listonly):
+        # Header-only traversal: jump over the stored bytes without reading
+        # or hashing them
+        fcontents = io.BytesIO()
+        if(fsize > 0):
+            if(fcompression == "none" or fcompression == "" or fcompression == "auto"):
+                fp.seek(fsize, 1)
+            else:
+                fp.seek(fcsize, 1)
     else:
+        fcontents = MkTempFile()
+        if(fsize > 0):
+            if(fcompression == "none" or fcompression == "" or fcompression == "auto"):
+                fcontents.write(fp.read(fsize))
+            else:
+                fcontents.write(fp.read(fcsize))
+            pyhascontents = True
         fcontents.seek(0, 0)
-        if(uncompress):
+        newfccs = GetFileChecksum(fcontents, HeaderOut[-3].lower(), False, formatspecs, saltkey)
+        fcontents.seek(0, 0)
+        if(not CheckChecksums(fccs, newfccs) and not skipchecksum):
+            VerbosePrintOut("File Content Checksum Error with file " +
+                            fname + " at offset " + str(fcontentstart))
+            VerbosePrintOut("'" + fccs + "' != " + "'" + newfccs + "'")
+            return False
+        if(fcompression != "none" and fcompression != "" and fcompression != "auto" and uncompress):
             cfcontents = UncompressFileAlt(
                 fcontents, formatspecs)
             cfcontents.seek(0, 0)
@@ -5233,22 +6397,7 @@ def ReadFileHeaderDataWithContentToList(fp, listonly=False, contentasfile=False,
             fcontents.seek(0, 0)
             fccs = GetFileChecksum(fcontents, HeaderOut[-3].lower(), False, formatspecs, saltkey)
     fcontentend = fp.tell()
-    if(re.findall("^\\+([0-9]+)", fseeknextfile)):
-        fseeknextasnum = int(fseeknextfile.replace("+", ""))
-        if(abs(fseeknextasnum) == 0):
-            pass
-        fp.seek(fseeknextasnum, 1)
-    elif(re.findall("^\\-([0-9]+)", fseeknextfile)):
-        fseeknextasnum = int(fseeknextfile)
-        if(abs(fseeknextasnum) == 0):
-            pass
-        fp.seek(fseeknextasnum, 1)
-    elif(re.findall("^([0-9]+)", fseeknextfile)):
-        fseeknextasnum = int(fseeknextfile)
-        if(abs(fseeknextasnum) == 0):
-            pass
-        fp.seek(fseeknextasnum, 0)
-    else:
+    if(not _seek_by_directive(fp, fseeknextfile)):
         return False
     fcontents.seek(0, 0)
     if(not contentasfile):
@@ -5290,22 +6439,7 @@ def ReadFileDataWithContent(fp, filestart=0, listonly=False, contentasfile=False
     fjsonsize = int(inheader[13], 16)
     fjsonchecksumtype = inheader[14]
     fjsonchecksum = inheader[15]
-    if(re.findall("^\\+([0-9]+)", outfseektojson)):
-        fseektojsonasnum = int(outfseektojson.replace("+", ""))
-        if(abs(fseektojsonasnum) == 0):
-            pass
-        fp.seek(fseektojsonasnum, 1)
-    elif(re.findall("^\\-([0-9]+)", outfseektojson)):
-        fseektojsonasnum = int(outfseektojson)
-        if(abs(fseektojsonasnum) == 0):
-            pass
-        fp.seek(fseektojsonasnum, 1)
-    elif(re.findall("^([0-9]+)", outfseektojson)):
-        fseektojsonasnum = int(outfseektojson)
-        if(abs(fseektojsonasnum) == 0):
-            pass
-        fp.seek(fseektojsonasnum, 0)
-    else:
+    if(not _seek_by_directive(fp, outfseektojson)):
         return False
     fp.read(fjsonsize)
     # Next seek directive
@@ -5334,16 +6468,16 @@ def ReadFileDataWithContent(fp, filestart=0, listonly=False, contentasfile=False
             break
         flist.append(HeaderOut)
         countnum = countnum + 1
+    if(countnum >= fnumfiles):
+        SkipFileTOC(fp, formatspecs)
     CatSize = fp.tell()
     CatSizeEnd = CatSize
     return flist
 
 
-def ReadFileDataWithContentToArray(fp, filestart=0, seekstart=0, seekend=0, listonly=False, contentasfile=True, uncompress=True, skipchecksum=False, formatspecs=__file_format_dict__, saltkey=None, seektoend=False):
+def ReadFileDataHeaderToArray(fp, filestart=0, skipchecksum=False, formatspecs=__file_format_dict__, saltkey=None):
     if(not hasattr(fp, "read")):
         return False
-    start_real = time.perf_counter()
-    start_usage = resource.getrusage(resource.RUSAGE_SELF)
     delimiter = formatspecs['format_delimiter']
     curloc = filestart
     fp.seek(curloc, 0)
@@ -5402,22 +6536,7 @@ def ReadFileDataWithContentToArray(fp, filestart=0, seekstart=0, seekend=0, list
     fjsonchecksumtype = inheader[14]
     fjsonchecksum = inheader[15]
     fjsoncontent = {}
-    if(re.findall("^\\+([0-9]+)", fseektojson)):
-        fseektojsonasnum = int(fseektojson.replace("+", ""))
-        if(abs(fseektojsonasnum) == 0):
-            pass
-        fp.seek(fseektojsonasnum, 1)
-    elif(re.findall("^\\-([0-9]+)", fseektojson)):
-        fseektojsonasnum = int(fseektojson)
-        if(abs(fseektojsonasnum) == 0):
-            pass
-        fp.seek(fseektojsonasnum, 1)
-    elif(re.findall("^([0-9]+)", fseektojson)):
-        fseektojsonasnum = int(fseektojson)
-        if(abs(fseektojsonasnum) == 0):
-            pass
-        fp.seek(fseektojsonasnum, 0)
-    else:
+    if(not _seek_by_directive(fp, fseektojson)):
         return False
     fjstart = fp.tell()
     if(fjsontype=="json"):
@@ -5486,27 +6605,11 @@ def ReadFileDataWithContentToArray(fp, filestart=0, seekstart=0, seekend=0, list
                 except (binascii.Error, json.decoder.JSONDecodeError, UnicodeDecodeError):
                     pass
     fjend = fp.tell()
-    if(re.findall("^\\+([0-9]+)", fseeknextfile)):
-        fseeknextasnum = int(fseeknextfile.replace("+", ""))
-        if(abs(fseeknextasnum) == 0):
-            pass
-        fp.seek(fseeknextasnum, 1)
-    elif(re.findall("^\\-([0-9]+)", fseeknextfile)):
-        fseeknextasnum = int(fseeknextfile)
-        if(abs(fseeknextasnum) == 0):
-            pass
-        fp.seek(fseeknextasnum, 1)
-    elif(re.findall("^([0-9]+)", fseeknextfile)):
-        fseeknextasnum = int(fseeknextfile)
-        if(abs(fseeknextasnum) == 0):
-            pass
-        fp.seek(fseeknextasnum, 0)
-    else:
+    if(not _seek_by_directive(fp, fseeknextfile)):
         return False
     jsonfcs = GetFileChecksum(fprejsoncontent, fjsonchecksumtype, True, formatspecs, saltkey)
     if(not CheckChecksums(fjsonchecksum, jsonfcs) and not skipchecksum):
-        VerbosePrintOut("File JSON Data Checksum Error with file " +
-                        fname + " at offset " + str(fheaderstart))
+        VerbosePrintOut("File JSON Data Checksum Error with file at offset " + str(headeroffset))
         VerbosePrintOut("'" + fjsonchecksum + "' != " + "'" + jsonfcs + "'")
         return False
     fprechecksumtype = inheader[-2]
@@ -5522,133 +6625,58 @@ def ReadFileDataWithContentToArray(fp, filestart=0, seekstart=0, seekend=0, list
     formversions = re.search('(.*?)(\\d+)', formstring).groups()
     fcompresstype = ""
     outlist = {'fnumfiles': fnumfiles, 'fhstart': headeroffset, 'fhend': headeroffsetend, 'fformat': formversions[0], 'fcompression': fcompresstype, 'fencoding': fhencoding, 'fmtime': fheadmtime, 'fctime': fheadctime, 'fversion': formversions[1], 'fostype': fostype, 'fprojectname': fprojectname, 'fimptype': fpythontype, 'fheadersize': fheadsize, 'fnumfields': fnumfields + 2, 'fformatspecs': formatspecs, 'fseektojson': fseektojson, 'fseeknextfile': fseeknextfile, 'fchecksumtype': fprechecksumtype, 'fheaderchecksum': fprechecksum, 'fjsonchecksumtype': fjsonchecksumtype, 'fjsontype': fjsontype, 'fjsonlen': fjsonlen, 'fjsonsize': fjsonsize, 'fjsonrawdata': fjsonrawcontent, 'fjsondata': fjsoncontent, 'fjstart': fjstart, 'fjend': fjend, 'fjsonchecksum': fjsonchecksum, 'frawheader': [formstring] + inheader, 'fextrafields': fnumextrafields, 'fextrafieldsize': fnumextrafieldsize, 'fextradata': fextrafieldslist, 'fvendorfields': fvendorfields, 'fvendordata': fvendorfieldslist, 'ffilelist': []}
+    return outlist
+
+
+def ReadFileDataWithContentToArray(fp, filestart=0, seekstart=0, seekend=0, listonly=False, contentasfile=True, uncompress=True, skipchecksum=False, formatspecs=__file_format_dict__, saltkey=None, seektoend=False, workers=1):
+    if(not hasattr(fp, "read")):
+        return False
+    outlist = ReadFileDataHeaderToArray(fp, filestart, skipchecksum, formatspecs, saltkey)
+    if(not outlist):
+        return False
+    fnumfiles = outlist['fnumfiles']
     if (seekstart < 0) or (seekstart > fnumfiles):
         seekstart = 0
     if (seekend == 0) or (seekend > fnumfiles) or (seekend < seekstart):
         seekend = fnumfiles
     elif (seekend < 0) and (abs(seekend) <= fnumfiles) and (abs(seekend) >= seekstart):
         seekend = fnumfiles - abs(seekend)
-    if(seekstart > 0):
-        il = 0
-        while(il < seekstart):
-            prefhstart = fp.tell()
-            preheaderdata = ReadFileHeaderDataBySize(fp, formatspecs['format_delimiter'])
-            if(len(preheaderdata) == 0):
-                break
-            prefsize = int(preheaderdata[5], 16)
-            prefname = preheaderdata[5]
-            prefseektojson = preheaderdata[26]
-            prefseektocontent = preheaderdata[27]
-            prefseeknextfile = preheaderdata[28]
-            prefjsonlen = int(preheaderdata[30], 16)
-            prefjsonsize = int(preheaderdata[31], 16)
-            prefjsonchecksumtype = preheaderdata[32]
-            prefjsonchecksum = preheaderdata[33]
-            if(re.findall("^\\+([0-9]+)", prefseektojson)):
-                fseektojsonasnum = int(prefseektojson.replace("+", ""))
-                if(abs(fseektojsonasnum) == 0):
-                    pass
-                fp.seek(fseektojsonasnum, 1)
-            elif(re.findall("^\\-([0-9]+)", prefseektojson)):
-                fseektojsonasnum = int(prefseektojson)
-                if(abs(fseektojsonasnum) == 0):
-                    pass
-                fp.seek(fseektojsonasnum, 1)
-            elif(re.findall("^([0-9]+)", prefseektojson)):
-                fseektojsonasnum = int(prefseektojson)
-                if(abs(fseektojsonasnum) == 0):
-                    pass
-                fp.seek(fseektojsonasnum, 0)
-            else:
-                return False
-            prejsoncontent = fp.read(prefjsonsize).decode("UTF-8")
-            if(re.findall("^\\+([0-9]+)", prefseektocontent)):
-                fseektocontentasnum = int(prefseektocontent.replace("+", ""))
-                if(abs(fseektocontentasnum) == 0):
-                    pass
-                fp.seek(fseektocontentasnum, 1)
-            elif(re.findall("^\\-([0-9]+)", prefseektocontent)):
-                fseektocontentasnum = int(prefseektocontent)
-                if(abs(fseektocontentasnum) == 0):
-                    pass
-                fp.seek(fseektocontentasnum, 1)
-            elif(re.findall("^([0-9]+)", prefseektocontent)):
-                fseektocontentasnum = int(prefseektocontent)
-                if(abs(fseektocontentasnum) == 0):
-                    pass
-                fp.seek(fseektocontentasnum, 0)
-            else:
-                return False
-            prejsonfcs = GetFileChecksum(prejsoncontent, prefjsonchecksumtype, True, formatspecs, saltkey)
-            if(not CheckChecksums(prefjsonchecksum, prejsonfcs) and not skipchecksum):
-                VerbosePrintOut("File JSON Data Checksum Error with file " +
-                                prefname + " at offset " + str(prefhstart))
-                VerbosePrintOut("'" + prefjsonchecksum + "' != " + "'" + prejsonfcs + "'")
-                return False
-            prenewfcs = GetHeaderChecksum(preheaderdata[:-2], preheaderdata[-4].lower(), True, formatspecs, saltkey)
-            prefcs = preheaderdata[-2]
-            if(not CheckChecksums(prefcs, prenewfcs) and not skipchecksum):
-                VerbosePrintOut("File Header Checksum Error with file " +
-                                 prefname + " at offset " + str(prefhstart))
-                VerbosePrintOut("'" + prefcs + "' != " +
-                                "'" + prenewfcs + "'")
-                return False
-                valid_archive = False
-                invalid_archive = True
-            prefhend = fp.tell() - len(delimiter)
-            prefcontentstart = fp.tell()
-            prefcontents = MkTempFile()
-            pyhascontents = False
-            if(prefsize > 0):
-                prefcontents.write(fp.read(prefsize))
-                prefcontents.seek(0, 0)
-                prenewfccs = GetFileChecksum(prefcontents, preheaderdata[-3].lower(), False, formatspecs, saltkey)
-                prefccs = preheaderdata[-1]
-                pyhascontents = True
-                if(not CheckChecksums(prefccs, prenewfccs) and not skipchecksum):
-                    VerbosePrintOut("File Content Checksum Error with file " +
-                                    prefname + " at offset " + str(prefcontentstart))
-                    VerbosePrintOut("'" + prefccs +
-                                    "' != " + "'" + prenewfccs + "'")
-                    return False
-            if(re.findall("^\\+([0-9]+)", prefseeknextfile)):
-                fseeknextasnum = int(prefseeknextfile.replace("+", ""))
-                if(abs(fseeknextasnum) == 0):
-                    pass
-                fp.seek(fseeknextasnum, 1)
-            elif(re.findall("^\\-([0-9]+)", prefseeknextfile)):
-                fseeknextasnum = int(prefseeknextfile)
-                if(abs(fseeknextasnum) == 0):
-                    pass
-                fp.seek(fseeknextasnum, 1)
-            elif(re.findall("^([0-9]+)", prefseeknextfile)):
-                fseeknextasnum = int(prefseeknextfile)
-                if(abs(fseeknextasnum) == 0):
-                    pass
-                fp.seek(fseeknextasnum, 0)
-            else:
-                return False
-            il = il + 1
+    if(not SeekToFileEntry(fp, seekstart, outlist, skipchecksum, formatspecs, saltkey)):
+        return False
     realidnum = 0
     countnum = seekstart
-    while (countnum < seekend):
-        HeaderOut = ReadFileHeaderDataWithContentToArray(fp, listonly, contentasfile, uncompress, skipchecksum, formatspecs, saltkey)
-        if(len(HeaderOut) == 0):
-            break
-        HeaderOut.update({'fid': realidnum, 'fidalt': realidnum})
-        outlist['ffilelist'].append(HeaderOut)
-        countnum = countnum + 1
-        realidnum = realidnum + 1
-    end_real = time.perf_counter()
-    end_usage = resource.getrusage(resource.RUSAGE_SELF)
+    # Per-entry decompression goes to a thread pool (zlib, bz2 and lzma
+    # release the GIL) while headers keep being parsed here; at most a
+    # couple of members per worker are in flight at once
+    decompressor = None
+    if(workers is not None and workers > 1 and uncompress and not listonly):
+        decompressor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    pending = []
+    try:
+        while (countnum < seekend):
+            HeaderOut = ReadFileHeaderDataWithContentToArray(fp, listonly, contentasfile, uncompress and decompressor is None, skipchecksum, formatspecs, saltkey)
+            if(not HeaderOut):
+                break
+            HeaderOut.update({'fid': realidnum, 'fidalt': realidnum})
+            outlist['ffilelist'].append(HeaderOut)
+            if(decompressor is not None and HeaderOut['fcompression'] != "none" and HeaderOut['fcompression'] != "" and HeaderOut['fcompression'] != "auto"):
+                pending.append((HeaderOut, decompressor.submit(_uncompress_entry_contents, HeaderOut['fcontents'], HeaderOut['fcontentchecksumtype'].lower(), formatspecs, saltkey)))
+            while(len(pending) > workers * 2):
+                _finish_uncompress_entry(pending.pop(0), contentasfile)
+            countnum = countnum + 1
+            realidnum = realidnum + 1
+        while(pending):
+            _finish_uncompress_entry(pending.pop(0), contentasfile)
+    finally:
+        if(decompressor is not None):
+            decompressor.shutdown(wait=True)
+    if(countnum >= fnumfiles):
+        SkipFileTOC(fp, formatspecs)
     CatSize = fp.tell()
     CatSizeEnd = CatSize
     iecsize = get_readable_size(CatSizeEnd, unit="IEC")
     sisize = get_readable_size(CatSizeEnd, unit="SI")
-    real_time = end_real - start_real
-    user_time = end_usage.ru_utime - start_usage.ru_utime
-    sys_time = end_usage.ru_stime - start_usage.ru_stime
-    outlist.update({'fp': fp, 'fsize': CatSizeEnd, 'fsize_si': sisize, 'fsize_iec': iecsize, 'optime': {'real': "{:.6f}".format(real_time), 'user': "{:.6f}".format(user_time), 'sys': "{:.6f}".format(sys_time)}})
+    outlist.update({'fp': fp, 'fsize': CatSizeEnd, 'fsize_si': sisize, 'fsize_iec': iecsize})
     return outlist
 
 
@@ -5712,22 +6740,7 @@ def ReadFileDataWithContentToList(fp, filestart=0, seekstart=0, seekend=0, listo
     fjsonchecksumtype = inheader[14]
     fjsonchecksum = inheader[15]
     fjsoncontent = {}
-    if(re.findall("^\\+([0-9]+)", fseektojson)):
-        fseektojsonasnum = int(fseektojson.replace("+", ""))
-        if(abs(fseektojsonasnum) == 0):
-            pass
-        fp.seek(fseektojsonasnum, 1)
-    elif(re.findall("^\\-([0-9]+)", fseektojson)):
-        fseektojsonasnum = int(fseektojson)
-        if(abs(fseektojsonasnum) == 0):
-            pass
-        fp.seek(fseektojsonasnum, 1)
-    elif(re.findall("^([0-9]+)", fseektojson)):
-        fseektojsonasnum = int(fseektojson)
-        if(abs(fseektojsonasnum) == 0):
-            pass
-        fp.seek(fseektojsonasnum, 0)
-    else:
+    if(not _seek_by_directive(fp, fseektojson)):
         return False
     fjstart = fp.tell()
     if(fjsontype=="json"):
@@ -5796,22 +6809,7 @@ def ReadFileDataWithContentToList(fp, filestart=0, seekstart=0, seekend=0, listo
                 except (binascii.Error, json.decoder.JSONDecodeError, UnicodeDecodeError):
                     pass
     fjend = fp.tell()
-    if(re.findall("^\\+([0-9]+)", fseeknextfile)):
-        fseeknextasnum = int(fseeknextfile.replace("+", ""))
-        if(abs(fseeknextasnum) == 0):
-            pass
-        fp.seek(fseeknextasnum, 1)
-    elif(re.findall("^\\-([0-9]+)", fseeknextfile)):
-        fseeknextasnum = int(fseeknextfile)
-        if(abs(fseeknextasnum) == 0):
-            pass
-        fp.seek(fseeknextasnum, 1)
-    elif(re.findall("^([0-9]+)", fseeknextfile)):
-        fseeknextasnum = int(fseeknextfile)
-        if(abs(fseeknextasnum) == 0):
-            pass
-        fp.seek(fseeknextasnum, 0)
-    else:
+    if(not _seek_by_directive(fp, fseeknextfile)):
         return False
     jsonfcs = GetFileChecksum(fprejsoncontent, fjsonchecksumtype, True, formatspecs, saltkey)
     if(not CheckChecksums(fjsonchecksum, jsonfcs) and not skipchecksum):
@@ -5837,107 +6835,8 @@ def ReadFileDataWithContentToList(fp, filestart=0, seekstart=0, seekend=0, listo
         seekend = fnumfiles
     elif (seekend < 0) and (abs(seekend) <= fnumfiles) and (abs(seekend) >= seekstart):
         seekend = fnumfiles - abs(seekend)
-    if(seekstart > 0):
-        il = 0
-        while(il < seekstart):
-            prefhstart = fp.tell()
-            preheaderdata = ReadFileHeaderDataBySize(fp, formatspecs['format_delimiter'])
-            if(len(preheaderdata) == 0):
-                break
-            prefsize = int(preheaderdata[5], 16)
-            prefname = preheaderdata[5]
-            prefseektojson = preheaderdata[26]
-            prefseektocontent = preheaderdata[27]
-            prefseeknextfile = preheaderdata[28]
-            prefjsonlen = int(preheaderdata[30], 16)
-            prefjsonsize = int(preheaderdata[31], 16)
-            prefjsonchecksumtype = preheaderdata[32]
-            prefjsonchecksum = preheaderdata[33]
-            if(re.findall("^\\+([0-9]+)", prefseektojson)):
-                fseektojsonasnum = int(prefseektojson.replace("+", ""))
-                if(abs(fseektojsonasnum) == 0):
-                    pass
-                fp.seek(fseektojsonasnum, 1)
-            elif(re.findall("^\\-([0-9]+)", prefseektojson)):
-                fseektojsonasnum = int(prefseektojson)
-                if(abs(fseektojsonasnum) == 0):
-                    pass
-                fp.seek(fseektojsonasnum, 1)
-            elif(re.findall("^([0-9]+)", prefseektojson)):
-                fseektojsonasnum = int(prefseektojson)
-                if(abs(fseektojsonasnum) == 0):
-                    pass
-                fp.seek(fseektojsonasnum, 0)
-            else:
-                return False
-            prejsoncontent = fp.read(prefjsonsize).decode("UTF-8")
-            if(re.findall("^\\+([0-9]+)", prefseektocontent)):
-                fseektocontentasnum = int(prefseektocontent.replace("+", ""))
-                if(abs(fseektocontentasnum) == 0):
-                    pass
-                fp.seek(fseektocontentasnum, 1)
-            elif(re.findall("^\\-([0-9]+)", prefseektocontent)):
-                fseektocontentasnum = int(prefseektocontent)
-                if(abs(fseektocontentasnum) == 0):
-                    pass
-                fp.seek(fseektocontentasnum, 1)
-            elif(re.findall("^([0-9]+)", prefseektocontent)):
-                fseektocontentasnum = int(prefseektocontent)
-                if(abs(fseektocontentasnum) == 0):
-                    pass
-                fp.seek(fseektocontentasnum, 0)
-            else:
-                return False
-            prejsonfcs = GetFileChecksum(prejsoncontent, prefjsonchecksumtype, True, formatspecs, saltkey)
-            if(not CheckChecksums(prefjsonchecksum, prejsonfcs) and not skipchecksum):
-                VerbosePrintOut("File JSON Data Checksum Error with file " +
-                                prefname + " at offset " + str(prefhstart))
-                VerbosePrintOut("'" + prefjsonchecksum + "' != " + "'" + prejsonfcs + "'")
-                return False
-            prenewfcs = GetHeaderChecksum(preheaderdata[:-2], preheaderdata[-4].lower(), True, formatspecs, saltkey)
-            prefcs = preheaderdata[-2]
-            if(not CheckChecksums(prefcs, prenewfcs) and not skipchecksum):
-                VerbosePrintOut("File Header Checksum Error with file " +
-                                 prefname + " at offset " + str(prefhstart))
-                VerbosePrintOut("'" + prefcs + "' != " +
-                                "'" + prenewfcs + "'")
-                return False
-                valid_archive = False
-                invalid_archive = True
-            prefhend = fp.tell() - len(delimiter)
-            prefcontentstart = fp.tell()
-            prefcontents = MkTempFile()
-            pyhascontents = False
-            if(prefsize > 0):
-                prefcontents.write(fp.read(prefsize))
-                prefcontents.seek(0, 0)
-                prenewfccs = GetFileChecksum(prefcontents, preheaderdata[-3].lower(), False, formatspecs, saltkey)
-                prefccs = preheaderdata[-1]
-                pyhascontents = True
-                if(not CheckChecksums(prefccs, prenewfccs) and not skipchecksum):
-                    VerbosePrintOut("File Content Checksum Error with file " +
-                                    prefname + " at offset " + str(prefcontentstart))
-                    VerbosePrintOut("'" + prefccs +
-                                    "' != " + "'" + prenewfccs + "'")
-                    return False
-            if(re.findall("^\\+([0-9]+)", prefseeknextfile)):
-                fseeknextasnum = int(prefseeknextfile.replace("+", ""))
-                if(abs(fseeknextasnum) == 0):
-                    pass
-                fp.seek(fseeknextasnum, 1)
-            elif(re.findall("^\\-([0-9]+)", prefseeknextfile)):
-                fseeknextasnum = int(prefseeknextfile)
-                if(abs(fseeknextasnum) == 0):
-                    pass
-                fp.seek(fseeknextasnum, 1)
-            elif(re.findall("^([0-9]+)", prefseeknextfile)):
-                fseeknextasnum = int(prefseeknextfile)
-                if(abs(fseeknextasnum) == 0):
-                    pass
-                fp.seek(fseeknextasnum, 0)
-            else:
-                return False
-            il = il + 1
+    if(not SeekToFileEntry(fp, seekstart, {'fhstart': headeroffset, 'fnumfiles': fnumfiles, 'fheaderchecksum': fprechecksum}, skipchecksum, formatspecs, saltkey)):
+        return False
     realidnum = 0
     countnum = seekstart
     while (countnum < seekend):
@@ -5947,12 +6846,14 @@ def ReadFileDataWithContentToList(fp, filestart=0, seekstart=0, seekend=0, listo
         outlist.append(HeaderOut)
         countnum = countnum + 1
         realidnum = realidnum + 1
+    if(countnum >= fnumfiles):
+        SkipFileTOC(fp, formatspecs)
     CatSize = fp.tell()
     CatSizeEnd = CatSize
     return outlist
 
 
-def ReadInFileWithContentToArray(infile, fmttype="auto", filestart=0, seekstart=0, seekend=0, listonly=False, contentasfile=True, uncompress=True, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False):
+def ReadInFileWithContentToArray(infile, fmttype="auto", filestart=0, seekstart=0, seekend=0, listonly=False, contentasfile=True, uncompress=True, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False, usemmap=__use_mmap__, workers=1):
     if(hasattr(infile, "read")):
         fp = infile
         try:
@@ -5993,7 +6894,14 @@ def ReadInFileWithContentToArray(infile, fmttype="auto", filestart=0, seekstart=
         currentfilepos = fp.tell()
     else:
         infile = RemoveWindowsPath(infile)
-        fp = open(infile, "rb")
+        fp = None
+        if(usemmap and os.path.isfile(infile)):
+            try:
+                fp = FileMmapReader(infile)
+            except (ValueError, OSError):
+                fp = None
+        if(fp is None):
+            fp = open(infile, "rb")
         try:
             fp.seek(0, 2)
         except (OSError, ValueError):
@@ -6027,7 +6935,7 @@ def ReadInFileWithContentToArray(infile, fmttype="auto", filestart=0, seekstart=
             else:
                 break
             readfp.seek(oldfppos, 0)
-            ArchiveList.append(ReadFileDataWithContentToArray(readfp, currentfilepos, seekstart, seekend, listonly, contentasfile, uncompress, skipchecksum, informatspecs, saltkey, seektoend))
+            ArchiveList.append(ReadFileDataWithContentToArray(readfp, currentfilepos, seekstart, seekend, listonly, contentasfile, uncompress, skipchecksum, informatspecs, saltkey, seektoend, workers))
             currentfilepos = readfp.tell()
         else:
             infp = UncompressFileAlt(readfp, formatspecs, currentfilepos)
@@ -6043,7 +6951,7 @@ def ReadInFileWithContentToArray(infile, fmttype="auto", filestart=0, seekstart=
                 else:
                     break
                 infp.seek(oldinfppos, 0)
-                ArchiveList.append(ReadFileDataWithContentToArray(infp, currentinfilepos, seekstart, seekend, listonly, contentasfile, uncompress, skipchecksum, informatspecs, saltkey, seektoend))
+                ArchiveList.append(ReadFileDataWithContentToArray(infp, currentinfilepos, seekstart, seekend, listonly, contentasfile, uncompress, skipchecksum, informatspecs, saltkey, seektoend, workers))
                 currentinfilepos = infp.tell()
             currentfilepos = readfp.tell()
     return ArchiveList
@@ -6063,127 +6971,929 @@ def ReadInMultipleFilesWithContentToArray(infile, fmttype="auto", filestart=0, s
     return ReadInMultipleFileWithContentToArray(infile, fmttype, filestart, seekstart, seekend, listonly, contentasfile, uncompress, skipchecksum, formatspecs, saltkey, seektoend)
 
 
-def ReadInFileWithContentToList(infile, fmttype="auto", filestart=0, seekstart=0, seekend=0, listonly=False, contentasfile=True, uncompress=True, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False):
-    if(hasattr(infile, "read")):
-        fp = infile
-        try:
-            fp.seek(0, 2)
-        except (OSError, ValueError):
-            SeekToEndOfFile(fp)
-        outfsize = fp.tell()
-        fp.seek(filestart, 0)
-        currentfilepos = fp.tell()
-    elif(infile == "-"):
-        fp = MkTempFile()
-        shutil.copyfileobj(PY_STDIN_BUF, fp, length=__filebuff_size__)
-        try:
-            fp.seek(0, 2)
-        except (OSError, ValueError):
-            SeekToEndOfFile(fp)
-        outfsize = fp.tell()
-        fp.seek(filestart, 0)
-        currentfilepos = fp.tell()
-    elif(isinstance(infile, bytes)):
-        fp = MkTempFile()
-        fp.write(infile)
-        try:
-            fp.seek(0, 2)
-        except (OSError, ValueError):
-            SeekToEndOfFile(fp)
-        outfsize = fp.tell()
-        fp.seek(filestart, 0)
-        currentfilepos = fp.tell()
-    elif(re.findall(__download_proto_support__, infile) and pywwwget):
-        fp = download_file_from_internet_file(infile)
-        try:
-            fp.seek(0, 2)
-        except (OSError, ValueError):
-            SeekToEndOfFile(fp)
-        outfsize = fp.tell()
-        fp.seek(filestart, 0)
-        currentfilepos = fp.tell()
-    else:
-        infile = RemoveWindowsPath(infile)
-        fp = open(infile, "rb")
-        try:
-            fp.seek(0, 2)
-        except (OSError, ValueError):
-            SeekToEndOfFile(fp)
-        outfsize = fp.tell()
-        fp.seek(filestart, 0)
-        currentfilepos = fp.tell()
-    readfp = fp
-    ArchiveList = []
-    while True:
-        if currentfilepos >= outfsize:   # stop when function signals False
-            break
-        oldfppos = readfp.tell()
-        compresscheck = CheckCompressionType(readfp, formatspecs, currentfilepos, False)
-        if(IsNestedDict(formatspecs) and compresscheck in formatspecs):
-            pass
-        else:
-            checkcompressfile = CheckCompressionSubType(readfp, formatspecs, currentfilepos, False)
-            if(IsNestedDict(formatspecs) and checkcompressfile in formatspecs):
-                pass
-            else:
-                break
-        readfp.seek(oldfppos, 0)
-        if(compresscheck in formatspecs):
-            if currentfilepos >= outfsize:   # stop when function signals False
-                break
-            oldfppos = readfp.tell()
-            compresscheck = CheckCompressionType(readfp, formatspecs, currentfilepos, False)
-            if(IsNestedDict(formatspecs) and compresscheck in formatspecs):
-                informatspecs = formatspecs[compresscheck]
-            else:
-                break
-            readfp.seek(oldfppos, 0)
-            ArchiveList.append(ReadFileDataWithContentToList(readfp, currentfilepos, seekstart, seekend, listonly, contentasfile, uncompress, skipchecksum, informatspecs, saltkey, seektoend))
-            currentfilepos = readfp.tell()
-        else:
-            infp = UncompressFileAlt(readfp, formatspecs, currentfilepos)
-            if(not infp):
-                break
-            infp.seek(0, 0)
-            currentinfilepos = infp.tell()
-            while True:
-                oldinfppos = infp.tell()
-                compresscheck = CheckCompressionType(infp, formatspecs, currentinfilepos, False)
-                if(IsNestedDict(formatspecs) and compresscheck in formatspecs):
-                    informatspecs = formatspecs[compresscheck]
-                else:
-                    break
-                infp.seek(oldinfppos, 0)
-                ArchiveList.append(ReadFileDataWithContentToList(infp, currentinfilepos, seekstart, seekend, listonly, contentasfile, uncompress, skipchecksum, informatspecs, saltkey, seektoend))
-                currentinfilepos = infp.tell()
-            currentfilepos = readfp.tell()
-    return ArchiveList
-
+def SeekToFileEntry(fp, seekstart=0, archiveheader=None, skipchecksum=False, formatspecs=__file_format_dict__, saltkey=None):
+    if(seekstart <= 0):
+        return True
+    if(archiveheader is not None):
+        ftoc = FindFileIndex(fp, archiveheader['fhstart'], skipchecksum, formatspecs, saltkey, archiveheader['fheaderchecksum'])
+        if(ftoc and ftoc['fnumfiles'] == archiveheader['fnumfiles']):
+            if(seekstart < ftoc['fnumfiles']):
+                fp.seek(ftoc['ffilelist'][seekstart]['fhstart'], 0)
+                return True
+            elif('ftocstart' in ftoc):
+                fp.seek(ftoc['ftocstart'], 0)
+                return True
+    il = 0
+    while(il < seekstart):
+        if(not ReadFileHeaderDataToEntry(fp, False, skipchecksum, formatspecs, saltkey)):
+            return False
+        il = il + 1
+    return True
 
-def ReadInMultipleFileWithContentToList(infile, fmttype="auto", filestart=0, seekstart=0, seekend=0, listonly=False, contentasfile=True, uncompress=True, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False):
-    if(isinstance(infile, (list, tuple, ))):
-        pass
-    else:
-        infile = [infile]
-    outretval = {}
-    for curfname in infile:
-        outretval.append(ReadInFileWithContentToList(curfname, "auto", filestart, seekstart, seekend, listonly, contentasfile, uncompress, skipchecksum, formatspecs, saltkey, seektoend))
-    return outretval
 
-def ReadInMultipleFilesWithContentToList(infile, fmttype="auto", filestart=0, seekstart=0, seekend=0, listonly=False, contentasfile=True, uncompress=True, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False):
-    return ReadInMultipleFileWithContentToList(infile, fmttype, filestart, seekstart, seekend, listonly, contentasfile, uncompress, skipchecksum, formatspecs, saltkey, seektoend)
+def _member_name_filter(include=None, exclude=None):
+    """Return a callable that tests entry names, or None to select all.
 
-def AppendFileHeader(fp, fmttype="auto", numfiles=0, fencoding="UTF-8", extradata=[], jsondata={}, checksumtype=["md5", "md5"], formatspecs=__file_format_dict__, saltkey=None):
-    """
-    Build and write the archive file header.
-    Returns the same file-like 'fp' on success, or False on failure.
-    NOTE: This preserves the original field ordering & sizing logic.
+    include/exclude take a pattern or list of fnmatch patterns; a pattern
+    also selects everything below it, as with tar.  include may also be a
+    callable that is used as-is before exclude is applied.
     """
-    # basic capability
-    if not hasattr(fp, "write"):
+    if(include is None and exclude is None):
+        return None
+    def _patterns(inpatterns):
+        if(inpatterns is None):
+            return []
+        if(isinstance(inpatterns, str)):
+            inpatterns = [inpatterns]
+        return [_normalize_index_path(x) for x in inpatterns]
+    def _matches(fname, patterns):
+        for curpattern in patterns:
+            if(fnmatch.fnmatchcase(fname, curpattern) or (curpattern != "" and fname.startswith(curpattern + "/"))):
+                return True
         return False
+    includelist = None if callable(include) else _patterns(include)
+    excludelist = _patterns(exclude)
+    def _namefilter(fname):
+        normname = _normalize_index_path(fname)
+        if(excludelist and _matches(normname, excludelist)):
+            return False
+        if(includelist is None):
+            return include is None or include(fname)
+        return not includelist or _matches(normname, includelist)
+    return _namefilter
 
-    if(IsNestedDict(formatspecs) and fmttype in formatspecs):
+
+def _iter_archive_entries(fp, filestart=0, seekstart=0, seekend=0, listonly=False, uncompress=True, skipchecksum=False, formatspecs=__file_format_dict__, saltkey=None, archivelist=None, namefilter=None, headerfilter=None):
+    archiveheader = ReadFileDataHeaderToArray(fp, filestart, skipchecksum, formatspecs, saltkey)
+    if(not archiveheader):
+        return False
+    archiveheader.update({'fp': fp})
+    if(archivelist is not None):
+        archivelist.append(archiveheader)
+    fnumfiles = archiveheader['fnumfiles']
+    if (seekstart < 0) or (seekstart > fnumfiles):
+        seekstart = 0
+    if (seekend == 0) or (seekend > fnumfiles) or (seekend < seekstart):
+        seekend = fnumfiles
+    elif (seekend < 0) and (abs(seekend) <= fnumfiles) and (abs(seekend) >= seekstart):
+        seekend = fnumfiles - abs(seekend)
+    if(namefilter is not None):
+        # with a TOC or sidecar index only the selected headers are read
+        ftoc = FindFileIndex(fp, archiveheader['fhstart'], skipchecksum, formatspecs, saltkey, archiveheader['fheaderchecksum'])
+        if(ftoc and ftoc['fnumfiles'] == fnumfiles):
+            archiveread = yield from _iter_indexed_entries(fp, archiveheader, ftoc, seekstart, seekend, listonly, uncompress, skipchecksum, formatspecs, saltkey, namefilter, headerfilter)
+            return archiveread
+    if(not SeekToFileEntry(fp, seekstart, archiveheader, skipchecksum, formatspecs, saltkey)):
+        return False
+    countnum = seekstart
+    while(countnum < seekend):
+        curentry = ReadFileHeaderDataToEntry(fp, uncompress, skipchecksum, formatspecs, saltkey, headerfilter)
+        if(curentry is None):
+            countnum = countnum + 1
+            continue
+        if(not curentry):
+            return False
+        nextentrypos = fp.tell()
+        if(namefilter is not None and not namefilter(curentry['fname'])):
+            countnum = countnum + 1
+            continue
+        fcontents = None
+        if(not listonly):
+            if(not skipchecksum and not curentry.verify_contents()):
+                VerbosePrintOut("File Content Checksum Error with file " +
+                                curentry['fname'] + " at offset " + str(curentry['fcontentstart']))
+                return False
+            fcontents = curentry.open_contents(uncompress)
+        curentry.update({'fid': countnum, 'fidalt': countnum, 'fhascontents': (fcontents is not None and curentry['fsize'] > 0), 'fcontents': fcontents, 'farchive': archiveheader})
+        yield curentry
+        fp.seek(nextentrypos, 0)
+        countnum = countnum + 1
+    if(countnum < fnumfiles):
+        return False
+    SkipFileTOC(fp, formatspecs)
+    return True
+
+
+def _iter_indexed_entries(fp, archiveheader, ftoc, seekstart, seekend, listonly=False, uncompress=True, skipchecksum=False, formatspecs=__file_format_dict__, saltkey=None, namefilter=None, headerfilter=None):
+    countnum = seekstart
+    while(countnum < seekend):
+        tocentry = ftoc['ffilelist'][countnum]
+        if(not namefilter(tocentry['fname'])):
+            countnum = countnum + 1
+            continue
+        fp.seek(tocentry['fhstart'], 0)
+        curentry = ReadFileHeaderDataToEntry(fp, uncompress, skipchecksum, formatspecs, saltkey, headerfilter)
+        if(curentry is None):
+            countnum = countnum + 1
+            continue
+        if(not curentry):
+            return False
+        nextentrypos = fp.tell()
+        fcontents = None
+        if(not listonly):
+            if(not skipchecksum and not curentry.verify_contents()):
+                VerbosePrintOut("File Content Checksum Error with file " +
+                                curentry['fname'] + " at offset " + str(curentry['fcontentstart']))
+                return False
+            fcontents = curentry.open_contents(uncompress)
+        curentry.update({'fid': countnum, 'fidalt': countnum, 'fhascontents': (fcontents is not None and curentry['fsize'] > 0), 'fcontents': fcontents, 'farchive': archiveheader})
+        yield curentry
+        fp.seek(nextentrypos, 0)
+        countnum = countnum + 1
+    # leave fp at the end of this archive so stacked archives keep working
+    if('ftocstart' in ftoc):
+        fp.seek(ftoc['ftocstart'], 0)
+        SkipFileTOC(fp, formatspecs)
+    elif(ftoc['fnumfiles'] > 0):
+        fp.seek(ftoc['ffilelist'][-1]['fhstart'], 0)
+        if(not ReadFileHeaderDataToEntry(fp, False, True, formatspecs, saltkey)):
+            return False
+    return True
+
+
+def IterArchiveFile(infile, fmttype="auto", filestart=0, seekstart=0, seekend=0, listonly=False, uncompress=True, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None, archivelist=None, closefp=True, namefilter=None, headerfilter=None):
+    """
+    Yield the entries of every (stacked) archive in infile one at a time.
+    'fcontents' is a FileSectionReader over the stored bytes (wrapped in a
+    decompressor when uncompress is set) and 'farchive' is the header dict
+    of the archive the entry belongs to.  Only the current entry is held in
+    memory; pass a list as archivelist to collect the archive headers.
+    namefilter is a callable on 'fname'; entries it rejects are skipped
+    without touching their content.  headerfilter is a callable on the raw
+    header field list, applied before the JSON is read or any checksum is
+    checked.
+    """
+    if(IsNestedDict(formatspecs) and fmttype!="auto" and fmttype in formatspecs):
+        formatspecs = formatspecs[fmttype]
+    fp = _open_archive_infile(infile)
+    if(not fp):
+        return
+    try:
+        currentfilepos = filestart
+        while True:
+            informatspecs = _get_archive_formatspecs(fp, currentfilepos, formatspecs)
+            if(informatspecs is not None):
+                archiveread = yield from _iter_archive_entries(fp, currentfilepos, seekstart, seekend, listonly, uncompress, skipchecksum, informatspecs, saltkey, archivelist, namefilter, headerfilter)
+                if(not archiveread or fp.tell() <= currentfilepos):
+                    break
+                currentfilepos = fp.tell()
+                continue
+            infp = UncompressFileAlt(fp, formatspecs, currentfilepos)
+            if(not infp or infp is fp):
+                break
+            currentinfilepos = 0
+            while True:
+                informatspecs = _get_archive_formatspecs(infp, currentinfilepos, formatspecs)
+                if(informatspecs is None):
+                    break
+                archiveread = yield from _iter_archive_entries(infp, currentinfilepos, seekstart, seekend, listonly, uncompress, skipchecksum, informatspecs, saltkey, archivelist, namefilter, headerfilter)
+                if(not archiveread or infp.tell() <= currentinfilepos):
+                    break
+                currentinfilepos = infp.tell()
+            break
+    finally:
+        if(closefp and not (hasattr(infile, "read") or hasattr(infile, "write"))):
+            fp.close()
+
+
+_query_time_fields = ('fatime', 'fmtime', 'fctime', 'fbtime')
+_query_regex_fields = ('fname', 'flinkname')
+
+
+def _query_range_test(fieldindex, value, scale=1):
+    if(isinstance(value, tuple) and len(value) == 2):
+        lowvalue = None if value[0] is None else int(value[0] * scale)
+        highvalue = None if value[1] is None else int(value[1] * scale)
+        def _test(frawheader):
+            fieldvalue = int(frawheader[fieldindex], 16)
+            return (lowvalue is None or fieldvalue >= lowvalue) and (highvalue is None or fieldvalue <= highvalue)
+        return _test
+    if(isinstance(value, (set, frozenset, list, tuple))):
+        valueset = frozenset(int(x * scale) for x in value)
+        return lambda frawheader: int(frawheader[fieldindex], 16) in valueset
+    value = int(value * scale)
+    return lambda frawheader: int(frawheader[fieldindex], 16) == value
+
+
+def _compile_archive_query(where):
+    """
+    Turn a where dict into a test on the raw header field list.  Keys are
+    entry field names; a (low, high) tuple is an inclusive range with None
+    for an open end, a set or list matches any member, anything else must
+    be equal.  'fatime'/'fmtime'/'fctime'/'fbtime' take seconds (datetimes
+    are accepted), 'fname'/'flinkname' take a regex (searched), 'ftype'
+    also takes names such as "file" or "dir" and 'fcompression' "none"
+    also matches uncompressed entries.  All keys must match.  Returns
+    False for an unknown key or an unknown ftype name.
+    """
+    tests = []
+    for key, value in where.items():
+        if(key in _query_time_fields):
+            if(isinstance(value, tuple) and len(value) == 2):
+                value = tuple(x.timestamp() if isinstance(x, datetime.datetime) else x for x in value)
+            elif(isinstance(value, datetime.datetime)):
+                value = value.timestamp()
+            tests.append(_query_range_test(ArchiveEntry._FIELD_INDEX[key + "_ns"], value, 10**9))
+        elif(key == 'ftype'):
+            typenames = {ftype_to_str(x): x for x in (0, 1, 2, 3, 4, 5, 6, 12, 14)}
+            if(isinstance(value, (set, frozenset, list, tuple))):
+                if(any(isinstance(x, str) and x not in typenames for x in value)):
+                    return False
+                value = set(typenames.get(x, x) for x in value)
+            else:
+                if(isinstance(value, str) and value not in typenames):
+                    return False
+                value = typenames.get(value, value)
+            tests.append(_query_range_test(ArchiveEntry._FIELD_INDEX[key], value))
+        elif(key in ArchiveEntry._FIELD_INDEX):
+            tests.append(_query_range_test(ArchiveEntry._FIELD_INDEX[key], value))
+        elif(key in _query_regex_fields):
+            fieldindex = ArchiveEntry._STRING_INDEX[key]
+            if(not hasattr(value, "search")):
+                value = re.compile(value)
+            tests.append(lambda frawheader, fieldindex=fieldindex, value=value: value.search(frawheader[fieldindex]) is not None)
+        elif(key == 'fcompression'):
+            if(not isinstance(value, (set, frozenset, list, tuple))):
+                value = [value]
+            valueset = set(value)
+            if("none" in valueset):
+                valueset.update(("", "auto"))
+            tests.append(lambda frawheader, valueset=frozenset(valueset): frawheader[17] in valueset)
+        elif(key in ArchiveEntry._STRING_INDEX):
+            fieldindex = ArchiveEntry._STRING_INDEX[key]
+            if(isinstance(value, (set, frozenset, list, tuple))):
+                tests.append(lambda frawheader, fieldindex=fieldindex, value=frozenset(value): frawheader[fieldindex] in value)
+            else:
+                tests.append(lambda frawheader, fieldindex=fieldindex, value=value: frawheader[fieldindex] == value)
+        else:
+            return False
+    def _headerfilter(frawheader):
+        for curtest in tests:
+            if(not curtest(frawheader)):
+                return False
+        return True
+    return _headerfilter
+
+
+def QueryArchive(infile, where=None, fmttype="auto", filestart=0, listonly=True, contentasfile=True, uncompress=True, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None):
+    """
+    Return the entries of every (stacked) archive in infile that match
+    where, as entry dicts like the 'ffilelist' ones of ArchiveFileToArray.
+    A dict where (see _compile_archive_query) is checked against the raw
+    header fields while scanning, so entries that do not match are never
+    decoded, checksummed or turned into dicts.  A callable where is
+    called with each lazily decoded entry instead.
+    """
+    headerfilter = None
+    entryfilter = None
+    if(callable(where)):
+        entryfilter = where
+    elif(where):
+        headerfilter = _compile_archive_query(where)
+        if(not headerfilter):
+            VerbosePrintOut("Unknown query field or ftype in " + str(where))
+            return False
+    outlist = []
+    for curentry in IterArchiveFile(infile, fmttype, filestart, 0, 0, True, uncompress, skipchecksum, formatspecs, saltkey, None, True, None, headerfilter):
+        if(entryfilter is not None and not entryfilter(curentry)):
+            continue
+        if(listonly):
+            fcontents = io.BytesIO()
+        else:
+            if(not skipchecksum and not curentry.verify_contents()):
+                VerbosePrintOut("File Content Checksum Error with file " +
+                                curentry['fname'] + " at offset " + str(curentry['fcontentstart']))
+                return False
+            fcontents = MkTempFile()
+            shutil.copyfileobj(curentry.open_contents(uncompress), fcontents, length=__filebuff_size__)
+            fcontents.seek(0, 0)
+            if(uncompress and curentry['fcompression'] not in ("none", "", "auto")):
+                # same as ArchiveFileToArray: the checksum of what fcontents holds
+                curentry['fcontentchecksum'] = GetFileChecksum(fcontents, curentry['fcontentchecksumtype'].lower(), False, formatspecs, saltkey)
+                fcontents.seek(0, 0)
+        if(not contentasfile):
+            fcontents = fcontents.read()
+        curentry.update({'fcontents': fcontents, 'fcontentasfile': contentasfile, 'fhascontents': (not listonly and curentry['fsize'] > 0)})
+        outentry = curentry.to_dict()
+        outentry.pop('farchive', None)
+        outlist.append(outentry)
+    return outlist
+
+
+class ArchiveFileColumns(object):
+    """
+    Column-oriented archive listing for very large archives.  Numeric
+    fields are array.array('q') columns, names are one UTF-8 blob per
+    field plus an offsets column, and compression/user/group names are
+    indexes into a small shared table.  Row dicts are only built when
+    asked for.
+    """
+
+    INT_FIELDS = ('fid', 'farchive', 'fhstart', 'fcontentstart', 'ftype', 'fmode',
+                  'fuid', 'fgid', 'finode', 'flinkcount', 'fdev', 'fsize', 'fcsize',
+                  'fatime_ns', 'fmtime_ns', 'fctime_ns', 'fbtime_ns')
+    TABLE_FIELDS = ('fcompression', 'funame', 'fgname')
+    BLOB_FIELDS = ('fname', 'flinkname')
+
+    def __init__(self):
+        self.archives = []
+        self.columns = {}
+        for key in self.INT_FIELDS:
+            self.columns[key] = array.array('q')
+        self.tables = {}
+        self._tableids = {}
+        for key in self.TABLE_FIELDS:
+            self.columns[key] = array.array('I')
+            self.tables[key] = []
+            self._tableids[key] = {}
+        self._blobs = {}
+        self._offsets = {}
+        for key in self.BLOB_FIELDS:
+            self._blobs[key] = bytearray()
+            self._offsets[key] = array.array('Q', [0])
+
+    def __len__(self):
+        return len(self.columns['fid'])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def __getitem__(self, i):
+        if(i < 0):
+            i = i + len(self)
+        if(i < 0 or i >= len(self)):
+            raise IndexError(i)
+        return self.row(i)
+
+    def _append_values(self, intvalues, tablevalues, blobvalues):
+        for key, value in zip(self.INT_FIELDS, intvalues):
+            self.columns[key].append(value)
+        for key, value in zip(self.TABLE_FIELDS, tablevalues):
+            tableid = self._tableids[key].get(value)
+            if(tableid is None):
+                tableid = len(self.tables[key])
+                self.tables[key].append(value)
+                self._tableids[key][value] = tableid
+            self.columns[key].append(tableid)
+        for key, value in zip(self.BLOB_FIELDS, blobvalues):
+            self._blobs[key].extend(value.encode("UTF-8"))
+            self._offsets[key].append(len(self._blobs[key]))
+
+    def append_raw(self, frawheader, fid=0, fhstart=0, fcontentstart=0, archiveid=0):
+        self._append_values((fid, archiveid, fhstart, fcontentstart) + tuple(int(frawheader[ArchiveEntry._FIELD_INDEX[key]], 16) for key in self.INT_FIELDS[4:]),
+                            tuple(frawheader[ArchiveEntry._STRING_INDEX[key]] for key in self.TABLE_FIELDS),
+                            tuple(frawheader[ArchiveEntry._STRING_INDEX[key]] for key in self.BLOB_FIELDS))
+
+    def append(self, entry, archiveid=0):
+        self._append_values((entry['fid'], archiveid) + tuple(entry[key] for key in self.INT_FIELDS[2:]),
+                            tuple(entry[key] for key in self.TABLE_FIELDS),
+                            tuple(entry[key] for key in self.BLOB_FIELDS))
+
+    def value(self, key, i):
+        if(key in self.BLOB_FIELDS):
+            offsets = self._offsets[key]
+            return self._blobs[key][offsets[i]:offsets[i + 1]].decode("UTF-8")
+        if(key in self.TABLE_FIELDS):
+            return self.tables[key][self.columns[key][i]]
+        return self.columns[key][i]
+
+    def column(self, key):
+        """The array for a numeric field, the list of strings otherwise."""
+        if(key in self.BLOB_FIELDS):
+            return [self.value(key, i) for i in range(len(self))]
+        if(key in self.TABLE_FIELDS):
+            return [self.tables[key][x] for x in self.columns[key]]
+        return self.columns[key]
+
+    def row(self, i):
+        outrow = {}
+        for key in self.INT_FIELDS + self.TABLE_FIELDS + self.BLOB_FIELDS:
+            outrow[key] = self.value(key, i)
+        for key in ('fatime', 'fmtime', 'fctime', 'fbtime'):
+            outrow[key] = outrow[key + "_ns"] // 10**9
+        outrow['fstrmode'] = PrintPermissionString(outrow['fmode'], outrow['ftype'])
+        return outrow
+
+    @property
+    def nbytes(self):
+        outsize = sum(x.itemsize * len(x) for x in self.columns.values())
+        outsize = outsize + sum(len(x) for x in self._blobs.values())
+        return outsize + sum(x.itemsize * len(x) for x in self._offsets.values())
+
+    def to_numpy(self):
+        """
+        Dict of NumPy arrays, numeric columns are zero-copy views.  Table
+        fields are integer codes, their strings are in self.tables.
+        """
+        if(not numpy_support):
+            return False
+        outarrays = {}
+        for key in self.INT_FIELDS:
+            outarrays[key] = numpy.frombuffer(self.columns[key], dtype=numpy.int64)
+        for key in self.TABLE_FIELDS:
+            outarrays[key] = numpy.frombuffer(self.columns[key], dtype=numpy.uint32)
+        for key in self.BLOB_FIELDS:
+            outarrays[key] = numpy.array(self.column(key), dtype=object)
+        return outarrays
+
+
+def ArchiveFileToColumns(infile, fmttype="auto", filestart=0, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None, where=None):
+    """
+    Columnar listing of every (stacked) archive in infile, built from the
+    raw header fields without creating entry dicts.  where takes the same
+    dict as QueryArchive.
+    """
+    headerfilter = None
+    if(where):
+        headerfilter = _compile_archive_query(where)
+        if(not headerfilter):
+            VerbosePrintOut("Unknown query field or ftype in " + str(where))
+            return False
+    columns = ArchiveFileColumns()
+    archivelist = []
+    for curentry in IterArchiveFile(infile, fmttype, filestart, 0, 0, True, False, skipchecksum, formatspecs, saltkey, archivelist, True, None, headerfilter):
+        columns.append_raw(curentry.frawheader, curentry['fid'], curentry.fhstart, curentry.fcontentstart, len(archivelist) - 1)
+    if(len(archivelist) == 0):
+        return False
+    columns.archives = [dict((key, value) for key, value in x.items() if key != 'fp') for x in archivelist]
+    return columns
+
+
+def ArchiveFileArrayToColumns(inarray):
+    if(isinstance(inarray, dict)):
+        inarray = [inarray]
+    if(not isinstance(inarray, list) or not inarray):
+        return False
+    columns = ArchiveFileColumns()
+    for archiveid, listarrayfiles in enumerate(inarray):
+        columns.archives.append(dict((key, value) for key, value in listarrayfiles.items() if key not in ('fp', 'ffilelist')))
+        for curentry in listarrayfiles['ffilelist']:
+            columns.append(curentry, archiveid)
+    return columns
+
+
+class ArchiveMemberReader(io.RawIOBase):
+    """
+    Random access to the uncompressed bytes of one archive member.
+    Stored members are read in place.  zlib/gzip members that carry
+    'fcheckpoints' in their JSON resume inflating from the nearest
+    checkpoint; any other codec is decompressed forward from the start.
+    Content checksums are not checked, call entry.verify() for that.
+    """
+
+    def __init__(self, entry, fp=None):
+        super().__init__()
+        self.entry = entry
+        self.fsize = entry['fsize']
+        self._fp = fp
+        self._pos = 0
+        self._stream = None
+        self._checkpoints = None
+        fcompression = entry['fcompression']
+        if(fcompression == "none" or fcompression == "" or fcompression == "auto"):
+            self._stream = entry.open_contents(False)
+            return
+        fjsondata = entry['fjsondata']
+        if((fcompression == "zlib" or fcompression == "gzip") and isinstance(fjsondata, dict) and fjsondata.get('fcheckpoints')):
+            self._checkpoints = fjsondata['fcheckpoints']
+            self._cpoffsets = [x[0] for x in self._checkpoints]
+        else:
+            self._stream = entry.open_contents(True)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    @property
+    def name(self):
+        return self.entry['fname']
+
+    def _check_open(self):
+        if self.closed:
+            raise ValueError("I/O operation on closed file")
+
+    def pread(self, offset, length=-1):
+        """Return up to `length` bytes starting at `offset`; -1 reads to the end."""
+        self._check_open()
+        if(offset < 0):
+            raise ValueError("negative offset %r" % (offset,))
+        if(length is None or length < 0 or offset + length > self.fsize):
+            length = self.fsize - offset
+        if(length <= 0):
+            return b""
+        if(self._checkpoints is None):
+            self._stream.seek(offset, 0)
+            return self._stream.read(length)
+        return self._inflate_range(offset, length)
+
+    def _inflate_range(self, offset, length):
+        uoffset, coffset = self._checkpoints[bisect.bisect_right(self._cpoffsets, offset) - 1]
+        fcontents = self.entry.open_contents(False)
+        fcontents.seek(coffset, 0)
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        skipsize = offset - uoffset
+        outdata = bytearray()
+        while(len(outdata) < length and not decompressor.eof):
+            chunk = decompressor.unconsumed_tail
+            if(not chunk):
+                chunk = fcontents.read(64 * BYTES_PER_KiB)
+                if(not chunk):
+                    break
+            data = decompressor.decompress(chunk, __filebuff_size__)
+            if(skipsize > 0):
+                if(len(data) <= skipsize):
+                    skipsize = skipsize - len(data)
+                    continue
+                data = data[skipsize:]
+                skipsize = 0
+            outdata.extend(data)
+        return bytes(outdata[:length])
+
+    def read(self, size=-1):
+        data = self.pread(self._pos, size)
+        self._pos += len(data)
+        return data
+
+    def readall(self):
+        return self.read(-1)
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        n = len(data)
+        b[:n] = data
+        return n
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        self._check_open()
+        if whence == os.SEEK_SET:
+            newpos = int(offset)
+        elif whence == os.SEEK_CUR:
+            newpos = self._pos + int(offset)
+        elif whence == os.SEEK_END:
+            newpos = self.fsize + int(offset)
+        else:
+            raise ValueError("invalid whence (%r)" % (whence,))
+        if newpos < 0:
+            raise ValueError("negative seek position %r" % (newpos,))
+        self._pos = newpos
+        return newpos
+
+    def tell(self):
+        self._check_open()
+        return self._pos
+
+    def close(self):
+        if(not self.closed):
+            if(self._stream is not None):
+                self._stream.close()
+            if(self._fp is not None):
+                self._fp.close()
+        super().close()
+
+
+def ArchiveFileOpenMember(infile, name, fmttype="auto", filestart=0, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None):
+    """Open the first member called `name` for ranged reads, or return False."""
+    fp = _open_archive_infile(infile)
+    if(not fp):
+        return False
+    ownfp = not (hasattr(infile, "read") or hasattr(infile, "write"))
+    findname = _normalize_index_path(name)
+    fileentries = IterArchiveFile(fp, fmttype, filestart, 0, 0, True, True, skipchecksum, formatspecs, saltkey, None, False, lambda fname: _normalize_index_path(fname) == findname)
+    curentry = next(fileentries, None)
+    fileentries.close()
+    if(curentry is None or curentry['ftype'] not in (0, 7)):
+        if(ownfp):
+            fp.close()
+        return False
+    return ArchiveMemberReader(curentry, fp if ownfp else None)
+
+
+def ReadInFileWithContentToList(infile, fmttype="auto", filestart=0, seekstart=0, seekend=0, listonly=False, contentasfile=True, uncompress=True, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False):
+    if(hasattr(infile, "read")):
+        fp = infile
+        try:
+            fp.seek(0, 2)
+        except (OSError, ValueError):
+            SeekToEndOfFile(fp)
+        outfsize = fp.tell()
+        fp.seek(filestart, 0)
+        currentfilepos = fp.tell()
+    elif(infile == "-"):
+        fp = MkTempFile()
+        shutil.copyfileobj(PY_STDIN_BUF, fp, length=__filebuff_size__)
+        try:
+            fp.seek(0, 2)
+        except (OSError, ValueError):
+            SeekToEndOfFile(fp)
+        outfsize = fp.tell()
+        fp.seek(filestart, 0)
+        currentfilepos = fp.tell()
+    elif(isinstance(infile, bytes)):
+        fp = MkTempFile()
+        fp.write(infile)
+        try:
+            fp.seek(0, 2)
+        except (OSError, ValueError):
+            SeekToEndOfFile(fp)
+        outfsize = fp.tell()
+        fp.seek(filestart, 0)
+        currentfilepos = fp.tell()
+    elif(re.findall(__download_proto_support__, infile) and pywwwget):
+        fp = download_file_from_internet_file(infile)
+        try:
+            fp.seek(0, 2)
+        except (OSError, ValueError):
+            SeekToEndOfFile(fp)
+        outfsize = fp.tell()
+        fp.seek(filestart, 0)
+        currentfilepos = fp.tell()
+    else:
+        infile = RemoveWindowsPath(infile)
+        fp = open(infile, "rb")
+        try:
+            fp.seek(0, 2)
+        except (OSError, ValueError):
+            SeekToEndOfFile(fp)
+        outfsize = fp.tell()
+        fp.seek(filestart, 0)
+        currentfilepos = fp.tell()
+    readfp = fp
+    ArchiveList = []
+    while True:
+        if currentfilepos >= outfsize:   # stop when function signals False
+            break
+        oldfppos = readfp.tell()
+        compresscheck = CheckCompressionType(readfp, formatspecs, currentfilepos, False)
+        if(IsNestedDict(formatspecs) and compresscheck in formatspecs):
+            pass
+        else:
+            checkcompressfile = CheckCompressionSubType(readfp, formatspecs, currentfilepos, False)
+            if(IsNestedDict(formatspecs) and checkcompressfile in formatspecs):
+                pass
+            else:
+                break
+        readfp.seek(oldfppos, 0)
+        if(compresscheck in formatspecs):
+            if currentfilepos >= outfsize:   # stop when function signals False
+                break
+            oldfppos = readfp.tell()
+            compresscheck = CheckCompressionType(readfp, formatspecs, currentfilepos, False)
+            if(IsNestedDict(formatspecs) and compresscheck in formatspecs):
+                informatspecs = formatspecs[compresscheck]
+            else:
+                break
+            readfp.seek(oldfppos, 0)
+            ArchiveList.append(ReadFileDataWithContentToList(readfp, currentfilepos, seekstart, seekend, listonly, contentasfile, uncompress, skipchecksum, informatspecs, saltkey, seektoend))
+            currentfilepos = readfp.tell()
+        else:
+            infp = UncompressFileAlt(readfp, formatspecs, currentfilepos)
+            if(not infp):
+                break
+            infp.seek(0, 0)
+            currentinfilepos = infp.tell()
+            while True:
+                oldinfppos = infp.tell()
+                compresscheck = CheckCompressionType(infp, formatspecs, currentinfilepos, False)
+                if(IsNestedDict(formatspecs) and compresscheck in formatspecs):
+                    informatspecs = formatspecs[compresscheck]
+                else:
+                    break
+                infp.seek(oldinfppos, 0)
+                ArchiveList.append(ReadFileDataWithContentToList(infp, currentinfilepos, seekstart, seekend, listonly, contentasfile, uncompress, skipchecksum, informatspecs, saltkey, seektoend))
+                currentinfilepos = infp.tell()
+            currentfilepos = readfp.tell()
+    return ArchiveList
+
+
+def ReadInMultipleFileWithContentToList(infile, fmttype="auto", filestart=0, seekstart=0, seekend=0, listonly=False, contentasfile=True, uncompress=True, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False):
+    if(isinstance(infile, (list, tuple, ))):
+        pass
+    else:
+        infile = [infile]
+    outretval = {}
+    for curfname in infile:
+        outretval.append(ReadInFileWithContentToList(curfname, "auto", filestart, seekstart, seekend, listonly, contentasfile, uncompress, skipchecksum, formatspecs, saltkey, seektoend))
+    return outretval
+
+def ReadInMultipleFilesWithContentToList(infile, fmttype="auto", filestart=0, seekstart=0, seekend=0, listonly=False, contentasfile=True, uncompress=True, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False):
+    return ReadInMultipleFileWithContentToList(infile, fmttype, filestart, seekstart, seekend, listonly, contentasfile, uncompress, skipchecksum, formatspecs, saltkey, seektoend)
+
+class ArchiveDurability(object):
+    """
+    When archive writers flush and sync what they wrote.  mode is one of
+      none             never sync; the OS writes the data back on its own
+      end              one sync when the archive is finished
+      every_n_entries  sync after every n entries, and at the end
+      every_n_bytes    sync once n content bytes were written since the
+                       last sync, and at the end
+      full             sync after the header and after every entry
+    A policy counts what it has seen, so use one per archive write; the
+    writers make their own from a mode name, "mode:n" or a template.
+    Extraction closes each file as it goes, so it tracks what it created
+    and fsyncs those files and their directories instead.
+    """
+    MODES = ("none", "end", "every_n_entries", "every_n_bytes", "full")
+
+    def __init__(self, mode=DEFAULT_DURABILITY, n=None):
+        if(mode not in self.MODES):
+            raise ValueError("unknown durability mode " + repr(mode) + ", use one of " + ", ".join(self.MODES))
+        if(n is None and mode == "every_n_entries"):
+            n = DEFAULT_DURABILITY_ENTRIES
+        elif(n is None and mode == "every_n_bytes"):
+            n = DEFAULT_DURABILITY_BYTES
+        if(n is not None and int(n) < 1):
+            raise ValueError("durability interval must be at least 1")
+        self.mode = mode
+        self.n = None if n is None else int(n)
+        self.syncs = 0
+        self._entries = 0
+        self._bytes = 0
+        self._files = []
+        self._dirs = set()
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Build a policy from "mode" or "mode:n"; n takes K, M or G suffixes."""
+        if(isinstance(spec, cls)):
+            return cls(spec.mode, spec.n)
+        mode, _, n = str(spec).strip().lower().partition(":")
+        if(n == ""):
+            return cls(mode)
+        multiplier = 1
+        if(n[-1] in "kmg"):
+            multiplier = {"k": BYTES_PER_KiB, "m": BYTES_PER_MiB, "g": 1024 * BYTES_PER_MiB}[n[-1]]
+            n = n[:-1]
+        try:
+            n = int(n) * multiplier
+        except ValueError:
+            raise ValueError("bad durability interval in " + repr(spec))
+        return cls(mode, n)
+
+    def __repr__(self):
+        if(self.n is None):
+            return "ArchiveDurability(%r)" % self.mode
+        return "ArchiveDurability(%r, %d)" % (self.mode, self.n)
+
+    def sync(self, fp):
+        # fdatasync is enough to read the archive back: only the size of
+        # the file's metadata has to reach the disk with the data
+        profiler = _profiler
+        if(profiler is not None):
+            pstart = time.perf_counter()
+        self._entries = 0
+        self._bytes = 0
+        try:
+            fp.flush()
+            fd = fp.fileno()
+        except (io.UnsupportedOperation, AttributeError, OSError, ValueError):
+            return False
+        try:
+            if(hasattr(os, "fdatasync")):
+                os.fdatasync(fd)
+            else:
+                os.fsync(fd)
+        except OSError:
+            return False
+        self.syncs = self.syncs + 1
+        if(profiler is not None):
+            profiler.add('fsync', time.perf_counter() - pstart)
+        return True
+
+    def track(self, path, ftype=0):
+        """Remember an extracted path of archive type ftype: files (0, 7)
+        are synced themselves, directories (5) too, everything else only
+        through the directory holding it."""
+        if(self.mode == "none"):
+            return False
+        if(ftype == 0 or ftype == 7):
+            self._files.append(path)
+        elif(ftype == 5):
+            self._dirs.add(path)
+        self._dirs.add(os.path.dirname(os.path.abspath(path)))
+        return True
+
+    def extracted(self, fpc):
+        """Count a file extracted through the still open fpc and sync as
+        the mode asks; 'full' syncs it right away."""
+        if(self.mode == "none"):
+            return False
+        try:
+            nbytes = fpc.tell()
+        except (io.UnsupportedOperation, AttributeError, OSError):
+            nbytes = 0
+        if(self.mode == "full"):
+            self._dirs.add(os.path.dirname(os.path.abspath(fpc.name)))
+            return self.sync(fpc)
+        fpc.flush()
+        self.track(fpc.name)
+        if(self.due(nbytes)):
+            return self.sync_tracked()
+        return False
+
+    def sync_tracked(self):
+        # the tracked files first, then the directories that name them
+        self._entries = 0
+        self._bytes = 0
+        if(not self._files and not self._dirs):
+            return False
+        profiler = _profiler
+        if(profiler is not None):
+            pstart = time.perf_counter()
+        for curpath in self._files:
+            _fsync_path(curpath)
+        for curpath in sorted(self._dirs, reverse=True):
+            _fsync_path(curpath, True)
+        self._files = []
+        self._dirs = set()
+        self.syncs = self.syncs + 1
+        if(profiler is not None):
+            profiler.add('fsync', time.perf_counter() - pstart)
+        return True
+
+    def due(self, nbytes=0):
+        """Count one written entry of nbytes; True when a sync is due."""
+        if(self.mode == "none" or self.mode == "end"):
+            return False
+        self._entries = self._entries + 1
+        self._bytes = self._bytes + nbytes
+        if(self.mode == "full"):
+            return True
+        if(self.mode == "every_n_entries"):
+            return self._entries >= self.n
+        return self._bytes >= self.n
+
+    def header(self, fp):
+        if(self.mode == "full"):
+            return self.sync(fp)
+        return False
+
+    def entry(self, fp, nbytes=0):
+        if(self.due(nbytes)):
+            return self.sync(fp)
+        return False
+
+    def finish(self, fp):
+        if(self.mode == "none"):
+            return False
+        return self.sync(fp)
+
+
+def _fsync_path(path, isdir=False):
+    # Windows can neither open a directory for syncing nor flush a file
+    # without write access
+    if(isdir and os.name == "nt"):
+        return False
+    flags = os.O_RDONLY
+    if(os.name == "nt"):
+        flags = os.O_RDWR | getattr(os, "O_BINARY", 0)
+    try:
+        fd = os.open(path, flags)
+    except OSError:
+        return False
+    try:
+        os.fsync(fd)
+    except OSError:
+        return False
+    finally:
+        os.close(fd)
+    return True
+
+
+def SetArchiveDurability(durability=DEFAULT_DURABILITY):
+    """Set the durability used by writers that are not given one: a mode
+    name, "mode:n" or an ArchiveDurability.  Returns the previous one."""
+    global __durability__
+    ArchiveDurability.from_spec(durability)
+    olddurability = __durability__
+    __durability__ = durability
+    return olddurability
+
+
+def GetArchiveDurability():
+    return __durability__
+
+
+def _get_durability(durability=None):
+    # a fresh policy for one archive write
+    if(durability is None):
+        durability = __durability__
+    return ArchiveDurability.from_spec(durability)
+
+
+def AppendFileHeader(fp, fmttype="auto", numfiles=0, fencoding="UTF-8", extradata=[], jsondata={}, checksumtype=["md5", "md5"], formatspecs=__file_format_dict__, saltkey=None, durability=None):
+    """
+    Build and write the archive file header.
+    Returns the same file-like 'fp' on success, or False on failure.
+    NOTE: This preserves the original field ordering & sizing logic.
+    """
+    # basic capability
+    if not hasattr(fp, "write"):
+        return False
+
+    if(IsNestedDict(formatspecs) and fmttype in formatspecs):
         formatspecs = formatspecs[fmttype]
     elif(IsNestedDict(formatspecs) and fmttype not in formatspecs):
         fmttype = __file_format_default__
@@ -6290,26 +8000,13 @@ def AppendFileHeader(fp, fmttype="auto", numfiles=0, fencoding="UTF-8", extradat
     # Keeping that behavior for compatibility.
     nullstrecd = formatspecs['format_delimiter'].encode('UTF-8')
     outfileout = fnumfilesa + fjsoncontent + nullstrecd
-    # 9) write and try to sync
+    # 9) write; the caller's durability policy decides about syncing
     try:
         fp.write(outfileout)
     except (OSError, io.UnsupportedOperation):
         return False
-
-    try:
-        # flush Python buffers
-        if hasattr(fp, "flush"):
-            fp.flush()
-        # best-effort durability
-        if hasattr(fp, "fileno"):
-            try:
-                os.fsync(fp.fileno())
-            except (OSError, io.UnsupportedOperation, AttributeError):
-                pass
-    except Exception:
-        # swallowing to match your tolerant behavior
-        pass
-
+    if(durability is not None):
+        durability.header(fp)
     return fp
 
 
@@ -6320,6 +8017,7 @@ def MakeEmptyFilePointer(fp, fmttype=__file_format_default__, checksumtype=["md5
         fmttype = __file_format_default__
         formatspecs = formatspecs[fmttype]
     AppendFileHeader(fp, fmttype, 0, "UTF-8", [], {}, checksumtype, formatspecs, saltkey)
+    _get_durability().finish(fp)
     return fp
 
 
@@ -6370,15 +8068,10 @@ def MakeEmptyFile(outfile, fmttype="auto", compression="auto", compresswholefile
         except PermissionError:
             return False
     AppendFileHeader(fp, fmttype, 0, "UTF-8", [], {}, checksumtype, formatspecs, saltkey)
+    _get_durability().finish(fp)
     if(outfile == "-" or outfile is None or hasattr(outfile, "read")):
         fp = CompressOpenFileAlt(
             fp, compression, compressionlevel, compressionuselist, formatspecs)
-        try:
-            fp.flush()
-            if(hasattr(os, "sync")):
-                os.fsync(fp.fileno())
-        except (io.UnsupportedOperation, AttributeError, OSError):
-            pass
     if(outfile == "-"):
         fp.seek(0, 0)
         shutil.copyfileobj(fp, PY_STDOUT_BUF, length=__filebuff_size__)
@@ -6404,7 +8097,7 @@ def MakeEmptyArchiveFile(outfile, compression="auto", compresswholefile=True, co
     return MakeEmptyFile(outfile, "auto", compression, compresswholefile, compressionlevel, compressionuselist, checksumtype, formatspecs, saltkey, returnfp)
 
 
-def AppendFileHeaderWithContent(fp, fmttype="auto", filevalues=[], extradata=[], jsondata={}, filecontent="", checksumtype=["md5", "md5", "md5"], formatspecs=__file_format_dict__, saltkey=None):
+def AppendFileHeaderWithContent(fp, fmttype="auto", filevalues=[], extradata=[], jsondata={}, filecontent="", checksumtype=["md5", "md5", "md5"], formatspecs=__file_format_dict__, saltkey=None, tocout=None, durability=None, contentchecksum=None):
     if(not hasattr(fp, "write")):
         return False
     if(IsNestedDict(formatspecs) and fmttype in formatspecs):
@@ -6447,12 +8140,21 @@ def AppendFileHeaderWithContent(fp, fmttype="auto", filevalues=[], extradata=[],
         tmpoutlist.append(GetFileChecksum(fjsoncontent, "none", True, formatspecs, saltkey))
     tmpoutlist.append(extrasizelen)
     tmpoutlist.append(extrafields)
+    # filecontent may be bytes or a seekable file, which is checksummed
+    # and copied in buffers instead of being joined to the header
+    contentisfile = hasattr(filecontent, "read")
+    if(contentisfile):
+        filecontent.seek(0, 2)
+        fcontentsize = filecontent.tell()
+        filecontent.seek(0, 0)
+    else:
+        fcontentsize = len(filecontent)
     outfileoutstr = AppendNullBytes(
         tmpoutlist, formatspecs['format_delimiter'])
     if(len(extradata) > 0):
         outfileoutstr = outfileoutstr + \
             AppendNullBytes(extradata, formatspecs['format_delimiter'])
-    if(len(filecontent) == 0):
+    if(fcontentsize == 0):
         checksumlist = [checksumtype[0], "none"]
     else:
         checksumlist = [checksumtype[0], checksumtype[1]]
@@ -6460,35 +8162,961 @@ def AppendFileHeaderWithContent(fp, fmttype="auto", filevalues=[], extradata=[],
         AppendNullBytes(checksumlist, formatspecs['format_delimiter'])
     nullstrecd = formatspecs['format_delimiter'].encode('UTF-8')
     outfileheadercshex = GetFileChecksum(outfileoutstr, checksumtype[0], True, formatspecs, saltkey)
-    if(len(filecontent) == 0):
+    if(fcontentsize == 0):
         outfilecontentcshex = GetFileChecksum(filecontent, "none", False, formatspecs, saltkey)
+    elif(contentchecksum is not None):
+        # already worked out where the member was compressed
+        outfilecontentcshex = contentchecksum
+    else:
+        outfilecontentcshex = GetFileChecksum(filecontent, checksumtype[1], False, formatspecs, saltkey)
+    if(contentisfile):
+        filecontent.seek(0, 0)
+    tmpfileoutstr = outfileoutstr + \
+        AppendNullBytes([outfileheadercshex, outfilecontentcshex],
+                        formatspecs['format_delimiter'])
+    formheaersize = format(int(len(tmpfileoutstr) - len(formatspecs['format_delimiter'])), 'x').lower()
+    outfileoutstr = AppendNullByte(
+        formheaersize, formatspecs['format_delimiter']) + outfileoutstr
+    outfileheadercshex = GetFileChecksum(outfileoutstr, checksumtype[0], True, formatspecs, saltkey)
+    outfileoutstr = outfileoutstr + \
+        AppendNullBytes([outfileheadercshex, outfilecontentcshex],
+                        formatspecs['format_delimiter'])
+    outfileoutstrecd = outfileoutstr
+    if(contentisfile):
+        outfileout = outfileoutstrecd + fjsoncontent + nullstrecd
+    else:
+        outfileout = outfileoutstrecd + fjsoncontent + nullstrecd +  filecontent + nullstrecd
+    if(tocout is not None):
+        try:
+            fhstart = fp.tell()
+        except (io.UnsupportedOperation, AttributeError, OSError):
+            fhstart = None
+    try:
+        fp.write(outfileout)
+        if(contentisfile):
+            shutil.copyfileobj(filecontent, fp, length=__filebuff_size__)
+            fp.write(nullstrecd)
+    except OSError:
+        return False
+    if(tocout is not None and fhstart is not None):
+        tocout.append({'ftype': int(tmpoutlist[1], 16), 'fname': tmpoutlist[4], 'fhstart': fhstart, 'fcontentstart': fhstart + len(outfileoutstrecd) + len(fjsoncontent) + len(nullstrecd), 'fsize': int(tmpoutlist[6], 16), 'fcompression': tmpoutlist[16], 'fcsize': int(tmpoutlist[17], 16), 'fheaderchecksum': outfileheadercshex, 'fcontentchecksumtype': checksumlist[1], 'fcontentchecksum': outfilecontentcshex})
+    if(durability is not None):
+        durability.entry(fp, fcontentsize)
+    return fp
+
+# ===== Optional end-of-archive table of contents =====
+# Layout written after the last entry of an archive:
+#   <magic>TOC<delim><size><delim><numentries><delim><fieldsperentry><delim>
+#   <checksumtype><delim>[entry fields...]<checksum><delim>
+#   <magic>TOC<delim><tocoffset:016x><delim><tocsize:016x><delim>
+# The fixed width trailer lets readers find the TOC from the end of a
+# seekable file and jump straight to any member without walking headers.
+# Offsets are relative to the start of the archive the TOC belongs to.
+TOC_FIELDS_PER_ENTRY = 10
+TOC_OFFSET_WIDTH = 16
+
+
+def GetFileTOCMagic(formatspecs=__file_format_dict__):
+    return formatspecs['format_magic'] + "TOC"
+
+
+def GetFileTOCTrailerSize(formatspecs=__file_format_dict__):
+    delimsize = len(formatspecs['format_delimiter'].encode("UTF-8"))
+    return len(GetFileTOCMagic(formatspecs).encode("UTF-8")) + delimsize + ((TOC_OFFSET_WIDTH + delimsize) * 2)
+
+
+def AppendFileTOC(fp, toclist, archivestart=0, fmttype="auto", checksumtype="md5", formatspecs=__file_format_dict__, saltkey=None):
+    if(not hasattr(fp, "write")):
+        return False
+    if(IsNestedDict(formatspecs) and fmttype in formatspecs):
+        formatspecs = formatspecs[fmttype]
+    elif(IsNestedDict(formatspecs) and fmttype not in formatspecs):
+        fmttype = __file_format_default__
+        formatspecs = formatspecs[fmttype]
+    delimiter = formatspecs['format_delimiter']
+    try:
+        tocstart = fp.tell()
+    except (io.UnsupportedOperation, AttributeError, OSError):
+        return False
+    tocfields = [format(len(toclist), 'x').lower(), format(TOC_FIELDS_PER_ENTRY, 'x').lower(), checksumtype]
+    for tocentry in toclist:
+        tocfields.extend([format(tocentry['ftype'], 'x').lower(), tocentry['fname'], format(tocentry['fhstart'] - archivestart, 'x').lower(), format(tocentry['fcontentstart'] - archivestart, 'x').lower(), format(tocentry['fsize'], 'x').lower(), tocentry['fcompression'], format(tocentry['fcsize'], 'x').lower(), tocentry['fheaderchecksum'], tocentry['fcontentchecksumtype'], tocentry['fcontentchecksum']])
+    tocfields.append(GetHeaderChecksum(tocfields, checksumtype, True, formatspecs, saltkey))
+    tocdata = AppendNullBytes(tocfields, delimiter)
+    tocout = AppendNullByte(GetFileTOCMagic(formatspecs), delimiter) + AppendNullByte(format(len(tocdata) - len(delimiter.encode("UTF-8")), 'x').lower(), delimiter) + tocdata
+    tocout = tocout + AppendNullBytes([GetFileTOCMagic(formatspecs), format(tocstart - archivestart, '0' + str(TOC_OFFSET_WIDTH) + 'x'), format(len(tocout), '0' + str(TOC_OFFSET_WIDTH) + 'x')], delimiter)
+    try:
+        fp.write(tocout)
+    except OSError:
+        return False
+    return fp
+
+
+def ReadFileTOCData(fp, skipchecksum=False, formatspecs=__file_format_dict__, saltkey=None):
+    if(not hasattr(fp, "read")):
+        return False
+    delimiter = formatspecs['format_delimiter']
+    tocmagic = AppendNullByte(GetFileTOCMagic(formatspecs), delimiter)
+    tocstart = fp.tell()
+    if(fp.read(len(tocmagic)) != tocmagic):
+        fp.seek(tocstart, 0)
+        return False
+    try:
+        tocheader = ReadFileHeaderDataBySize(fp, delimiter)
+    except ValueError:
+        fp.seek(tocstart, 0)
+        return False
+    fp.seek(len(delimiter.encode("UTF-8")), 1)
+    tocnumfiles = int(tocheader[1], 16)
+    tocfieldsperentry = int(tocheader[2], 16)
+    tocchecksumtype = tocheader[3]
+    tocchecksum = tocheader[-1]
+    if(len(tocheader) != (tocnumfiles * tocfieldsperentry) + 5):
+        VerbosePrintOut("File TOC Field Count Error at offset " + str(tocstart))
+        fp.seek(tocstart, 0)
+        return False
+    newtocchecksum = GetHeaderChecksum(tocheader[1:-1], tocchecksumtype, True, formatspecs, saltkey)
+    if(not CheckChecksums(tocchecksum, newtocchecksum) and not skipchecksum):
+        VerbosePrintOut("File TOC Checksum Error at offset " + str(tocstart))
+        VerbosePrintOut("'" + tocchecksum + "' != " + "'" + newtocchecksum + "'")
+        fp.seek(tocstart, 0)
+        return False
+    toctrailer = fp.read(GetFileTOCTrailerSize(formatspecs)).decode("UTF-8").split(delimiter)
+    if(len(toctrailer) < 3 or toctrailer[0] != GetFileTOCMagic(formatspecs)):
+        fp.seek(tocstart, 0)
+        return False
+    tocend = fp.tell()
+    archivestart = tocstart - int(toctrailer[1], 16)
+    toclist = []
+    filetoid = {}
+    tocid = 0
+    fieldstart = 4
+    while(tocid < tocnumfiles):
+        tocentry = tocheader[fieldstart:fieldstart + tocfieldsperentry]
+        toclist.append({'fid': tocid, 'ftype': int(tocentry[0], 16), 'fname': tocentry[1], 'fhstart': archivestart + int(tocentry[2], 16), 'fcontentstart': archivestart + int(tocentry[3], 16), 'fsize': int(tocentry[4], 16), 'fcompression': tocentry[5], 'fcsize': int(tocentry[6], 16), 'fheaderchecksum': tocentry[7], 'fcontentchecksumtype': tocentry[8], 'fcontentchecksum': tocentry[9]})
+        filetoid.update({tocentry[1]: tocid})
+        fieldstart = fieldstart + tocfieldsperentry
+        tocid = tocid + 1
+    return {'fnumfiles': tocnumfiles, 'fhstart': archivestart, 'ftocstart': tocstart, 'ftocend': tocend, 'ftocsize': tocend - tocstart, 'fchecksumtype': tocchecksumtype, 'fchecksum': tocchecksum, 'ffilelist': toclist, 'filetoid': filetoid}
+
+
+def FindFileTOC(fp, filestart=0, skipchecksum=False, formatspecs=__file_format_dict__, saltkey=None):
+    if(not hasattr(fp, "read") or not hasattr(fp, "seek")):
+        return False
+    delimiter = formatspecs['format_delimiter']
+    trailersize = GetFileTOCTrailerSize(formatspecs)
+    try:
+        curloc = fp.tell()
+        fp.seek(0, 2)
+        fileend = fp.tell()
+    except (io.UnsupportedOperation, AttributeError, OSError):
+        return False
+    if((fileend - trailersize) < filestart):
+        fp.seek(curloc, 0)
+        return False
+    fp.seek(fileend - trailersize, 0)
+    toctrailer = fp.read(trailersize).decode("UTF-8", "replace").split(delimiter)
+    if(len(toctrailer) < 3 or toctrailer[0] != GetFileTOCMagic(formatspecs)):
+        fp.seek(curloc, 0)
+        return False
+    try:
+        tocoffset = int(toctrailer[1], 16)
+        tocsize = int(toctrailer[2], 16)
+    except ValueError:
+        fp.seek(curloc, 0)
+        return False
+    tocstart = fileend - trailersize - tocsize
+    if(tocstart - tocoffset != filestart):
+        fp.seek(curloc, 0)
+        return False
+    fp.seek(tocstart, 0)
+    outtoc = ReadFileTOCData(fp, skipchecksum, formatspecs, saltkey)
+    fp.seek(curloc, 0)
+    return outtoc
+
+
+def SkipFileTOC(fp, formatspecs=__file_format_dict__):
+    if(not hasattr(fp, "read")):
+        return False
+    delimiter = formatspecs['format_delimiter']
+    tocmagic = AppendNullByte(GetFileTOCMagic(formatspecs), delimiter)
+    tocstart = fp.tell()
+    if(fp.read(len(tocmagic)) != tocmagic):
+        fp.seek(tocstart, 0)
+        return False
+    try:
+        tocsize = int(read_until_delimiter(fp, delimiter), 16)
+    except ValueError:
+        fp.seek(tocstart, 0)
+        return False
+    fp.seek(tocsize + len(delimiter.encode("UTF-8")) + GetFileTOCTrailerSize(formatspecs), 1)
+    return True
+
+
+def ArchiveFileReadTOC(infile, fmttype="auto", filestart=0, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None):
+    archivestream = _open_archive_stream(infile, fmttype, filestart, formatspecs)
+    if(not archivestream):
+        return False
+    fp, filestart, formatspecs = archivestream
+    return FindFileTOC(fp, filestart, skipchecksum, formatspecs, saltkey)
+
+# ===== Sidecar index (.idx) for archives written without a TOC =====
+# Fixed width little-endian records so the sidecar can be mmap'd and read
+# with struct.unpack_from.  Strings live in a blob after the records and are
+# referenced by (offset, length) pairs.  The sidecar is only trusted while the
+# archive size, mtime and archive header checksum still match.
+IDX_MAGIC = b"PYARCIDX"
+IDX_VERSION = 1
+# magic, version, reserved, numfiles, archive size, archive mtime_ns,
+# filestart, strings offset, strings size, format magic (off, len),
+# archive header checksum (off, len)
+IDX_HEADER_STRUCT = struct.Struct("<8sHHIQqQQQIIII")
+# ftype, fhstart, fcontentstart, fsize, fcsize, then (off, len) pairs for
+# fname, fcompression, fheaderchecksum, fcontentchecksumtype, fcontentchecksum
+IDX_RECORD_STRUCT = struct.Struct("<IQQQQIIIIIIIIII")
+
+
+def _open_archive_infile(infile):
+    if(hasattr(infile, "read") or hasattr(infile, "write")):
+        fp = infile
+    elif(isinstance(infile, bytes)):
+        fp = MkTempFile()
+        fp.write(infile)
+    elif(infile == "-"):
+        fp = MkTempFile()
+        shutil.copyfileobj(PY_STDIN_BUF, fp, length=__filebuff_size__)
+    elif(re.findall(__download_proto_support__, infile) and pywwwget):
+        fp = download_file_from_internet_file(infile)
+        if(not fp):
+            return False
+    else:
+        infile = RemoveWindowsPath(infile)
+        if(not os.path.exists(infile) or not os.path.isfile(infile)):
+            return False
+        fp = open(infile, "rb")
+    return fp
+
+
+def _get_archive_formatspecs(fp, filestart=0, formatspecs=__file_format_multi_dict__):
+    compresscheck = CheckCompressionType(fp, formatspecs, filestart, False)
+    if(IsNestedDict(formatspecs) and compresscheck in formatspecs):
+        return formatspecs[compresscheck]
+    elif(IsSingleDict(formatspecs) and compresscheck == formatspecs['format_magic']):
+        return formatspecs
+    return None
+
+
+def _open_archive_stream(infile, fmttype="auto", filestart=0, formatspecs=__file_format_multi_dict__):
+    if(IsNestedDict(formatspecs) and fmttype!="auto" and fmttype in formatspecs):
+        formatspecs = formatspecs[fmttype]
+    fp = _open_archive_infile(infile)
+    if(not fp):
+        return False
+    informatspecs = _get_archive_formatspecs(fp, filestart, formatspecs)
+    if(informatspecs is not None):
+        return (fp, filestart, informatspecs)
+    infp = UncompressFileAlt(fp, formatspecs, filestart)
+    if(not infp or infp is fp):
+        return False
+    informatspecs = _get_archive_formatspecs(infp, 0, formatspecs)
+    if(informatspecs is not None):
+        return (infp, 0, informatspecs)
+    return False
+
+
+def _archive_fingerprint(fp):
+    try:
+        fstatinfo = os.fstat(fp.fileno())
+        return (fstatinfo.st_size, fstatinfo.st_mtime_ns)
+    except (io.UnsupportedOperation, AttributeError, OSError, ValueError):
+        pass
+    fname = getattr(fp, "name", None)
+    if(isinstance(fname, str) and os.path.isfile(fname)):
+        fstatinfo = os.stat(fname)
+        return (fstatinfo.st_size, fstatinfo.st_mtime_ns)
+    curloc = fp.tell()
+    fp.seek(0, 2)
+    fsize = fp.tell()
+    fp.seek(curloc, 0)
+    return (fsize, 0)
+
+
+def _read_archive_header_checksum(fp, filestart=0, formatspecs=__file_format_dict__):
+    curloc = fp.tell()
+    try:
+        archiveheader = ReadFileDataHeaderToArray(fp, filestart, True, formatspecs)
+    except ValueError:
+        archiveheader = False
+    fp.seek(curloc, 0)
+    if(not archiveheader):
+        return False
+    return archiveheader['fheaderchecksum']
+
+
+def GetFileIndexPath(infile, suffix=".idx"):
+    if(hasattr(infile, "read") or hasattr(infile, "write")):
+        infile = getattr(infile, "name", None)
+    if(not isinstance(infile, str) or infile == "-" or re.findall(__download_proto_support__, infile)):
+        return None
+    return RemoveWindowsPath(infile) + suffix
+
+
+def ArchiveFileBuildIndex(infile, outfile=None, fmttype="auto", filestart=0, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None, verbose=False):
+    archivestream = _open_archive_stream(infile, fmttype, filestart, formatspecs)
+    if(not archivestream):
+        return False
+    fp, filestart, formatspecs = archivestream
+    if(outfile is None and not isinstance(infile, bytes) and infile != "-"):
+        outfile = GetFileIndexPath(infile if not hasattr(infile, "read") else fp)
+    archivelist = []
+    filelist = list(_iter_archive_entries(fp, filestart, 0, 0, True, False, skipchecksum, formatspecs, saltkey, archivelist))
+    if(len(archivelist) == 0 or len(filelist) != archivelist[0]['fnumfiles']):
+        return False
+    listarrayfiles = archivelist[0]
+    fsize, fmtime = _archive_fingerprint(fp)
+    stringblob = bytearray()
+    def _addstring(instr):
+        strbytes = instr.encode("UTF-8")
+        stroffset = len(stringblob)
+        stringblob.extend(strbytes)
+        return (stroffset, len(strbytes))
+    fmtref = _addstring(formatspecs['format_magic'])
+    hcsref = _addstring(listarrayfiles['fheaderchecksum'])
+    idxrecords = bytearray()
+    for curentry in filelist:
+        if(verbose):
+            VerbosePrintOut(curentry['fname'])
+        idxrecords.extend(IDX_RECORD_STRUCT.pack(curentry['ftype'], curentry['fhstart'], curentry['fcontentstart'], curentry['fsize'], curentry['fcsize'], *(_addstring(curentry['fname']) + _addstring(curentry['fcompression']) + _addstring(curentry['fheaderchecksum']) + _addstring(curentry['fcontentchecksumtype']) + _addstring(curentry['fcontentchecksum']))))
+    stringsoffset = IDX_HEADER_STRUCT.size + len(idxrecords)
+    idxout = IDX_HEADER_STRUCT.pack(IDX_MAGIC, IDX_VERSION, 0, len(filelist), fsize, fmtime, filestart, stringsoffset, len(stringblob), fmtref[0], fmtref[1], hcsref[0], hcsref[1]) + bytes(idxrecords) + bytes(stringblob)
+    if(outfile is None):
+        return idxout
+    elif(hasattr(outfile, "write")):
+        outfile.write(idxout)
+        return True
+    _atomic_write(outfile, idxout)
+    return True
+
+
+def ReadFileIndexData(fp, idxfile=None, filestart=0, headerchecksum=None, formatspecs=__file_format_dict__):
+    if(idxfile is None):
+        idxfile = GetFileIndexPath(fp)
+    if(idxfile is None):
+        return False
+    if(hasattr(idxfile, "read")):
+        idxdata = idxfile.read()
+    elif(isinstance(idxfile, bytes)):
+        idxdata = idxfile
+    else:
+        if(not os.path.isfile(idxfile)):
+            return False
+        with open(idxfile, "rb") as idxfp:
+            try:
+                idxdata = mmap.mmap(idxfp.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                idxdata = idxfp.read()
+    try:
+        return _parse_file_index(idxdata, fp, filestart, headerchecksum, formatspecs)
+    finally:
+        if(isinstance(idxdata, mmap.mmap)):
+            idxdata.close()
+
+
+def _parse_file_index(idxdata, fp, filestart=0, headerchecksum=None, formatspecs=__file_format_dict__):
+    if(len(idxdata) < IDX_HEADER_STRUCT.size):
+        return False
+    idxheader = IDX_HEADER_STRUCT.unpack_from(idxdata, 0)
+    if(idxheader[0] != IDX_MAGIC or idxheader[1] != IDX_VERSION):
+        return False
+    idxnumfiles, idxfsize, idxfmtime, idxfilestart, stringsoffset = idxheader[3:8]
+    def _getstring(stroffset, strlen):
+        return bytes(idxdata[stringsoffset + stroffset:stringsoffset + stroffset + strlen]).decode("UTF-8")
+    if(idxfilestart != filestart or (idxfsize, idxfmtime) != _archive_fingerprint(fp)):
+        return False
+    if(_getstring(idxheader[9], idxheader[10]) != formatspecs['format_magic']):
+        return False
+    idxheaderchecksum = _getstring(idxheader[11], idxheader[12])
+    if(headerchecksum is None):
+        headerchecksum = _read_archive_header_checksum(fp, filestart, formatspecs)
+    if(not headerchecksum or not CheckChecksums(idxheaderchecksum, headerchecksum)):
+        return False
+    idxlist = []
+    filetoid = {}
+    idxid = 0
+    recoffset = IDX_HEADER_STRUCT.size
+    while(idxid < idxnumfiles):
+        idxrecord = IDX_RECORD_STRUCT.unpack_from(idxdata, recoffset)
+        fname = _getstring(idxrecord[5], idxrecord[6])
+        idxlist.append({'fid': idxid, 'ftype': idxrecord[0], 'fname': fname, 'fhstart': idxrecord[1], 'fcontentstart': idxrecord[2], 'fsize': idxrecord[3], 'fcompression': _getstring(idxrecord[7], idxrecord[8]), 'fcsize': idxrecord[4], 'fheaderchecksum': _getstring(idxrecord[9], idxrecord[10]), 'fcontentchecksumtype': _getstring(idxrecord[11], idxrecord[12]), 'fcontentchecksum': _getstring(idxrecord[13], idxrecord[14])})
+        filetoid.update({fname: idxid})
+        recoffset = recoffset + IDX_RECORD_STRUCT.size
+        idxid = idxid + 1
+    return {'fnumfiles': idxnumfiles, 'fhstart': filestart, 'fchecksum': idxheaderchecksum, 'ffilelist': idxlist, 'filetoid': filetoid}
+
+
+def FindFileIndex(fp, filestart=0, skipchecksum=False, formatspecs=__file_format_dict__, saltkey=None, headerchecksum=None):
+    outindex = FindFileTOC(fp, filestart, skipchecksum, formatspecs, saltkey)
+    if(not outindex):
+        outindex = ReadFileIndexData(fp, None, filestart, headerchecksum, formatspecs)
+    return outindex
+
+
+def ArchiveFileLoadIndex(infile, idxfile=None, fmttype="auto", filestart=0, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None):
+    archivestream = _open_archive_stream(infile, fmttype, filestart, formatspecs)
+    if(not archivestream):
+        return False
+    fp, filestart, formatspecs = archivestream
+    if(idxfile is None):
+        outindex = FindFileTOC(fp, filestart, skipchecksum, formatspecs, saltkey)
+        if(outindex):
+            return outindex
+        idxfile = GetFileIndexPath(infile)
+    return ReadFileIndexData(fp, idxfile, filestart, None, formatspecs)
+
+
+# ===== Hierarchical path index (.pidx) =====
+# Entry names kept in two sorted arrays: full paths for lookup, recursive
+# prefix and glob ranges, and (parent, basename) for directory listings.
+# Every query is a bisect for the range bounds plus a walk over the k hits.
+# The sidecar stores records already in path order, plus the child order as
+# a permutation, so loading never re-sorts.
+PIDX_MAGIC = b"PYARCPIX"
+PIDX_VERSION = 1
+# magic, version, reserved, numfiles, archive size, archive mtime_ns,
+# filestart, strings offset, strings size, archive header checksum (off, len)
+PIDX_HEADER_STRUCT = struct.Struct("<8sHHIQqQQQII")
+# fid, ftype, fhstart, fname (off, len)
+PIDX_RECORD_STRUCT = struct.Struct("<IIQII")
+PIDX_ORDER_STRUCT = struct.Struct("<I")
+
+_glob_magic_re = re.compile("[*?[]")
+
+
+def _normalize_index_path(fname):
+    fname = fname.replace("\\", "/")
+    while(fname.startswith("./")):
+        fname = fname[2:]
+    return fname.strip("/")
+
+
+def _split_index_path(fname):
+    if("/" in fname):
+        return tuple(fname.rsplit("/", 1))
+    return ("", fname)
+
+
+def _bisect_prefix(sortedlist, prefix):
+    if(prefix == ""):
+        return (0, len(sortedlist))
+    return (bisect.bisect_left(sortedlist, prefix), bisect.bisect_left(sortedlist, prefix + "\U0010ffff"))
+
+
+def _translate_glob_segment(segment):
+    # fnmatch rules inside one path segment: nothing matches '/'
+    i = 0
+    outre = ""
+    while(i < len(segment)):
+        c = segment[i]
+        i = i + 1
+        if(c == "*"):
+            outre = outre + "[^/]*"
+        elif(c == "?"):
+            outre = outre + "[^/]"
+        elif(c == "["):
+            j = i
+            if(j < len(segment) and segment[j] == "!"):
+                j = j + 1
+            if(j < len(segment) and segment[j] == "]"):
+                j = j + 1
+            while(j < len(segment) and segment[j] != "]"):
+                j = j + 1
+            if(j >= len(segment)):
+                outre = outre + "\\["
+                continue
+            classbody = re.sub(r"([&~|\[])", r"\\\1", segment[i:j].replace("\\", "\\\\"))
+            i = j + 1
+            if(classbody.startswith("!")):
+                outre = outre + "[^/" + classbody[1:] + "]"
+            else:
+                outre = outre + "[" + classbody + "]"
+        else:
+            outre = outre + re.escape(c)
+    return outre
+
+
+def _compile_path_glob(segments):
+    # '**' as a whole segment matches zero or more segments
+    outre = ""
+    needsep = False
+    for i, segment in enumerate(segments):
+        if(segment == "**"):
+            if(i == len(segments) - 1):
+                outre = outre + ("(?:/.*)?" if needsep else ".*")
+            else:
+                outre = outre + ("/" if needsep else "") + "(?:[^/]+/)*"
+                needsep = False
+        else:
+            outre = outre + ("/" if needsep else "") + _translate_glob_segment(segment)
+            needsep = True
+    return re.compile("(?s:" + outre + ")\\Z")
+
+
+def _glob_literal_tail(segment):
+    # the longest suffix of a segment without glob syntax
+    i = len(segment)
+    while(i > 0 and segment[i - 1] not in "*?[]"):
+        i = i - 1
+    return segment[i:]
+
+
+class ArchiveFilePathIndex(object):
+    """Sorted path index over an archive listing.
+
+    Each record is a dict with 'fid', 'ftype', 'fname' and 'fhstart'.
+    """
+
+    def __init__(self, records, pathorder=None, childorder=None):
+        if(pathorder is None):
+            pathorder = sorted(range(len(records)), key=lambda i: _normalize_index_path(records[i]['fname']))
+        self.records = [records[i] for i in pathorder]
+        self._paths = [_normalize_index_path(x['fname']) for x in self.records]
+        splitpaths = [_split_index_path(x) for x in self._paths]
+        if(childorder is None):
+            childorder = sorted(range(len(splitpaths)), key=lambda i: splitpaths[i])
+        self._childorder = childorder
+        self._parents = [splitpaths[i][0] for i in childorder]
+        # reversed base names, sorted, built for the first '**/*.ext' glob
+        self._tailkeys = None
+        self._tailorder = None
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __contains__(self, fname):
+        return self.lookup(fname) is not None
+
+    def lookup(self, fname):
+        fname = _normalize_index_path(fname)
+        i = bisect.bisect_left(self._paths, fname)
+        if(i < len(self._paths) and self._paths[i] == fname):
+            return self.records[i]
+        return None
+
+    def children(self, dirname=""):
+        dirname = _normalize_index_path(dirname)
+        start = bisect.bisect_left(self._parents, dirname)
+        end = bisect.bisect_right(self._parents, dirname)
+        return [self.records[self._childorder[i]] for i in range(start, end)]
+
+    def prefix(self, dirname=""):
+        dirname = _normalize_index_path(dirname)
+        if(dirname == ""):
+            return list(self.records)
+        start, end = _bisect_prefix(self._paths, dirname + "/")
+        return self.records[start:end]
+
+    def _tail_range(self, tail):
+        if(self._tailkeys is None):
+            tailpairs = sorted((_split_index_path(curpath)[1][::-1], i) for i, curpath in enumerate(self._paths))
+            self._tailkeys = [x[0] for x in tailpairs]
+            self._tailorder = [x[1] for x in tailpairs]
+        return _bisect_prefix(self._tailkeys, tail[::-1])
+
+    def glob(self, pattern):
+        """Records whose path matches pattern.  '*', '?' and '[...]' stay
+        within one path segment and a '**' segment matches zero or more
+        segments.  The search is narrowed to the literal directory head,
+        to one directory's children, or to the base names ending in the
+        literal tail of the last segment, whichever is smallest."""
+        pattern = _normalize_index_path(pattern)
+        if(_glob_magic_re.search(pattern) is None):
+            record = self.lookup(pattern)
+            return [record] if record is not None else []
+        segments = pattern.split("/")
+        nliteral = 0
+        while(_glob_magic_re.search(segments[nliteral]) is None):
+            nliteral = nliteral + 1
+        dirname = "/".join(segments[:nliteral])
+        globre = _compile_path_glob(segments)
+        if(nliteral == len(segments) - 1 and segments[-1] != "**"):
+            start = bisect.bisect_left(self._parents, dirname)
+            end = bisect.bisect_right(self._parents, dirname)
+            candidates = sorted(self._childorder[start:end])
+        else:
+            start, end = _bisect_prefix(self._paths, dirname + "/" if dirname else "")
+            candidates = range(start, end)
+            if(dirname and segments[nliteral:] == ["**"]):
+                # 'dir/**' also matches dir itself
+                dirpos = bisect.bisect_left(self._paths, dirname)
+                if(dirpos < len(self._paths) and self._paths[dirpos] == dirname):
+                    candidates = [dirpos] + list(candidates)
+            tail = _glob_literal_tail(segments[-1]) if segments[-1] != "**" else ""
+            if(tail):
+                tstart, tend = self._tail_range(tail)
+                if(tend - tstart < len(candidates)):
+                    candidates = sorted(self._tailorder[tstart:tend])
+        return [self.records[i] for i in candidates if globre.match(self._paths[i])]
+
+    def to_bytes(self, fsize=0, fmtime=0, filestart=0, headerchecksum=""):
+        stringblob = bytearray()
+        def _addstring(instr):
+            strbytes = instr.encode("UTF-8")
+            stroffset = len(stringblob)
+            stringblob.extend(strbytes)
+            return (stroffset, len(strbytes))
+        hcsref = _addstring(headerchecksum)
+        pidxrecords = bytearray()
+        for currecord in self.records:
+            pidxrecords.extend(PIDX_RECORD_STRUCT.pack(currecord['fid'], currecord['ftype'], currecord['fhstart'], *_addstring(currecord['fname'])))
+        for curorder in self._childorder:
+            pidxrecords.extend(PIDX_ORDER_STRUCT.pack(curorder))
+        stringsoffset = PIDX_HEADER_STRUCT.size + len(pidxrecords)
+        return PIDX_HEADER_STRUCT.pack(PIDX_MAGIC, PIDX_VERSION, 0, len(self.records), fsize, fmtime, filestart, stringsoffset, len(stringblob), hcsref[0], hcsref[1]) + bytes(pidxrecords) + bytes(stringblob)
+
+
+def ArchiveFileArrayToPathIndex(inarray):
+    if(not isinstance(inarray, dict) or not inarray):
+        return False
+    records = []
+    for curentry in inarray.get('ffilelist') or []:
+        if(curentry.get('fname') is None or curentry.get('fid') is None):
+            continue
+        records.append({'fid': curentry['fid'], 'ftype': curentry.get('ftype', 0), 'fname': curentry['fname'], 'fhstart': curentry.get('fhstart', 0)})
+    return ArchiveFilePathIndex(records)
+
+
+class _ArchiveIndexes(dict):
+    """'indexes' dict that builds 'by_path' on first access, so callers
+    that only use by_name/by_type never pay for sorting the paths."""
+
+    def __init__(self, inarray, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        self._inarray = inarray
+
+    def __missing__(self, key):
+        if(key != "by_path"):
+            raise KeyError(key)
+        self[key] = ArchiveFileArrayToPathIndex(self._inarray)
+        return self[key]
+
+    def __contains__(self, key):
+        return key == "by_path" or dict.__contains__(self, key)
+
+    def get(self, key, default=None):
+        if(key in self):
+            return self[key]
+        return default
+
+
+def ArchiveFileBuildPathIndex(infile, outfile=None, fmttype="auto", filestart=0, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None, verbose=False):
+    archivestream = _open_archive_stream(infile, fmttype, filestart, formatspecs)
+    if(not archivestream):
+        return False
+    fp, filestart, formatspecs = archivestream
+    if(outfile is None and not isinstance(infile, bytes) and infile != "-"):
+        outfile = GetFileIndexPath(infile if not hasattr(infile, "read") else fp, ".pidx")
+    headerchecksum = _read_archive_header_checksum(fp, filestart, formatspecs)
+    if(not headerchecksum):
+        return False
+    listarrayfiles = FindFileIndex(fp, filestart, skipchecksum, formatspecs, saltkey, headerchecksum)
+    if(not listarrayfiles):
+        archivelist = []
+        filelist = list(_iter_archive_entries(fp, filestart, 0, 0, True, False, skipchecksum, formatspecs, saltkey, archivelist))
+        if(len(archivelist) == 0 or len(filelist) != archivelist[0]['fnumfiles']):
+            return False
+        listarrayfiles = {'ffilelist': filelist}
+    pathindex = ArchiveFileArrayToPathIndex(listarrayfiles)
+    if(verbose):
+        for currecord in pathindex:
+            VerbosePrintOut(currecord['fname'])
+    fsize, fmtime = _archive_fingerprint(fp)
+    pidxout = pathindex.to_bytes(fsize, fmtime, filestart, headerchecksum)
+    if(outfile is None):
+        return pathindex
+    elif(hasattr(outfile, "write")):
+        outfile.write(pidxout)
+        return pathindex
+    _atomic_write(outfile, pidxout)
+    return pathindex
+
+
+def _parse_file_path_index(pidxdata, fp, filestart=0, headerchecksum=None, formatspecs=__file_format_dict__):
+    if(len(pidxdata) < PIDX_HEADER_STRUCT.size):
+        return False
+    pidxheader = PIDX_HEADER_STRUCT.unpack_from(pidxdata, 0)
+    if(pidxheader[0] != PIDX_MAGIC or pidxheader[1] != PIDX_VERSION):
+        return False
+    pidxnumfiles, pidxfsize, pidxfmtime, pidxfilestart, stringsoffset = pidxheader[3:8]
+    def _getstring(stroffset, strlen):
+        return bytes(pidxdata[stringsoffset + stroffset:stringsoffset + stroffset + strlen]).decode("UTF-8")
+    if(pidxfilestart != filestart or (pidxfsize, pidxfmtime) != _archive_fingerprint(fp)):
+        return False
+    if(headerchecksum is None):
+        headerchecksum = _read_archive_header_checksum(fp, filestart, formatspecs)
+    if(not headerchecksum or not CheckChecksums(_getstring(pidxheader[9], pidxheader[10]), headerchecksum)):
+        return False
+    records = []
+    recoffset = PIDX_HEADER_STRUCT.size
+    for pidxrecord in PIDX_RECORD_STRUCT.iter_unpack(pidxdata[recoffset:recoffset + (pidxnumfiles * PIDX_RECORD_STRUCT.size)]):
+        records.append({'fid': pidxrecord[0], 'ftype': pidxrecord[1], 'fname': _getstring(pidxrecord[3], pidxrecord[4]), 'fhstart': pidxrecord[2]})
+    recoffset = recoffset + (pidxnumfiles * PIDX_RECORD_STRUCT.size)
+    childorder = [x[0] for x in PIDX_ORDER_STRUCT.iter_unpack(pidxdata[recoffset:recoffset + (pidxnumfiles * PIDX_ORDER_STRUCT.size)])]
+    return ArchiveFilePathIndex(records, range(pidxnumfiles), childorder)
+
+
+def ArchiveFileLoadPathIndex(infile, pidxfile=None, fmttype="auto", filestart=0, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None, buildmissing=False):
+    archivestream = _open_archive_stream(infile, fmttype, filestart, formatspecs)
+    if(not archivestream):
+        return False
+    fp, filestart, formatspecs = archivestream
+    if(pidxfile is None):
+        pidxfile = GetFileIndexPath(infile if not hasattr(infile, "read") else fp, ".pidx")
+    pathindex = False
+    if(hasattr(pidxfile, "read")):
+        pathindex = _parse_file_path_index(pidxfile.read(), fp, filestart, None, formatspecs)
+    elif(isinstance(pidxfile, bytes)):
+        pathindex = _parse_file_path_index(pidxfile, fp, filestart, None, formatspecs)
+    elif(pidxfile is not None and os.path.isfile(pidxfile)):
+        with open(pidxfile, "rb") as pidxfp:
+            pathindex = _parse_file_path_index(pidxfp.read(), fp, filestart, None, formatspecs)
+    if(not pathindex and buildmissing):
+        fp.seek(filestart, 0)
+        pathindex = ArchiveFileBuildPathIndex(fp, pidxfile if isinstance(pidxfile, str) else None, "auto", filestart, skipchecksum, formatspecs, saltkey, False)
+    return pathindex
+
+
+# ===== Stacked archive catalog (.cat) =====
+# One record per archive in a stack of concatenated archives, so archive K
+# is opened with one seek instead of parsing every archive before it.
+# Archives inside a whole-file compressed stream keep the offset of that
+# stream plus their offset in the uncompressed data.  When the stack grows
+# the catalog is extended from its last record instead of being rebuilt.
+CAT_MAGIC = b"PYARCCAT"
+CAT_VERSION = 1
+# magic, version, reserved, numarchives, archive size, archive mtime_ns,
+# filestart, strings offset, strings size
+CAT_HEADER_STRUCT = struct.Struct("<8sHHIQqQQQ")
+# stream start, archive start, archive end, numfiles, compressed flag,
+# archive header checksum (off, len)
+CAT_RECORD_STRUCT = struct.Struct("<QQQIIII")
+
+
+def _skip_stacked_archive(fp, filestart=0, skipchecksum=False, formatspecs=__file_format_dict__, saltkey=None):
+    # a filter that rejects every name reads headers only and leaves fp at
+    # the end of the archive (straight from a sidecar .idx when there is one)
+    archivelist = []
+    archiveiter = _iter_archive_entries(fp, filestart, 0, 0, True, False, skipchecksum, formatspecs, saltkey, archivelist, lambda fname: False)
+    try:
+        while True:
+            next(archiveiter)
+    except StopIteration as archivestop:
+        archiveread = archivestop.value
+    if(not archiveread or len(archivelist) == 0 or fp.tell() <= filestart):
+        return False
+    return archivelist[0]
+
+
+def _scan_archive_stack(fp, filestart=0, catalog=None, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None, verbose=False):
+    if(catalog is None):
+        catalog = []
+    def _addrecord(streamstart, archivestart, archiveend, archiveheader, compressed):
+        if(verbose):
+            VerbosePrintOut("archive " + str(len(catalog)) + " at offset " + str(archivestart) + " (" + str(archiveheader['fnumfiles']) + " files)")
+        catalog.append({'fstackid': len(catalog), 'fstreamstart': streamstart, 'fhstart': archivestart, 'fhend': archiveend, 'fnumfiles': archiveheader['fnumfiles'], 'fcompressed': compressed, 'fheaderchecksum': archiveheader['fheaderchecksum']})
+    currentfilepos = filestart
+    while True:
+        informatspecs = _get_archive_formatspecs(fp, currentfilepos, formatspecs)
+        if(informatspecs is not None):
+            archiveheader = _skip_stacked_archive(fp, currentfilepos, skipchecksum, informatspecs, saltkey)
+            if(not archiveheader):
+                break
+            _addrecord(currentfilepos, currentfilepos, fp.tell(), archiveheader, False)
+            currentfilepos = fp.tell()
+            continue
+        infp = UncompressFileAlt(fp, formatspecs, currentfilepos)
+        if(not infp or infp is fp):
+            break
+        currentinfilepos = 0
+        while True:
+            informatspecs = _get_archive_formatspecs(infp, currentinfilepos, formatspecs)
+            if(informatspecs is None):
+                break
+            archiveheader = _skip_stacked_archive(infp, currentinfilepos, skipchecksum, informatspecs, saltkey)
+            if(not archiveheader):
+                break
+            _addrecord(currentfilepos, currentinfilepos, infp.tell(), archiveheader, True)
+            currentinfilepos = infp.tell()
+        break
+    return catalog
+
+
+def _stack_catalog_to_bytes(catalog, fsize=0, fmtime=0, filestart=0):
+    stringblob = bytearray()
+    catrecords = bytearray()
+    for currecord in catalog:
+        strbytes = currecord['fheaderchecksum'].encode("UTF-8")
+        catrecords.extend(CAT_RECORD_STRUCT.pack(currecord['fstreamstart'], currecord['fhstart'], currecord['fhend'], currecord['fnumfiles'], int(currecord['fcompressed']), len(stringblob), len(strbytes)))
+        stringblob.extend(strbytes)
+    stringsoffset = CAT_HEADER_STRUCT.size + len(catrecords)
+    return CAT_HEADER_STRUCT.pack(CAT_MAGIC, CAT_VERSION, 0, len(catalog), fsize, fmtime, filestart, stringsoffset, len(stringblob)) + bytes(catrecords) + bytes(stringblob)
+
+
+def _parse_stack_catalog(catdata, filestart=0):
+    if(len(catdata) < CAT_HEADER_STRUCT.size):
+        return False
+    catheader = CAT_HEADER_STRUCT.unpack_from(catdata, 0)
+    if(catheader[0] != CAT_MAGIC or catheader[1] != CAT_VERSION or catheader[6] != filestart):
+        return False
+    catnumarchives, catfsize, catfmtime = catheader[3:6]
+    stringsoffset = catheader[7]
+    if(len(catdata) < stringsoffset + catheader[8]):
+        return False
+    catalog = []
+    recoffset = CAT_HEADER_STRUCT.size
+    for catrecord in CAT_RECORD_STRUCT.iter_unpack(catdata[recoffset:recoffset + (catnumarchives * CAT_RECORD_STRUCT.size)]):
+        fheaderchecksum = bytes(catdata[stringsoffset + catrecord[5]:stringsoffset + catrecord[5] + catrecord[6]]).decode("UTF-8")
+        catalog.append({'fstackid': len(catalog), 'fstreamstart': catrecord[0], 'fhstart': catrecord[1], 'fhend': catrecord[2], 'fnumfiles': catrecord[3], 'fcompressed': bool(catrecord[4]), 'fheaderchecksum': fheaderchecksum})
+    return (catalog, catfsize, catfmtime)
+
+
+def _extend_stack_catalog(fp, catalog, filestart=0, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None):
+    # the stack was appended to: rescan from the last known archive, which
+    # must still parse to the same header and end offset
+    if(len(catalog) == 0 or catalog[-1]['fcompressed']):
+        return False
+    lastrecord = catalog[-1]
+    newcatalog = _scan_archive_stack(fp, lastrecord['fhstart'], catalog[:-1], skipchecksum, formatspecs, saltkey)
+    if(len(newcatalog) < len(catalog)):
+        return False
+    if(newcatalog[len(catalog) - 1]['fhend'] != lastrecord['fhend'] or newcatalog[len(catalog) - 1]['fheaderchecksum'] != lastrecord['fheaderchecksum']):
+        return False
+    return newcatalog
+
+
+def _open_stack_record(fp, record, formatspecs=__file_format_multi_dict__):
+    if(record['fcompressed']):
+        infp = UncompressFileAlt(fp, formatspecs, record['fstreamstart'])
+        if(not infp or infp is fp):
+            return False
     else:
-        outfilecontentcshex = GetFileChecksum(filecontent, checksumtype[1], False, formatspecs, saltkey)
-    tmpfileoutstr = outfileoutstr + \
-        AppendNullBytes([outfileheadercshex, outfilecontentcshex],
-                        formatspecs['format_delimiter'])
-    formheaersize = format(int(len(tmpfileoutstr) - len(formatspecs['format_delimiter'])), 'x').lower()
-    outfileoutstr = AppendNullByte(
-        formheaersize, formatspecs['format_delimiter']) + outfileoutstr
-    outfileheadercshex = GetFileChecksum(outfileoutstr, checksumtype[0], True, formatspecs, saltkey)
-    outfileoutstr = outfileoutstr + \
-        AppendNullBytes([outfileheadercshex, outfilecontentcshex],
-                        formatspecs['format_delimiter'])
-    outfileoutstrecd = outfileoutstr
-    outfileout = outfileoutstrecd + fjsoncontent + nullstrecd +  filecontent + nullstrecd
+        infp = fp
+    informatspecs = _get_archive_formatspecs(infp, record['fhstart'], formatspecs)
+    if(informatspecs is None):
+        return False
+    headerchecksum = _read_archive_header_checksum(infp, record['fhstart'], informatspecs)
+    if(not headerchecksum or not CheckChecksums(record['fheaderchecksum'], headerchecksum)):
+        return False
+    infp.seek(record['fhstart'], 0)
+    return (infp, informatspecs)
+
+
+def ArchiveFileBuildStackCatalog(infile, outfile=None, fmttype="auto", filestart=0, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None, verbose=False):
+    if(IsNestedDict(formatspecs) and fmttype!="auto" and fmttype in formatspecs):
+        formatspecs = formatspecs[fmttype]
+    fp = _open_archive_infile(infile)
+    if(not fp):
+        return False
     try:
-        fp.write(outfileout)
-    except OSError:
+        if(outfile is None and not isinstance(infile, bytes) and infile != "-"):
+            outfile = GetFileIndexPath(infile, ".cat")
+        catalog = _scan_archive_stack(fp, filestart, None, skipchecksum, formatspecs, saltkey, verbose)
+        if(len(catalog) == 0):
+            return False
+        fsize, fmtime = _archive_fingerprint(fp)
+    finally:
+        if(not (hasattr(infile, "read") or hasattr(infile, "write"))):
+            fp.close()
+    if(outfile is None):
+        return catalog
+    catout = _stack_catalog_to_bytes(catalog, fsize, fmtime, filestart)
+    if(hasattr(outfile, "write")):
+        outfile.write(catout)
+        return catalog
+    _atomic_write(outfile, catout)
+    return catalog
+
+
+def ArchiveFileLoadStackCatalog(infile, catfile=None, fmttype="auto", filestart=0, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None, buildmissing=False):
+    if(IsNestedDict(formatspecs) and fmttype!="auto" and fmttype in formatspecs):
+        formatspecs = formatspecs[fmttype]
+    fp = _open_archive_infile(infile)
+    if(not fp):
         return False
     try:
-        fp.flush()
-        if(hasattr(os, "sync")):
-            os.fsync(fp.fileno())
-    except (io.UnsupportedOperation, AttributeError, OSError):
-        pass
-    return fp
+        if(catfile is None):
+            catfile = GetFileIndexPath(infile, ".cat")
+        catparsed = False
+        if(hasattr(catfile, "read")):
+            catparsed = _parse_stack_catalog(catfile.read(), filestart)
+        elif(isinstance(catfile, bytes)):
+            catparsed = _parse_stack_catalog(catfile, filestart)
+        elif(catfile is not None and os.path.isfile(catfile)):
+            with open(catfile, "rb") as catfp:
+                catparsed = _parse_stack_catalog(catfp.read(), filestart)
+        fsize, fmtime = _archive_fingerprint(fp)
+        if(catparsed and (catparsed[1], catparsed[2]) == (fsize, fmtime)):
+            return catparsed[0]
+        if(not buildmissing):
+            return False
+        catalog = False
+        if(catparsed and fsize >= catparsed[1]):
+            catalog = _extend_stack_catalog(fp, catparsed[0], filestart, skipchecksum, formatspecs, saltkey)
+        if(not catalog):
+            catalog = _scan_archive_stack(fp, filestart, None, skipchecksum, formatspecs, saltkey)
+        if(len(catalog) == 0):
+            return False
+        if(isinstance(catfile, str)):
+            _atomic_write(catfile, _stack_catalog_to_bytes(catalog, fsize, fmtime, filestart))
+        return catalog
+    finally:
+        if(not (hasattr(infile, "read") or hasattr(infile, "write"))):
+            fp.close()
+
+
+def ArchiveFileOpenStackMember(infile, stackid, fmttype="auto", seekstart=0, seekend=0, listonly=False, contentasfile=True, uncompress=True, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None, catfile=None, returnfp=False):
+    """
+    Read archive number stackid (negative counts from the end) of a stack
+    of concatenated archives without parsing the archives before it.
+    The .cat catalog is built or extended on first use.
+    """
+    if(IsNestedDict(formatspecs) and fmttype!="auto" and fmttype in formatspecs):
+        formatspecs = formatspecs[fmttype]
+    catalog = ArchiveFileLoadStackCatalog(infile, catfile, "auto", 0, skipchecksum, formatspecs, saltkey, True)
+    if(not catalog):
+        return False
+    if(stackid < -len(catalog) or stackid >= len(catalog)):
+        return False
+    fp = _open_archive_infile(infile)
+    if(not fp):
+        return False
+    stackrecord = _open_stack_record(fp, catalog[stackid], formatspecs)
+    if(not stackrecord and isinstance(infile, str) and infile != "-"):
+        # catalog did not match the archive, rebuild it once
+        catalog = ArchiveFileBuildStackCatalog(infile, catfile, "auto", 0, skipchecksum, formatspecs, saltkey)
+        if(catalog and -len(catalog) <= stackid < len(catalog)):
+            stackrecord = _open_stack_record(fp, catalog[stackid], formatspecs)
+    if(not stackrecord):
+        if(not (hasattr(infile, "read") or hasattr(infile, "write"))):
+            fp.close()
+        return False
+    infp, informatspecs = stackrecord
+    outarray = ReadFileDataWithContentToArray(infp, catalog[stackid]['fhstart'], seekstart, seekend, listonly, contentasfile, uncompress, skipchecksum, informatspecs, saltkey, False)
+    if(not outarray):
+        return False
+    outarray.update({'fstackid': catalog[stackid]['fstackid']})
+    if(not returnfp):
+        try:
+            outarray['fp'].close()
+        except Exception:
+            pass
+        outarray['fp'] = None
+    return outarray
+
 
-def AppendFilesWithContentFromInFile(infile, fp, fmttype="auto", listtype="dir", extradata=[], jsondata={}, compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt, checksumtype=["md5", "md5", "md5", "md5", "md5"], formatspecs=__file_format_dict__, saltkey=None, verbose=False):
+def AppendFilesWithContentFromInFile(infile, fp, fmttype="auto", listtype="dir", extradata=[], jsondata={}, compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt, checksumtype=["md5", "md5", "md5", "md5", "md5"], formatspecs=__file_format_dict__, saltkey=None, verbose=False, durability=None):
     if(not hasattr(fp, "write")):
         return False
     if(listtype.lower()=="dir"):
@@ -6509,22 +9137,12 @@ def AppendFilesWithContentFromInFile(infile, fp, fmttype="auto", listtype="dir",
         GetDirList = AppendFilesWithContentToList(infile, fmttype, extradata, jsondata, False, compression, compresswholefile, compressionlevel, compressionuselist, [checksumtype[2], checksumtype[3], checksumtype[3]], formatspecs, saltkey, verbose)
     numfiles = int(len(GetDirList))
     fnumfiles = format(numfiles, 'x').lower()
-    AppendFileHeader(fp, fmttype, numfiles, "UTF-8", [], {}, [checksumtype[0], checksumtype[1]], formatspecs, saltkey)
-    try:
-        fp.flush()
-        if(hasattr(os, "sync")):
-            os.fsync(fp.fileno())
-    except (io.UnsupportedOperation, AttributeError, OSError):
-        pass
+    durability = _get_durability(durability)
+    AppendFileHeader(fp, fmttype, numfiles, "UTF-8", [], {}, [checksumtype[0], checksumtype[1]], formatspecs, saltkey, durability)
     for curfname in GetDirList:
         tmpoutlist = curfname['fheaders']
-        AppendFileHeaderWithContent(fp, fmttype, tmpoutlist, curfname['fextradata'], curfname['fjsoncontent'], curfname['fcontents'], [curfname['fheaderchecksumtype'], curfname['fcontentchecksumtype'], curfname['fjsonchecksumtype']], formatspecs, saltkey)
-        try:
-            fp.flush()
-            if(hasattr(os, "sync")):
-                os.fsync(fp.fileno())
-        except (io.UnsupportedOperation, AttributeError, OSError):
-            pass
+        AppendFileHeaderWithContent(fp, fmttype, tmpoutlist, curfname['fextradata'], curfname['fjsoncontent'], curfname['fcontents'], [curfname['fheaderchecksumtype'], curfname['fcontentchecksumtype'], curfname['fjsonchecksumtype']], formatspecs, saltkey, None, durability)
+    durability.finish(fp)
     return fp
 
 def AppendFilesWithContentFromInFileToOutFile(infiles, outfile, listtype="dir", fmttype="auto", compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt, extradata=[], jsondata={}, checksumtype=["md5", "md5", "md5", "md5", "md5"], formatspecs=__file_format_multi_dict__, saltkey=None, verbose=False, returnfp=False):
@@ -6573,12 +9191,6 @@ def AppendFilesWithContentFromInFileToOutFile(infiles, outfile, listtype="dir",
     if(outfile == "-" or outfile is None or hasattr(outfile, "read")):
         fp = CompressOpenFileAlt(
             fp, compression, compressionlevel, compressionuselist, formatspecs)
-        try:
-            fp.flush()
-            if(hasattr(os, "sync")):
-                os.fsync(fp.fileno())
-        except (io.UnsupportedOperation, AttributeError, OSError):
-            pass
     if(outfile == "-"):
         fp.seek(0, 0)
         shutil.copyfileobj(fp, PY_STDOUT_BUF, length=__filebuff_size__)
@@ -6614,15 +9226,11 @@ def AppendFilesWithContentFromInFileToStackedOutFile(infiles, outfile, listtype=
         return True
     return returnout
 
-def AppendFilesWithContentToList(infiles, fmttype="auto", dirlistfromtxt=False, extradata=[], jsondata={}, contentasfile=False, compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt, followlink=False, checksumtype=["md5", "md5", "md5"], formatspecs=__file_format_dict__, saltkey=None, verbose=False):
+def _get_archive_input_list(infiles, dirlistfromtxt=False, followlink=False, formatspecs=__file_format_dict__):
+    # Expand infiles (paths, "-" or list files) into the names to pack;
+    # returns (names or False, followlink)
     advancedlist = __use_advanced_list__
-    altinode = __use_alt_inode__
     infilelist = []
-    if(IsNestedDict(formatspecs) and fmttype in formatspecs):
-        formatspecs = formatspecs[fmttype]
-    elif(IsNestedDict(formatspecs) and fmttype not in formatspecs):
-        fmttype = __file_format_default__
-        formatspecs = formatspecs[fmttype]
     if(not dirlistfromtxt and not isinstance(infiles, (list, tuple, )) and infiles == "-"):
         for line in PY_STDIN_TEXT:
             infilelist.append(line.strip())
@@ -6641,7 +9249,7 @@ def AppendFilesWithContentToList(infiles, fmttype="auto", dirlistfromtxt=False,
                         infilelist.append(line.strip())
                 else:
                     if(not os.path.exists(fileloc) or not os.path.isfile(fileloc)):
-                        return False
+                        return (False, followlink)
                     else:
                         with UncompressFile(fileloc, formatspecs, "r") as finfile:
                             for line in finfile:
@@ -6663,375 +9271,769 @@ def AppendFilesWithContentToList(infiles, fmttype="auto", dirlistfromtxt=False,
         GetDirList = infilelist
     else:
         GetDirList = ListDir(infilelist, followlink, False)
-    if(not isinstance(GetDirList, (list, tuple, ))):
-        return False
-    FullSizeFiles = GetTotalSize(GetDirList)
-    if(not GetDirList):
-        return False
-    curinode = 0
-    curfid = 0
-    inodelist = []
-    inodetofile = {}
-    filetoinode = {}
-    inodetoforminode = {}
-    FullSizeFilesAlt = 0
-    tmpoutlist = []
-    for curfname in GetDirList:
-        fencoding = "UTF-8"
-        fname = curfname
-        if(not os.path.exists(fname)):
-            return False
-        if(verbose):
-            VerbosePrintOut(fname)
-        if(not followlink or followlink is None):
-            fstatinfo = os.lstat(fname)
-        else:
-            fstatinfo = os.stat(fname)
-        fpremode = fstatinfo.st_mode
-        finode = fstatinfo.st_ino
-        flinkcount = fstatinfo.st_nlink
-        try:
-            FullSizeFilesAlt += fstatinfo.st_rsize
-        except AttributeError:
-            FullSizeFilesAlt += fstatinfo.st_size
-        fblksize = format(int(0), 'x').lower()
-        if(hasattr(fstatinfo, "st_blksize")):
-            fblksize = format(int(fstatinfo.st_blksize), 'x').lower()
-        fblocks = format(int(0), 'x').lower()
-        if(hasattr(fstatinfo, "st_blocks")):
-            fblocks = format(int(fstatinfo.st_blocks), 'x').lower()
-        fflags = format(int(0), 'x').lower()
-        if(hasattr(fstatinfo, "st_flags")):
-            fflags = format(int(fstatinfo.st_flags), 'x').lower()
-        ftype = 0
-        if(not followlink and hasattr(os.path, "isjunction") and os.path.isjunction(fname)):
-            ftype = 13
-        elif(stat.S_ISREG(fpremode)):
-            if(hasattr(fstatinfo, "st_blocks") and fstatinfo.st_size > 0 and fstatinfo.st_blocks * 512 < fstatinfo.st_size):
-                ftype = 12
-            else:
-                ftype = 0
-        elif(not followlink and stat.S_ISLNK(fpremode)):
-            ftype = 2
-        elif(stat.S_ISCHR(fpremode)):
-            ftype = 3
-        elif(stat.S_ISBLK(fpremode)):
-            ftype = 4
-        elif(stat.S_ISDIR(fpremode)):
-            ftype = 5
-        elif(stat.S_ISFIFO(fpremode)):
-            ftype = 6
-        elif(stat.S_ISSOCK(fpremode)):
-            ftype = 8
-        elif(hasattr(stat, "S_ISDOOR") and stat.S_ISDOOR(fpremode)):
-            ftype = 9
-        elif(hasattr(stat, "S_ISPORT") and stat.S_ISPORT(fpremode)):
-            ftype = 10
-        elif(hasattr(stat, "S_ISWHT") and stat.S_ISWHT(fpremode)):
-            ftype = 11
-        elif(hasattr(stat, "S_ISSOCK") and stat.S_ISSOCK(fpremode)):
-            ftype = 15
-        else:
-            ftype = 0
-        flinkname = ""
-        fcurfid = format(int(curfid), 'x').lower()
-        if(not followlink and finode != 0):
-            unique_id = (fstatinfo.st_dev, finode)
-            if(ftype != 1):
-                if(unique_id in inodetofile):
-                    # Hard link detected
-                    ftype = 1
-                    flinkname = inodetofile[unique_id]
-                else:
-                    # First time seeing this inode
-                    inodetofile[unique_id] = fname
-                if(unique_id not in inodetoforminode):
-                    inodetoforminode[unique_id] = curinode
-                    curinode = curinode + 1
-                if(altinode):
-                    # altinode == True → use real inode number
-                    fcurinode = format(int(unique_id[1]), 'x').lower()
-                else:
-                    # altinode == False → use synthetic inode id
-                    fcurinode = format(int(inodetoforminode[unique_id]), 'x').lower()
-        else:
-            # Handle cases where inodes are not supported or symlinks are followed
-            fcurinode = format(int(curinode), 'x').lower()
-            curinode = curinode + 1
-        curfid = curfid + 1
-        if(ftype == 2):
-            flinkname = os.readlink(fname)
-            if(not os.path.exists(fname)):
-                return False
-        try:
-            fdev = fstatinfo.st_dev
-            fdev_major = os.major(fdev)
-            fdev_minor = os.minor(fdev)
-        except AttributeError:
-            fdev = 0
-            fdev_major = 0
-            fdev_minor = 0
-        try:
-            frdev = fstatinfo.st_rdev
-            frdev_major = os.major(frdev)
-            frdev_minor = os.minor(frdev)
-        except AttributeError:
-            frdev = 0
-            frdev_major = 0
-            frdev_minor = 0
-        # Types that should be considered zero-length in the archive context:
-        zero_length_types = {1, 2, 3, 4, 5, 6, 8, 9, 10, 11, 13}
-        # Types that have actual data to read:
-        data_types = {0, 7}
-        sparse_types = {12}
-        if ftype in zero_length_types:
-            fsize = format(int(0), 'x').lower()
-        elif ftype in data_types:
-            fsize = format(int(fstatinfo.st_size), 'x').lower()
-        else:
-            fsize = format(int(fstatinfo.st_size), 'x').lower()
-        if(hasattr(fstatinfo, "st_atime_ns")):
-            fatime = format(int(fstatinfo.st_atime_ns), 'x').lower()
-        else:
-            fatime = format(int(to_ns(fstatinfo.st_atime)), 'x').lower()
-        if(hasattr(fstatinfo, "st_mtime_ns")):
-            fmtime = format(int(fstatinfo.st_mtime_ns), 'x').lower()
-        else:
-            fmtime = format(int(to_ns(fstatinfo.st_mtime)), 'x').lower()
-        if(hasattr(fstatinfo, "st_ctime_ns")):
-            fctime = format(int(fstatinfo.st_ctime_ns), 'x').lower()
-        else:
-            fctime = format(int(to_ns(fstatinfo.st_ctime)), 'x').lower()
-        if(hasattr(fstatinfo, "st_birthtime")):
-            if(hasattr(fstatinfo, "st_birthtime_ns")):
-                fbtime = format(int(fstatinfo.st_birthtime_ns), 'x').lower()
-            else:
-                fbtime = format(int(to_ns(fstatinfo.st_birthtime)), 'x').lower()
-        else:
-            if(hasattr(fstatinfo, "st_ctime_ns")):
-                fbtime = format(int(fstatinfo.st_ctime_ns), 'x').lower()
-            else:
-                fbtime = format(int(to_ns(fstatinfo.st_ctime)), 'x').lower()
-        fmode = format(int(fstatinfo.st_mode), 'x').lower()
-        fchmode = format(int(stat.S_IMODE(fstatinfo.st_mode)), 'x').lower()
-        ftypemod = format(int(stat.S_IFMT(fstatinfo.st_mode)), 'x').lower()
-        fuid = format(int(fstatinfo.st_uid), 'x').lower()
-        fgid = format(int(fstatinfo.st_gid), 'x').lower()
-        funame = ""
+    if(not isinstance(GetDirList, (list, tuple, )) or not GetDirList):
+        return (False, followlink)
+    return (GetDirList, followlink)
+
+
+def _entry_tempfile(inflight=None):
+    # Content buffer for one member: in memory, or at most inflight bytes
+    # in memory with the rest spilled to a temp file on disk
+    if(inflight is None):
+        return MkTempFile()
+    return MkTempFile(inmem=False, use_spool=True, spool_max=inflight)
+
+
+# Learned auto codec choices, off until SetCompressionPolicy is called
+_compression_policy = None
+
+
+class CompressionPolicy(object):
+    """
+    Learned codec choices for compression="auto", per file type: a
+    member's lowercased extension plus its GetBinaryFileType name.  Each
+    sampled trial adds the bytes in, bytes out and seconds of every codec
+    to its type.  Once every codec in the list has been tried on a type,
+    its members get the best scoring codec directly, and only every
+    explore-th one runs the trial again (None never does).  With a path
+    the table is loaded from and saved to that JSON file; when two runs
+    share it the last one to save wins.
+    """
+    VERSION = 1
+
+    def __init__(self, path=None, explore=DEFAULT_POLICY_EXPLORE):
+        if(explore is not None and int(explore) < 1):
+            raise ValueError("policy exploration interval must be at least 1")
+        self.path = path
+        self.explore = None if explore is None else int(explore)
+        self.types = {}
+        self._dirty = False
+        self._updates = None
+        self._lock = threading.Lock()
+        if(path is not None):
+            self.load()
+
+    def __getstate__(self):
+        # a worker process gets the table to choose from and hands back
+        # what it learned, see take_updates
+        with self._lock:
+            return {'explore': self.explore, 'types': json.loads(json.dumps(self.types))}
+
+    def __setstate__(self, state):
+        self.__init__(None, state['explore'])
+        self.types = state['types']
+        self._updates = []
+
+    @staticmethod
+    def get_type(fname, binarytype=False):
+        ftype = os.path.splitext(fname or "")[1].lower()
+        if(binarytype is not False):
+            ftype = ftype + ":" + binarytype[0]
+        return ftype
+
+    def choose(self, ftype, compressionuselist=compressionlistalt):
+        """The learned codec for ftype, or None when a trial should run."""
+        with self._lock:
+            curtype = self.types.get(ftype)
+            if(curtype is None):
+                return None
+            if(self.explore is not None and curtype['uses'] % self.explore == 0):
+                return None
+            codecs = curtype['codecs']
+            candidates = [curcodec for curcodec in compressionuselist if curcodec in codecs and codecs[curcodec][0] > 0]
+            if(not candidates or len(candidates) < len(compressionuselist)):
+                return None
+            stats = [list(codecs[curcodec]) for curcodec in candidates]
+        times = [curstats[2] / float(curstats[0]) for curstats in stats]
+        maxtime = max(times)
+        if(maxtime <= 0):
+            maxtime = 1.0
+        scores = [((curstats[1] / float(curstats[0])) * 0.7) + ((curtime / maxtime) * 0.3) for curstats, curtime in zip(stats, times)]
+        return candidates[scores.index(min(scores))]
+
+    def record(self, ftype, trials=()):
+        """Count one member of ftype; trials holds (codec, bytes in,
+        bytes out, seconds) for each codec tried on it."""
+        with self._lock:
+            curtype = self.types.get(ftype)
+            if(curtype is None):
+                curtype = self.types[ftype] = {'uses': 0, 'codecs': {}}
+            curtype['uses'] += 1
+            for curcodec, insize, outsize, seconds in trials:
+                curstats = curtype['codecs'].get(curcodec)
+                if(curstats is None):
+                    curstats = curtype['codecs'][curcodec] = [0, 0, 0.0, 0]
+                curstats[0] += insize
+                curstats[1] += outsize
+                curstats[2] += seconds
+                curstats[3] += 1
+            self._dirty = True
+            if(self._updates is not None):
+                self._updates.append((ftype, list(trials)))
+
+    def take_updates(self):
+        with self._lock:
+            updates = self._updates or []
+            if(self._updates is not None):
+                self._updates = []
+        return updates
+
+    def merge(self, updates):
+        for ftype, trials in updates:
+            self.record(ftype, trials)
+
+    def report(self):
+        outreport = {}
+        with self._lock:
+            for ftype, curtype in self.types.items():
+                codecs = {}
+                for curcodec, curstats in curtype['codecs'].items():
+                    if(curstats[0] > 0):
+                        mbps = 0.0
+                        if(curstats[2] > 0):
+                            mbps = curstats[0] / curstats[2] / BYTES_PER_MiB
+                        codecs[curcodec] = {'trials': curstats[3], 'ratio': curstats[1] / float(curstats[0]), 'mbps': mbps}
+                outreport[ftype] = {'uses': curtype['uses'], 'codecs': codecs}
+        return outreport
+
+    def load(self, path=None):
+        if(path is None):
+            path = self.path
         try:
-            import pwd
-            try:
-                userinfo = pwd.getpwuid(fstatinfo.st_uid)
-                funame = userinfo.pw_name
-            except KeyError:
-                funame = ""
-        except ImportError:
-            funame = ""
-        fgname = ""
+            with open(path, "r") as policyfp:
+                policydata = json.load(policyfp)
+        except (IOError, OSError, ValueError):
+            return False
+        if(not isinstance(policydata, dict) or policydata.get('version') != self.VERSION or not isinstance(policydata.get('types'), dict)):
+            return False
+        with self._lock:
+            self.types = policydata['types']
+            self._dirty = False
+        return True
+
+    def save(self, path=None):
+        if(path is None):
+            path = self.path
+        if(path is None or not self._dirty):
+            return False
+        with self._lock:
+            policydata = json.dumps({'version': self.VERSION, 'types': self.types}, separators=(',', ':'), sort_keys=True)
+            self._dirty = False
+        # written next to the target and renamed over it, so a crash
+        # never leaves a half written table behind
+        tmppath = path + "." + str(os.getpid()) + ".tmp"
         try:
-            import grp
+            with open(tmppath, "w") as policyfp:
+                policyfp.write(policydata)
+            os.replace(tmppath, path)
+        except (IOError, OSError):
+            self._dirty = True
             try:
-                groupinfo = grp.getgrgid(fstatinfo.st_gid)
-                fgname = groupinfo.gr_name
-            except KeyError:
-                fgname = ""
-        except ImportError:
-            fgname = ""
-        fdev = format(int(fdev), 'x').lower()
-        fdev_major = format(int(fdev_major), 'x').lower()
-        fdev_minor = format(int(fdev_minor), 'x').lower()
-        frdev = format(int(frdev), 'x').lower()
-        frdev_major = format(int(frdev_major), 'x').lower()
-        frdev_minor = format(int(frdev_minor), 'x').lower()
-        finode = format(int(finode), 'x').lower()
-        flinkcount = format(int(flinkcount), 'x').lower()
-        if(hasattr(fstatinfo, "st_file_attributes")):
-            fwinattributes = format(
-                int(fstatinfo.st_file_attributes), 'x').lower()
+                os.unlink(tmppath)
+            except OSError:
+                pass
+            return False
+        return True
+
+
+def SetCompressionPolicy(policy=None):
+    """Learn compression="auto" codecs in policy, a CompressionPolicy or
+    the path of the file to keep one in (None turns learning off).
+    Returns the previous policy."""
+    global _compression_policy
+    if(policy is not None and not isinstance(policy, CompressionPolicy)):
+        policy = CompressionPolicy(policy)
+    oldpolicy = _compression_policy
+    _compression_policy = policy
+    return oldpolicy
+
+
+def GetCompressionPolicy():
+    return _compression_policy
+
+
+# Binary types from GetBinaryFileType whose payload is already compressed
+_precompressed_binary_types = frozenset(["JPEG", "PNG", "GIF87a", "GIF89a", "WEBP", "AVIF", "HEIF", "MP3/ID3", "OGG", "FLAC", "WOFF", "WOFF2"])
+
+
+def _get_member_samples(fcontents, ucfsize, samplesize=None):
+    # The whole member when it is small, else samplesize bytes from its
+    # start, middle and end
+    if(samplesize is None):
+        samplesize = __auto_sample_size__
+    if(ucfsize <= samplesize * 3):
+        offsets = [0]
+        samplesize = ucfsize
+    else:
+        offsets = [0, (ucfsize - samplesize) // 2, ucfsize - samplesize]
+    samples = []
+    for offset in offsets:
+        fcontents.seek(offset, 0)
+        samples.append(fcontents.read(samplesize))
+    fcontents.seek(0, 0)
+    return samples
+
+
+def _get_bytes_entropy(data):
+    # Shannon entropy in bits per byte
+    if(not data):
+        return 0.0
+    datalen = float(len(data))
+    entropy = 0.0
+    for bytecount in collections.Counter(data).values():
+        byteprob = bytecount / datalen
+        entropy = entropy - (byteprob * math.log(byteprob, 2))
+    return entropy
+
+
+def _select_member_codec(fcontents, ucfsize, compressionuselist=compressionlistalt, compressionlevel=None, formatspecs=__file_format_dict__, samplesize=None, fname=None, policy=None):
+    """
+    Pick a codec from compressionuselist for an auto member by trial
+    compressing a few samples of it, scored 0.7 on ratio and 0.3 on
+    time, or take the one policy learned for its file type.  Returns
+    "none" for content that is already compressed or whose samples look
+    random.
+    """
+    if(CheckCompressionType(fcontents, filestart=0, closefp=False) is not False):
+        fcontents.seek(0, 0)
+        return "none"
+    binarytype = GetBinaryFileType(fcontents, 0, False)
+    fcontents.seek(0, 0)
+    if(binarytype is not False and binarytype[0] in _precompressed_binary_types):
+        return "none"
+    samples = _get_member_samples(fcontents, ucfsize, samplesize)
+    samplelen = sum(len(sample) for sample in samples)
+    if(samplelen == 0 or _get_bytes_entropy(b"".join(samples)) > __auto_max_entropy__):
+        return "none"
+    if(policy is not None):
+        ftype = policy.get_type(fname, binarytype)
+        curcompression = policy.choose(ftype, compressionuselist)
+        if(curcompression is not None):
+            policy.record(ftype)
+            return curcompression
+    ilcsize = []
+    ilcusagetime = []
+    ilcscore = []
+    for curcompression in compressionuselist:
+        ilcursize = 0
+        ilstarttime = time.perf_counter()
+        for sample in samples:
+            cfcontents = MkTempFile()
+            cfcontents.write(sample)
+            cfcontents.seek(0, 0)
+            cfcontents = CompressOpenFileAlt(
+                cfcontents, curcompression, compressionlevel, compressionuselist, formatspecs)
+            if(not cfcontents):
+                ilcursize = float("inf")
+                break
+            cfcontents.seek(0, 2)
+            ilcursize = ilcursize + cfcontents.tell()
+            cfcontents.close()
+        ilcusagetime.append(time.perf_counter() - ilstarttime)
+        ilcsize.append(ilcursize)
+    if(not ilcsize):
+        return "none"
+    if(policy is not None):
+        policy.record(ftype, [(compressionuselist[ilmin], samplelen, ilcsize[ilmin], ilcusagetime[ilmin])
+                              for ilmin in range(len(ilcsize)) if ilcsize[ilmin] != float("inf")])
+    ilmaxtime = max(ilcusagetime)
+    if(ilmaxtime <= 0):
+        ilmaxtime = 1.0
+    for ilmin in range(len(ilcsize)):
+        if(ilcsize[ilmin] == float("inf")):
+            ilcscore.append(float("inf"))
         else:
-            fwinattributes = format(int(0), 'x').lower()
+            ilratio = ilcsize[ilmin] / float(samplelen)
+            ilnormtime = ilcusagetime[ilmin] / ilmaxtime
+            ilcscore.append((ilratio * 0.7) + (ilnormtime * 0.3))
+    return compressionuselist[ilcscore.index(min(ilcscore))]
+
+
+def _read_entry_contents(fname, compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt, formatspecs=__file_format_dict__, inflight=None, policy=None):
+    """
+    Read fname into a member buffer and compress it unless it already
+    is compressed or the whole archive will be.  Returns (fcontents,
+    size read, fcencoding, fcompression, stored size, fcheckpoints,
+    content checksum), the checksum always None here.
+    """
+    fcontents = _entry_tempfile(inflight)
+    fcompression = ""
+    fcheckpoints = None
+    curcompression = "none"
+    with open(fname, "rb") as fpc:
+        shutil.copyfileobj(fpc, fcontents, length=__filebuff_size__)
+    ucfsize = fcontents.tell()
+    typechecktest = CheckCompressionType(fcontents, filestart=0, closefp=False)
+    fcontents.seek(0, 0)
+    if(typechecktest is not False):
+        typechecktest = GetBinaryFileType(fcontents, filestart=0, closefp=False)
+        fcontents.seek(0, 0)
+    fcencoding = GetFileEncoding(fcontents, 0, False)[0]
+    if(typechecktest is False and not compresswholefile and ucfsize > 0):
+        fcontents.seek(0, 0)
+        if(compression == "auto"):
+            curcompression = _select_member_codec(fcontents, ucfsize, compressionuselist, compressionlevel, formatspecs, None, fname, policy)
+        fcontents.seek(0, 0)
+        cfcontents = False
+        if(curcompression == "none"):
+            # already compressed or random looking, stored as is
+            cfcontents = False
+        elif((curcompression == "zlib" or curcompression == "gzip") and curcompression in compressionsupport and ucfsize > __member_checkpoint_size__):
+            cfcontents, fcheckpoints = _compress_member_with_checkpoints(
+                fcontents, curcompression, compressionlevel, None, _entry_tempfile(inflight))
+        elif(inflight is not None and ucfsize > inflight):
+            cfcontents = _compress_member_stream(
+                fcontents, curcompression, compressionlevel, _entry_tempfile(inflight))
+        if(cfcontents is False and curcompression != "none"):
+            fcontents.seek(0, 0)
+            cfcontents = MkTempFile()
+            shutil.copyfileobj(fcontents, cfcontents, length=__filebuff_size__)
+            cfcontents.seek(0, 0)
+            cfcontents = CompressOpenFileAlt(
+                cfcontents, curcompression, compressionlevel, compressionuselist, formatspecs)
+        if(cfcontents):
+            cfcontents.seek(0, 2)
+            cfsize = cfcontents.tell()
+            if(ucfsize > cfsize):
+                fcompression = curcompression
+                fcontents.close()
+                fcontents = cfcontents
+            else:
+                cfcontents.close()
+                fcheckpoints = None
+    fcontents.seek(0, 2)
+    fcsize = 0
+    if(fcompression != "" and fcompression != "none"):
+        fcsize = fcontents.tell()
+    else:
         fcompression = ""
-        fcsize = format(int(0), 'x').lower()
-        fcontents = MkTempFile()
-        chunk_size = 1024
-        fcencoding = "UTF-8"
-        curcompression = "none"
-        if not followlink and ftype in data_types:
-            with open(fname, "rb") as fpc:
-                shutil.copyfileobj(fpc, fcontents, length=__filebuff_size__)
-                if(int(fsize, 16) != fcontents.tell()):
-                    fsize = format(int(fcontents.tell()), 'x').lower()
-                typechecktest = CheckCompressionType(fcontents, filestart=0, closefp=False)
-                fcontents.seek(0, 0)
-                if(typechecktest is not False):
-                    typechecktest = GetBinaryFileType(fcontents, filestart=0, closefp=False)
-                    fcontents.seek(0, 0)
-                fcencoding = GetFileEncoding(fcontents, 0, False)[0]
-                if(typechecktest is False and not compresswholefile):
-                    fcontents.seek(0, 2)
-                    ucfsize = fcontents.tell()
-                    fcontents.seek(0, 0)
-                    if(compression == "auto"):
-                        ilsize = len(compressionuselist)
-                        ilmin = 0
-                        ilcsize = []
-                        ilcusagetime = []
-                        ilcscore = []
-                        while(ilmin < ilsize):
-                            cfcontents = MkTempFile()
-                            fcontents.seek(0, 0)
-                            shutil.copyfileobj(fcontents, cfcontents, length=__filebuff_size__)
-                            fcontents.seek(0, 0)
-                            cfcontents.seek(0, 0)
+    fcontents.seek(0, 0)
+    return (fcontents, ucfsize, fcencoding, fcompression, fcsize, fcheckpoints, None)
 
-                            ilstarttime = time.perf_counter()
-                            cfcontents = CompressOpenFileAlt(
-                                cfcontents, compressionuselist[ilmin], compressionlevel, compressionuselist, formatspecs)
-                            ilendtime = time.perf_counter()
 
-                            ilcusagetime.append(ilendtime - ilstarttime)
+def _read_entry_contents_job(fname, compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt, formatspecs=__file_format_dict__, inflight=None, checksumtype="md5", saltkey=None, policy=None):
+    # Runs in a worker process: compress and checksum one member, then
+    # send it back as bytes, or as the name of a temp file when it is
+    # over the in-flight budget, with what policy learned on the way
+    fcontents, ucfsize, fcencoding, fcompression, fcsize, fcheckpoints, fchecksum = _read_entry_contents(
+        fname, compression, compresswholefile, compressionlevel, compressionuselist, formatspecs, inflight, policy)
+    fcontents.seek(0, 2)
+    fstoredsize = fcontents.tell()
+    fcontents.seek(0, 0)
+    if(fstoredsize > 0):
+        fchecksum = GetFileChecksum(fcontents, checksumtype, False, formatspecs, saltkey)
+        fcontents.seek(0, 0)
+    if(inflight is None or fstoredsize <= inflight):
+        fcontentsout = fcontents.read()
+    else:
+        tmpfd, fcontentsout = tempfile.mkstemp(prefix=__program_name__)
+        with os.fdopen(tmpfd, "wb") as tmpfp:
+            shutil.copyfileobj(fcontents, tmpfp, length=__filebuff_size__)
+        fcontentsout = (fcontentsout, )
+    fcontents.close()
+    fpolicyupdates = None
+    if(policy is not None):
+        fpolicyupdates = policy.take_updates()
+    return (fcontentsout, ucfsize, fcencoding, fcompression, fcsize, fcheckpoints, fchecksum, fpolicyupdates)
+
+
+def _open_entry_job_file(fname, inflight=None):
+    # A worker's spilled member: on POSIX the open file outlives its
+    # name, elsewhere it is copied into a local buffer first
+    fcontents = open(fname, "rb")
+    try:
+        os.unlink(fname)
+    except OSError:
+        localcontents = _entry_tempfile(inflight)
+        shutil.copyfileobj(fcontents, localcontents, length=__filebuff_size__)
+        fcontents.close()
+        os.unlink(fname)
+        localcontents.seek(0, 0)
+        return localcontents
+    return fcontents
+
+
+def _set_entry_contents(curentry, entrycontents, fixsize=True, contentasfile=True, inflight=None):
+    fcontents, ucfsize, fcencoding, fcompression, fcsize, fcheckpoints, fchecksum = entrycontents
+    if(isinstance(fcontents, tuple)):
+        fcontents = _open_entry_job_file(fcontents[0], inflight)
+    elif(isinstance(fcontents, bytes)):
+        fcontentsin = fcontents
+        fcontents = MkTempFile()
+        fcontents.write(fcontentsin)
+    fheaders = curentry['fheaders']
+    if(fixsize and ucfsize is not None and int(fheaders[5], 16) != ucfsize):
+        fheaders[5] = format(int(ucfsize), 'x').lower()
+    fheaders[2] = fcencoding
+    fheaders[15] = fcompression
+    fheaders[16] = format(int(fcsize), 'x').lower()
+    if(fcheckpoints is not None):
+        fjsoncontent = dict(curentry['fjsoncontent'])
+        fjsoncontent.update({'fcheckpoints': fcheckpoints})
+        curentry['fjsoncontent'] = fjsoncontent
+    if(fchecksum is not None):
+        curentry['fcontentchecksum'] = fchecksum
+    fcontents.seek(0, 0)
+    if(not contentasfile):
+        fcontents = fcontents.read()
+    curentry['fcontents'] = fcontents
+    return curentry
 
-                            if(cfcontents):
-                                cfcontents.seek(0, 2)
-                                ilcsize.append(cfcontents.tell())
-                                cfcontents.close()
-                            else:
-                                ilcsize.append(float("inf"))
-                            ilmin = ilmin + 1
 
-                        ilmin = 0
-                        ilmaxtime = max(ilcusagetime)
-                        if(ilmaxtime <= 0):
-                            ilmaxtime = 1.0
+def _finish_entry_job(pendingentry, contentasfile=True, inflight=None, policy=None):
+    curentry, entryjob, fixsize = pendingentry
+    if(entryjob is None):
+        return curentry
+    try:
+        entrycontents = entryjob.result()
+    except (OSError, IOError):
+        return False
+    if(policy is not None and entrycontents[7]):
+        policy.merge(entrycontents[7])
+    return _set_entry_contents(curentry, entrycontents[:7], fixsize, contentasfile, inflight)
 
-                        while(ilmin < ilsize):
-                            if(ilcsize[ilmin] == float("inf")):
-                                ilcscore.append(float("inf"))
-                            else:
-                                ilratio = ilcsize[ilmin] / float(ucfsize)
-                                ilnormtime = ilcusagetime[ilmin] / ilmaxtime
-                                ilcscore.append((ilratio * 0.7) + (ilnormtime * 0.3))
-                            ilmin = ilmin + 1
 
-                        ilcmin = ilcscore.index(min(ilcscore))
-                        curcompression = compressionuselist[ilcmin]
-                    fcontents.seek(0, 0)
-                    cfcontents = MkTempFile()
-                    shutil.copyfileobj(fcontents, cfcontents, length=__filebuff_size__)
-                    cfcontents.seek(0, 0)
-                    cfcontents = CompressOpenFileAlt(
-                        cfcontents, curcompression, compressionlevel, compressionuselist, formatspecs)
-                    cfcontents.seek(0, 2)
-                    cfsize = cfcontents.tell()
-                    if(ucfsize > cfsize):
-                        fcsize = format(int(cfsize), 'x').lower()
-                        fcompression = curcompression
-                        fcontents.close()
-                        fcontents = cfcontents
-        elif followlink and (ftype == 2 or ftype in data_types):
-            if(not os.path.exists(fname)):
-                return False
-            with open(flinkname, "rb") as fpc:
-                shutil.copyfileobj(fpc, fcontents, length=__filebuff_size__)
-                typechecktest = CheckCompressionType(fcontents, filestart=0, closefp=False)
-                fcontents.seek(0, 0)
-                if(typechecktest is not False):
-                    typechecktest = GetBinaryFileType(fcontents, filestart=0, closefp=False)
-                    fcontents.seek(0, 0)
-                fcencoding = GetFileEncoding(fcontents, 0, False)[0]
-                if(typechecktest is False and not compresswholefile):
-                    fcontents.seek(0, 2)
-                    ucfsize = fcontents.tell()
-                    fcontents.seek(0, 0)
-                    if(compression == "auto"):
-                        ilsize = len(compressionuselist)
-                        ilmin = 0
-                        ilcsize = []
-                        ilcusagetime = []
-                        ilcscore = []
-                        while(ilmin < ilsize):
-                            cfcontents = MkTempFile()
-                            fcontents.seek(0, 0)
-                            shutil.copyfileobj(fcontents, cfcontents, length=__filebuff_size__)
-                            fcontents.seek(0, 0)
-                            cfcontents.seek(0, 0)
+def _discard_entry_job(pendingentry):
+    # Drop a member that will never be written, removing its spill file
+    curentry, entryjob, fixsize = pendingentry
+    if(entryjob is None):
+        fcontents = curentry['fcontents']
+    elif(entryjob.cancel() or entryjob.exception() is not None):
+        return False
+    else:
+        fcontents = entryjob.result()[0]
+    if(isinstance(fcontents, tuple)):
+        try:
+            os.unlink(fcontents[0])
+        except OSError:
+            pass
+    elif(hasattr(fcontents, "close")):
+        fcontents.close()
+    return True
 
-                            ilstarttime = time.perf_counter()
-                            cfcontents = CompressOpenFileAlt(
-                                cfcontents, compressionuselist[ilmin], compressionlevel, compressionuselist, formatspecs)
-                            ilendtime = time.perf_counter()
 
-                            ilcusagetime.append(ilendtime - ilstarttime)
+def _get_entry_executor(workers=1):
+    # Member compression is CPU bound and mostly holds the GIL, so it
+    # goes to processes; platforms without working process pools
+    # compress on the calling thread instead
+    if(workers is None or workers <= 1):
+        return None
+    try:
+        return concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    except (ImportError, NotImplementedError, OSError):
+        return None
 
-                            if(cfcontents):
-                                cfcontents.seek(0, 2)
-                                ilcsize.append(cfcontents.tell())
-                                cfcontents.close()
-                            else:
-                                ilcsize.append(float("inf"))
-                            ilmin = ilmin + 1
 
-                        ilmin = 0
-                        ilmaxtime = max(ilcusagetime)
-                        if(ilmaxtime <= 0):
-                            ilmaxtime = 1.0
+def _iter_files_with_content(GetDirList, extradata=[], jsondata={}, contentasfile=False, compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt, followlink=False, checksumtype=["md5", "md5", "md5"], formatspecs=__file_format_dict__, verbose=False, inflight=None, workers=1, saltkey=None):
+    """
+    Stat, read and (optionally) compress each name in GetDirList and
+    yield its entry dict as soon as it is ready.  With inflight set a
+    member's content is held in a spooled temp file of that many bytes,
+    so memory stays bounded however large the member is.  With workers
+    > 1 members are compressed and checksummed in that many processes,
+    at most two per worker ahead of the one being yielded, and still
+    come out in GetDirList order.  Yields False and stops when an input
+    disappears.
+    """
+    altinode = __use_alt_inode__
+    curinode = 0
+    curfid = 0
+    inodelist = []
+    inodetofile = {}
+    filetoinode = {}
+    inodetoforminode = {}
+    # an open key file cannot be handed to another process
+    if(hasattr(saltkey, "read")):
+        workers = 1
+    policy = _compression_policy
+    if(compression != "auto" or compresswholefile):
+        policy = None
+    executor = _get_entry_executor(workers)
+    pending = []
+    try:
+        for curfname in GetDirList:
+            fencoding = "UTF-8"
+            fname = curfname
+            if(not os.path.exists(fname)):
+                yield False
+                return
+            if(verbose):
+                VerbosePrintOut(fname)
+            if(not followlink or followlink is None):
+                fstatinfo = os.lstat(fname)
+            else:
+                fstatinfo = os.stat(fname)
+            fpremode = fstatinfo.st_mode
+            finode = fstatinfo.st_ino
+            flinkcount = fstatinfo.st_nlink
+            fblksize = format(int(0), 'x').lower()
+            if(hasattr(fstatinfo, "st_blksize")):
+                fblksize = format(int(fstatinfo.st_blksize), 'x').lower()
+            fblocks = format(int(0), 'x').lower()
+            if(hasattr(fstatinfo, "st_blocks")):
+                fblocks = format(int(fstatinfo.st_blocks), 'x').lower()
+            fflags = format(int(0), 'x').lower()
+            if(hasattr(fstatinfo, "st_flags")):
+                fflags = format(int(fstatinfo.st_flags), 'x').lower()
+            ftype = 0
+            if(not followlink and hasattr(os.path, "isjunction") and os.path.isjunction(fname)):
+                ftype = 13
+            elif(stat.S_ISREG(fpremode)):
+                if(hasattr(fstatinfo, "st_blocks") and fstatinfo.st_size > 0 and fstatinfo.st_blocks * 512 < fstatinfo.st_size):
+                    ftype = 12
+                else:
+                    ftype = 0
+            elif(not followlink and stat.S_ISLNK(fpremode)):
+                ftype = 2
+            elif(stat.S_ISCHR(fpremode)):
+                ftype = 3
+            elif(stat.S_ISBLK(fpremode)):
+                ftype = 4
+            elif(stat.S_ISDIR(fpremode)):
+                ftype = 5
+            elif(stat.S_ISFIFO(fpremode)):
+                ftype = 6
+            elif(stat.S_ISSOCK(fpremode)):
+                ftype = 8
+            elif(hasattr(stat, "S_ISDOOR") and stat.S_ISDOOR(fpremode)):
+                ftype = 9
+            elif(hasattr(stat, "S_ISPORT") and stat.S_ISPORT(fpremode)):
+                ftype = 10
+            elif(hasattr(stat, "S_ISWHT") and stat.S_ISWHT(fpremode)):
+                ftype = 11
+            elif(hasattr(stat, "S_ISSOCK") and stat.S_ISSOCK(fpremode)):
+                ftype = 15
+            else:
+                ftype = 0
+            flinkname = ""
+            fcurfid = format(int(curfid), 'x').lower()
+            if(not followlink and finode != 0):
+                unique_id = (fstatinfo.st_dev, finode)
+                if(ftype != 1):
+                    if(unique_id in inodetofile):
+                        # Hard link detected
+                        ftype = 1
+                        flinkname = inodetofile[unique_id]
+                    else:
+                        # First time seeing this inode
+                        inodetofile[unique_id] = fname
+                    if(unique_id not in inodetoforminode):
+                        inodetoforminode[unique_id] = curinode
+                        curinode = curinode + 1
+                    if(altinode):
+                        # altinode == True → use real inode number
+                        fcurinode = format(int(unique_id[1]), 'x').lower()
+                    else:
+                        # altinode == False → use synthetic inode id
+                        fcurinode = format(int(inodetoforminode[unique_id]), 'x').lower()
+            else:
+                # Handle cases where inodes are not supported or symlinks are followed
+                fcurinode = format(int(curinode), 'x').lower()
+                curinode = curinode + 1
+            curfid = curfid + 1
+            if(ftype == 2):
+                flinkname = os.readlink(fname)
+                if(not os.path.exists(fname)):
+                    yield False
+                    return
+            try:
+                fdev = fstatinfo.st_dev
+                fdev_major = os.major(fdev)
+                fdev_minor = os.minor(fdev)
+            except AttributeError:
+                fdev = 0
+                fdev_major = 0
+                fdev_minor = 0
+            try:
+                frdev = fstatinfo.st_rdev
+                frdev_major = os.major(frdev)
+                frdev_minor = os.minor(frdev)
+            except AttributeError:
+                frdev = 0
+                frdev_major = 0
+                frdev_minor = 0
+            # Types that should be considered zero-length in the archive context:
+            zero_length_types = {1, 2, 3, 4, 5, 6, 8, 9, 10, 11, 13}
+            # Types that have actual data to read:
+            data_types = {0, 7}
+            sparse_types = {12}
+            if ftype in zero_length_types:
+                fsize = format(int(0), 'x').lower()
+            elif ftype in data_types:
+                fsize = format(int(fstatinfo.st_size), 'x').lower()
+            else:
+                fsize = format(int(fstatinfo.st_size), 'x').lower()
+            if(hasattr(fstatinfo, "st_atime_ns")):
+                fatime = format(int(fstatinfo.st_atime_ns), 'x').lower()
+            else:
+                fatime = format(int(to_ns(fstatinfo.st_atime)), 'x').lower()
+            if(hasattr(fstatinfo, "st_mtime_ns")):
+                fmtime = format(int(fstatinfo.st_mtime_ns), 'x').lower()
+            else:
+                fmtime = format(int(to_ns(fstatinfo.st_mtime)), 'x').lower()
+            if(hasattr(fstatinfo, "st_ctime_ns")):
+                fctime = format(int(fstatinfo.st_ctime_ns), 'x').lower()
+            else:
+                fctime = format(int(to_ns(fstatinfo.st_ctime)), 'x').lower()
+            if(hasattr(fstatinfo, "st_birthtime")):
+                if(hasattr(fstatinfo, "st_birthtime_ns")):
+                    fbtime = format(int(fstatinfo.st_birthtime_ns), 'x').lower()
+                else:
+                    fbtime = format(int(to_ns(fstatinfo.st_birthtime)), 'x').lower()
+            else:
+                if(hasattr(fstatinfo, "st_ctime_ns")):
+                    fbtime = format(int(fstatinfo.st_ctime_ns), 'x').lower()
+                else:
+                    fbtime = format(int(to_ns(fstatinfo.st_ctime)), 'x').lower()
+            fmode = format(int(fstatinfo.st_mode), 'x').lower()
+            fchmode = format(int(stat.S_IMODE(fstatinfo.st_mode)), 'x').lower()
+            ftypemod = format(int(stat.S_IFMT(fstatinfo.st_mode)), 'x').lower()
+            fuid = format(int(fstatinfo.st_uid), 'x').lower()
+            fgid = format(int(fstatinfo.st_gid), 'x').lower()
+            funame = ""
+            try:
+                import pwd
+                try:
+                    userinfo = pwd.getpwuid(fstatinfo.st_uid)
+                    funame = userinfo.pw_name
+                except KeyError:
+                    funame = ""
+            except ImportError:
+                funame = ""
+            fgname = ""
+            try:
+                import grp
+                try:
+                    groupinfo = grp.getgrgid(fstatinfo.st_gid)
+                    fgname = groupinfo.gr_name
+                except KeyError:
+                    fgname = ""
+            except ImportError:
+                fgname = ""
+            fdev = format(int(fdev), 'x').lower()
+            fdev_major = format(int(fdev_major), 'x').lower()
+            fdev_minor = format(int(fdev_minor), 'x').lower()
+            frdev = format(int(frdev), 'x').lower()
+            frdev_major = format(int(frdev_major), 'x').lower()
+            frdev_minor = format(int(frdev_minor), 'x').lower()
+            finode = format(int(finode), 'x').lower()
+            flinkcount = format(int(flinkcount), 'x').lower()
+            if(hasattr(fstatinfo, "st_file_attributes")):
+                fwinattributes = format(
+                    int(fstatinfo.st_file_attributes), 'x').lower()
+            else:
+                fwinattributes = format(int(0), 'x').lower()
+            fcompression = ""
+            fcsize = format(int(0), 'x').lower()
+            fcencoding = "UTF-8"
+            contentname = None
+            if not followlink and ftype in data_types:
+                contentname = fname
+            elif followlink and (ftype == 2 or ftype in data_types):
+                if(not os.path.exists(fname)):
+                    yield False
+                    return
+                contentname = flinkname
+            ftypehex = format(ftype, 'x').lower()
+            curentry = {'fheaders': [ftypehex, fencoding, fcencoding, fname, flinkname, fsize, fblksize, fblocks, fflags, fatime, fmtime, fctime, fbtime, fmode, fwinattributes, fcompression,
+                                     fcsize, fuid, funame, fgid, fgname, fcurfid, fcurinode, flinkcount, fdev, fdev_major, fdev_minor, frdev, frdev_major, frdev_minor, "+"+str(len(formatspecs['format_delimiter'])), "+"+str(len(formatspecs['format_delimiter'])), "+"+str(len(formatspecs['format_delimiter']))], 'fextradata': extradata, 'fjsoncontent': jsondata, 'fcontents': None, 'fjsonchecksumtype': checksumtype[2], 'fheaderchecksumtype': checksumtype[0], 'fcontentchecksumtype': checksumtype[1]}
+            if(contentname is None):
+                _set_entry_contents(curentry, (_entry_tempfile(inflight), None, fcencoding, "", 0, None, None), False, contentasfile, inflight)
+                entryjob = None
+            elif(executor is None):
+                try:
+                    entrycontents = _read_entry_contents(contentname, compression, compresswholefile, compressionlevel, compressionuselist, formatspecs, inflight, policy)
+                except (OSError, IOError):
+                    yield False
+                    return
+                _set_entry_contents(curentry, entrycontents, contentname == fname, contentasfile, inflight)
+                entryjob = None
+            else:
+                entryjob = executor.submit(_read_entry_contents_job, contentname, compression, compresswholefile, compressionlevel, compressionuselist, formatspecs, inflight, checksumtype[1], saltkey, policy)
+            if(executor is None):
+                yield curentry
+                continue
+            pending.append((curentry, entryjob, contentname == fname))
+            while(len(pending) > workers * 2):
+                curentry = _finish_entry_job(pending.pop(0), contentasfile, inflight, policy)
+                yield curentry
+                if(curentry is False):
+                    return
+        while(pending):
+            curentry = _finish_entry_job(pending.pop(0), contentasfile, inflight, policy)
+            yield curentry
+            if(curentry is False):
+                return
+    finally:
+        while(pending):
+            _discard_entry_job(pending.pop(0))
+        if(executor is not None):
+            executor.shutdown(wait=True)
+        if(policy is not None):
+            policy.save()
 
-                        while(ilmin < ilsize):
-                            if(ilcsize[ilmin] == float("inf")):
-                                ilcscore.append(float("inf"))
-                            else:
-                                ilratio = ilcsize[ilmin] / float(ucfsize)
-                                ilnormtime = ilcusagetime[ilmin] / ilmaxtime
-                                ilcscore.append((ilratio * 0.7) + (ilnormtime * 0.3))
-                            ilmin = ilmin + 1
 
-                        ilcmin = ilcscore.index(min(ilcscore))
-                        curcompression = compressionuselist[ilcmin]
-                    fcontents.seek(0, 0)
-                    cfcontents = MkTempFile()
-                    shutil.copyfileobj(fcontents, cfcontents, length=__filebuff_size__)
-                    cfcontents.seek(0, 0)
-                    cfcontents = CompressOpenFileAlt(
-                        cfcontents, curcompression, compressionlevel, compressionuselist, formatspecs)
-                    cfcontents.seek(0, 2)
-                    cfsize = cfcontents.tell()
-                    if(ucfsize > cfsize):
-                        fcsize = format(int(cfsize), 'x').lower()
-                        fcompression = curcompression
-                        fcontents.close()
-                        fcontents = cfcontents
-        if(fcompression == "none"):
-            fcompression = ""
-        fcontents.seek(0, 0)
-        if(not contentasfile):
-            fcontents = fcontents.read()
-        ftypehex = format(ftype, 'x').lower()
-        tmpoutlist.append({'fheaders': [ftypehex, fencoding, fcencoding, fname, flinkname, fsize, fblksize, fblocks, fflags, fatime, fmtime, fctime, fbtime, fmode, fwinattributes, fcompression,
-                           fcsize, fuid, funame, fgid, fgname, fcurfid, fcurinode, flinkcount, fdev, fdev_major, fdev_minor, frdev, frdev_major, frdev_minor, "+"+str(len(formatspecs['format_delimiter'])), "+"+str(len(formatspecs['format_delimiter'])), "+"+str(len(formatspecs['format_delimiter']))], 'fextradata': extradata, 'fjsoncontent': jsondata, 'fcontents': fcontents, 'fjsonchecksumtype': checksumtype[2], 'fheaderchecksumtype': checksumtype[0], 'fcontentchecksumtype': checksumtype[1]})
+def AppendFilesWithContentToList(infiles, fmttype="auto", dirlistfromtxt=False, extradata=[], jsondata={}, contentasfile=False, compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt, followlink=False, checksumtype=["md5", "md5", "md5"], formatspecs=__file_format_dict__, saltkey=None, verbose=False, inflight=None, workers=1):
+    if(IsNestedDict(formatspecs) and fmttype in formatspecs):
+        formatspecs = formatspecs[fmttype]
+    elif(IsNestedDict(formatspecs) and fmttype not in formatspecs):
+        fmttype = __file_format_default__
+        formatspecs = formatspecs[fmttype]
+    GetDirList, followlink = _get_archive_input_list(infiles, dirlistfromtxt, followlink, formatspecs)
+    if(not GetDirList):
+        return False
+    tmpoutlist = []
+    for curentry in _iter_files_with_content(GetDirList, extradata, jsondata, contentasfile, compression, compresswholefile, compressionlevel, compressionuselist, followlink, checksumtype, formatspecs, verbose, inflight, workers, saltkey):
+        if(curentry is False):
+            return False
+        tmpoutlist.append(curentry)
     return tmpoutlist
 
-def AppendFilesWithContent(infiles, fp, fmttype="auto", dirlistfromtxt=False, extradata=[], jsondata={}, compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt, followlink=False, checksumtype=["md5", "md5", "md5", "md5", "md5"], formatspecs=__file_format_dict__, saltkey=None, verbose=False):
-    GetDirList = AppendFilesWithContentToList(infiles, fmttype, dirlistfromtxt, extradata, jsondata, False, compression, compresswholefile, compressionlevel, compressionuselist, followlink, [checksumtype[2], checksumtype[3], checksumtype[3]], formatspecs, saltkey, verbose)
+def AppendFilesWithContent(infiles, fp, fmttype="auto", dirlistfromtxt=False, extradata=[], jsondata={}, compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt, followlink=False, checksumtype=["md5", "md5", "md5", "md5", "md5"], formatspecs=__file_format_dict__, saltkey=None, verbose=False, addtoc=__use_toc__, inflight=__write_inflight_size__, durability=None, workers=1):
+    # Streaming: each member is read, compressed and written before the
+    # next one is touched, with at most inflight bytes of it in memory.
+    # With workers > 1 a few members per worker are compressed ahead of
+    # the writer in worker processes, written in the same order.
     if(not hasattr(fp, "write")):
         return False
+    if(IsNestedDict(formatspecs) and fmttype in formatspecs):
+        formatspecs = formatspecs[fmttype]
+    elif(IsNestedDict(formatspecs) and fmttype not in formatspecs):
+        fmttype = __file_format_default__
+        formatspecs = formatspecs[fmttype]
+    GetDirList, followlink = _get_archive_input_list(infiles, dirlistfromtxt, followlink, formatspecs)
+    if(not GetDirList):
+        return False
     numfiles = int(len(GetDirList))
     fnumfiles = format(numfiles, 'x').lower()
-    AppendFileHeader(fp, fmttype, numfiles, "UTF-8", [], {}, [checksumtype[0], checksumtype[1]], formatspecs, saltkey)
-    try:
-        fp.flush()
-        if(hasattr(os, "sync")):
-            os.fsync(fp.fileno())
-    except (io.UnsupportedOperation, AttributeError, OSError):
-        pass
-    for curfname in GetDirList:
-        tmpoutlist = curfname['fheaders']
-        AppendFileHeaderWithContent(fp, fmttype, tmpoutlist, curfname['fextradata'], curfname['fjsoncontent'], curfname['fcontents'], [curfname['fheaderchecksumtype'], curfname['fcontentchecksumtype'], curfname['fjsonchecksumtype']], formatspecs, saltkey)
+    toclist = None
+    if(addtoc):
         try:
-            fp.flush()
-            if(hasattr(os, "sync")):
-                os.fsync(fp.fileno())
+            archivestart = fp.tell()
+            toclist = []
         except (io.UnsupportedOperation, AttributeError, OSError):
-            pass
+            toclist = None
+    durability = _get_durability(durability)
+    AppendFileHeader(fp, fmttype, numfiles, "UTF-8", [], {}, [checksumtype[0], checksumtype[1]], formatspecs, saltkey, durability)
+    profiler = _profiler
+    if(profiler is not None):
+        start_real = time.perf_counter()
+    for curfname in _iter_files_with_content(GetDirList, extradata, jsondata, True, compression, compresswholefile, compressionlevel, compressionuselist, followlink, [checksumtype[2], checksumtype[3], checksumtype[3]], formatspecs, verbose, inflight, workers, saltkey):
+        if(curfname is False):
+            return False
+        tmpoutlist = curfname['fheaders']
+        if(profiler is not None):
+            fname = tmpoutlist[3]
+        AppendFileHeaderWithContent(fp, fmttype, tmpoutlist, curfname['fextradata'], curfname['fjsoncontent'], curfname['fcontents'], [curfname['fheaderchecksumtype'], curfname['fcontentchecksumtype'], curfname['fjsonchecksumtype']], formatspecs, saltkey, toclist, durability, curfname.get('fcontentchecksum'))
+        fcontentsize = curfname['fcontents'].tell()
+        curfname['fcontents'].close()
+        if(profiler is not None):
+            pend = time.perf_counter()
+            profiler.entry('write', fname, pend - start_real, fcontentsize)
+            start_real = pend
+    if(toclist is not None and len(toclist) == numfiles):
+        AppendFileTOC(fp, toclist, archivestart, fmttype, checksumtype[0], formatspecs, saltkey)
+    durability.finish(fp)
     return fp
 
 def AppendFilesWithContentFromTarFileToList(infile, fmttype="auto", extradata=[], jsondata={}, contentasfile=False, compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt, checksumtype=["md5", "md5", "md5"], formatspecs=__file_format_dict__, saltkey=None, verbose=False):
@@ -8397,7 +11399,7 @@ else:
     def AppendFilesWithContentFromSevenZipFile(infile, fp, fmttype="auto", extradata=[], jsondata={}, compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt, checksumtype=["md5", "md5", "md5", "md5", "md5"], formatspecs=__file_format_dict__, saltkey=None, verbose=False):
         return AppendFilesWithContentFromInFile(infile, fp, fmttype, "7zip", extradata, jsondata, compression, compresswholefile, compressionlevel, compressionuselist, checksumtype, formatspecs, saltkey, verbose)
 
-def AppendListsWithContent(inlist, fp, fmttype="auto", dirlistfromtxt=False, extradata=[], jsondata={}, compression="auto", compresswholefile=True, compressionlevel=None, followlink=False, checksumtype=["md5", "md5", "md5", "md5", "md5"], formatspecs=__file_format_dict__, saltkey=None, verbose=False):
+def AppendListsWithContent(inlist, fp, fmttype="auto", dirlistfromtxt=False, extradata=[], jsondata={}, compression="auto", compresswholefile=True, compressionlevel=None, followlink=False, checksumtype=["md5", "md5", "md5", "md5", "md5"], formatspecs=__file_format_dict__, saltkey=None, verbose=False, durability=None):
     if(not hasattr(fp, "write")):
         return False
     GetDirList = inlist
@@ -8411,7 +11413,8 @@ def AppendListsWithContent(inlist, fp, fmttype="auto", dirlistfromtxt=False, ext
     inodetoforminode = {}
     numfiles = int(len(GetDirList))
     fnumfiles = format(numfiles, 'x').lower()
-    AppendFileHeader(fp, fmttype, numfiles, "UTF-8", [], [checksumtype[0], checksumtype[1]], formatspecs, saltkey)
+    durability = _get_durability(durability)
+    AppendFileHeader(fp, fmttype, numfiles, "UTF-8", [], [checksumtype[0], checksumtype[1]], formatspecs, saltkey, durability)
     for curfname in GetDirList:
         ftype = format(curfname[0], 'x').lower()
         fencoding = curfname[1]
@@ -8457,7 +11460,8 @@ def AppendListsWithContent(inlist, fp, fmttype="auto", dirlistfromtxt=False, ext
         tmpoutlist = [ftype, fencoding, fcencoding, fname, flinkname, fsize, fblksize, fblocks, fflags, fatime, fmtime, fctime, fbtime, fmode, fwinattributes, fcompression, fcsize,
                       fuid, funame, fgid, fgname, fid, finode, flinkcount, fdev, fdev_major, fdev_minor, frdev, frdev_major, frdev_minor, fseektojson, fseektocontent, fseeknextfile]
         fcontents.seek(0, 0)
-        AppendFileHeaderWithContent(fp, fmttype, tmpoutlist, extradata, jsondata, fcontents.read(), [checksumtype[2], checksumtype[3], checksumtype[4]], formatspecs, saltkey)
+        AppendFileHeaderWithContent(fp, fmttype, tmpoutlist, extradata, jsondata, fcontents.read(), [checksumtype[2], checksumtype[3], checksumtype[4]], formatspecs, saltkey, None, durability)
+    durability.finish(fp)
     return fp
 
 
@@ -8466,7 +11470,7 @@ def AppendInFileWithContent(infile, fp, dirlistfromtxt=False, extradata=[], json
     return AppendListsWithContent(inlist, fp, dirlistfromtxt, extradata, jsondata, followlink, checksumtype, formatspecs, saltkey, verbose)
 
 
-def AppendFilesWithContentToOutFile(infiles, outfile, dirlistfromtxt=False, fmttype="auto", compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt, extradata=[], jsondata={}, followlink=False, checksumtype=["md5", "md5", "md5", "md5", "md5"], formatspecs=__file_format_multi_dict__, saltkey=None, verbose=False, returnfp=False):
+def AppendFilesWithContentToOutFile(infiles, outfile, dirlistfromtxt=False, fmttype="auto", compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt, extradata=[], jsondata={}, followlink=False, checksumtype=["md5", "md5", "md5", "md5", "md5"], formatspecs=__file_format_multi_dict__, saltkey=None, verbose=False, returnfp=False, addtoc=__use_toc__, inflight=__write_inflight_size__, durability=None, workers=1):
     if(IsNestedDict(formatspecs) and fmttype=="auto" and 
         (outfile != "-" and outfile is not None and not hasattr(outfile, "read") and not hasattr(outfile, "write"))):
         get_in_ext = os.path.splitext(outfile)
@@ -8508,16 +11512,20 @@ def AppendFilesWithContentToOutFile(infiles, outfile, dirlistfromtxt=False, fmtt
             fp = CompressOpenFile(outfile, compresswholefile, compressionlevel)
         except PermissionError:
             return False
-    AppendFilesWithContent(infiles, fp, fmttype, dirlistfromtxt, extradata, jsondata, compression, compresswholefile, compressionlevel, compressionuselist, followlink, checksumtype, formatspecs, saltkey, verbose)
+    if(not AppendFilesWithContent(infiles, fp, fmttype, dirlistfromtxt, extradata, jsondata, compression, compresswholefile, compressionlevel, compressionuselist, followlink, checksumtype, formatspecs, saltkey, verbose, addtoc, inflight, durability, workers)):
+        # an input vanished part way through: the header already counts
+        # it, so the partial archive is unreadable and must not be kept
+        if(fp is not outfile):
+            fp.close()
+        if(outfile != "-" and outfile is not None and not hasattr(outfile, "read") and not hasattr(outfile, "write") and not (re.findall(__upload_proto_support__, outfile) and pywwwget)):
+            try:
+                os.unlink(outfile)
+            except OSError:
+                pass
+        return False
     if(outfile == "-" or outfile is None or hasattr(outfile, "read") or hasattr(outfile, "write")):
         fp = CompressOpenFileAlt(
             fp, compression, compressionlevel, compressionuselist, formatspecs)
-        try:
-            fp.flush()
-            if(hasattr(os, "sync")):
-                os.fsync(fp.fileno())
-        except (io.UnsupportedOperation, AttributeError, OSError):
-            pass
     if(outfile == "-"):
         fp.seek(0, 0)
         shutil.copyfileobj(fp, PY_STDOUT_BUF, length=__filebuff_size__)
@@ -8537,16 +11545,21 @@ def AppendFilesWithContentToOutFile(infiles, outfile, dirlistfromtxt=False, fmtt
         fp.close()
         return True
 
-def AppendFilesWithContentToStackedOutFile(infiles, outfile, dirlistfromtxt=False, fmttype="auto", compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt, extradata=[], jsondata={}, followlink=False, checksumtype=["md5", "md5", "md5", "md5", "md5"], formatspecs=__file_format_multi_dict__, saltkey=None, verbose=False, returnfp=False):
+def AppendFilesWithContentToStackedOutFile(infiles, outfile, dirlistfromtxt=False, fmttype="auto", compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt, extradata=[], jsondata={}, followlink=False, checksumtype=["md5", "md5", "md5", "md5", "md5"], formatspecs=__file_format_multi_dict__, saltkey=None, verbose=False, returnfp=False, addtoc=__use_toc__, inflight=__write_inflight_size__, durability=None, workers=1):
     if not isinstance(infiles, list):
         infiles = [infiles]
     returnout = False
     for infileslist in infiles:
-        returnout = AppendFilesWithContentToOutFile(infileslist, outfile, dirlistfromtxt, fmttype, compression, compresswholefile, compressionlevel, compressionuselist, extradata, jsondata, followlink, checksumtype, formatspecs, saltkey, verbose, True)
+        returnout = AppendFilesWithContentToOutFile(infileslist, outfile, dirlistfromtxt, fmttype, compression, compresswholefile, compressionlevel, compressionuselist, extradata, jsondata, followlink, checksumtype, formatspecs, saltkey, verbose, True, addtoc, inflight, durability, workers)
         if(not returnout):
             break
         else:
             outfile = returnout
+            # the returned fp is rewound, the next archive goes after this one
+            try:
+                outfile.seek(0, 2)
+            except (io.UnsupportedOperation, AttributeError, OSError, ValueError):
+                pass
     if(not returnfp and returnout):
         returnout.close()
         return True
@@ -8597,12 +11610,6 @@ def AppendListsWithContentToOutFile(inlist, outfile, dirlistfromtxt=False, fmtty
     if(outfile == "-" or outfile is None or hasattr(outfile, "read") or hasattr(outfile, "write")):
         fp = CompressOpenFileAlt(
             fp, compression, compressionlevel, compressionuselist, formatspecs)
-        try:
-            fp.flush()
-            if(hasattr(os, "sync")):
-                os.fsync(fp.fileno())
-        except (io.UnsupportedOperation, AttributeError, OSError):
-            pass
     if(outfile == "-"):
         fp.seek(0, 0)
         shutil.copyfileobj(fp, PY_STDOUT_BUF, length=__filebuff_size__)
@@ -8632,28 +11639,18 @@ def AppendReadInMultipleFileWithContentToList(infile, extradata=[], jsondata={},
 def AppendReadInMultipleFilesWithContentToList(infile, extradata=[], jsondata={}, contentasfile=False, compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt, checksumtype=["md5", "md5", "md5"], formatspecs=__file_format_multi_dict__, saltkey=None, verbose=False):
     return ReadInMultipleFilesWithContentToList(infile, fmttype, 0, 0, 0, False, contentasfile, uncompress, skipchecksum, formatspecs, saltkey, seektoend)
 
-def AppendReadInFileWithContent(infile, fp, fmttype="auto", extradata=[], jsondata={}, compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt, checksumtype=["md5", "md5", "md5", "md5", "md5"], formatspecs=__file_format_multi_dict__, insaltkey=None, outsaltkey=None, verbose=False):
+def AppendReadInFileWithContent(infile, fp, fmttype="auto", extradata=[], jsondata={}, compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt, checksumtype=["md5", "md5", "md5", "md5", "md5"], formatspecs=__file_format_multi_dict__, insaltkey=None, outsaltkey=None, verbose=False, durability=None):
     if(not hasattr(fp, "write")):
         return False
     GetDirList = AppendReadInFileWithContentToList(infile, "auto", extradata, jsondata, False, compression, compresswholefile, compressionlevel, compressionuselist, [checksumtype[2], checksumtype[3], checksumtype[3]], formatspecs, insaltkey, verbose)
     numfiles = int(len(GetDirList))
     fnumfiles = format(numfiles, 'x').lower()
-    AppendFileHeader(fp, fmttype, numfiles, "UTF-8", [], {}, [checksumtype[0], checksumtype[1]], formatspecs, outsaltkey)
-    try:
-        fp.flush()
-        if(hasattr(os, "sync")):
-            os.fsync(fp.fileno())
-    except (io.UnsupportedOperation, AttributeError, OSError):
-        pass
+    durability = _get_durability(durability)
+    AppendFileHeader(fp, fmttype, numfiles, "UTF-8", [], {}, [checksumtype[0], checksumtype[1]], formatspecs, outsaltkey, durability)
     for curfname in GetDirList:
         tmpoutlist = curfname['fheaders']
-        AppendFileHeaderWithContent(fp, fmttype, tmpoutlist, curfname['fextradata'], curfname['fjsoncontent'], curfname['fcontents'], [curfname['fheaderchecksumtype'], curfname['fcontentchecksumtype'], curfname['fjsonchecksumtype']], formatspecs, outsaltkey)
-        try:
-            fp.flush()
-            if(hasattr(os, "sync")):
-                os.fsync(fp.fileno())
-        except (io.UnsupportedOperation, AttributeError, OSError):
-            pass
+        AppendFileHeaderWithContent(fp, fmttype, tmpoutlist, curfname['fextradata'], curfname['fjsoncontent'], curfname['fcontents'], [curfname['fheaderchecksumtype'], curfname['fcontentchecksumtype'], curfname['fjsonchecksumtype']], formatspecs, outsaltkey, None, durability)
+    durability.finish(fp)
     return fp
 
 def AppendReadInFileWithContentToOutFile(infiles, outfile, fmttype="auto", compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt, extradata=[], jsondata={}, checksumtype=["md5", "md5", "md5", "md5", "md5"], formatspecs=__file_format_multi_dict__, insaltkey=None, outsaltkey=None, verbose=False, returnfp=False):
@@ -8835,11 +11832,11 @@ def PrintPermissionStringAlt(fchmode, ftype):
         permissionoutstr = permissionstr
     return permissionoutstr
 
-def PackArchiveFile(infiles, outfile, dirlistfromtxt=False, fmttype="auto", compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt, followlink=False, checksumtype=["md5", "md5", "md5", "md5", "md5"], extradata=[], jsondata={}, formatspecs=__file_format_multi_dict__, saltkey=None, verbose=False, returnfp=False):
-        return AppendFilesWithContentToOutFile(infiles, outfile, dirlistfromtxt, fmttype, compression, compresswholefile, compressionlevel, compressionuselist, extradata, jsondata, followlink, checksumtype, formatspecs, saltkey, verbose, returnfp)
+def PackArchiveFile(infiles, outfile, dirlistfromtxt=False, fmttype="auto", compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt, followlink=False, checksumtype=["md5", "md5", "md5", "md5", "md5"], extradata=[], jsondata={}, formatspecs=__file_format_multi_dict__, saltkey=None, verbose=False, returnfp=False, addtoc=__use_toc__, inflight=__write_inflight_size__, durability=None, workers=1):
+        return AppendFilesWithContentToOutFile(infiles, outfile, dirlistfromtxt, fmttype, compression, compresswholefile, compressionlevel, compressionuselist, extradata, jsondata, followlink, checksumtype, formatspecs, saltkey, verbose, returnfp, addtoc, inflight, durability, workers)
 
-def PackStackedArchiveFile(infiles, outfile, dirlistfromtxt=False, fmttype="auto", compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt, followlink=False, checksumtype=["md5", "md5", "md5", "md5", "md5"], extradata=[], jsondata={}, formatspecs=__file_format_multi_dict__, saltkey=None, verbose=False, returnfp=False):
-        return AppendFilesWithContentToStackedOutFile(infiles, outfile, dirlistfromtxt, fmttype, compression, compresswholefile, compressionlevel, compressionuselist, extradata, jsondata, followlink, checksumtype, formatspecs, saltkey, verbose, returnfp)
+def PackStackedArchiveFile(infiles, outfile, dirlistfromtxt=False, fmttype="auto", compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt, followlink=False, checksumtype=["md5", "md5", "md5", "md5", "md5"], extradata=[], jsondata={}, formatspecs=__file_format_multi_dict__, saltkey=None, verbose=False, returnfp=False, addtoc=__use_toc__, inflight=__write_inflight_size__, durability=None, workers=1):
+        return AppendFilesWithContentToStackedOutFile(infiles, outfile, dirlistfromtxt, fmttype, compression, compresswholefile, compressionlevel, compressionuselist, extradata, jsondata, followlink, checksumtype, formatspecs, saltkey, verbose, returnfp, addtoc, inflight, durability, workers)
 
 def PackArchiveFileFromDirList(infiles, outfile, dirlistfromtxt=False, fmttype="auto", compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt, followlink=False, checksumtype=["md5", "md5", "md5", "md5", "md5"], extradata=[], formatspecs=__file_format_dict__, saltkey=None, verbose=False, returnfp=False):
     return PackArchiveFile(infiles, outfile, dirlistfromtxt, fmttype, compression, compresswholefile, compressionlevel, compressionuselist, followlink, checksumtype, extradata, formatspecs, saltkey, verbose, returnfp)
@@ -8971,195 +11968,280 @@ def ArchiveFileArrayValidate(infile, fmttype="auto", filestart=0, formatspecs=__
                 ok = False
     return ok
 
-def ArchiveFileValidate(infile, fmttype="auto", filestart=0, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False, verbose=False, returnfp=False):
+class _PositionalSectionReader(io.RawIOBase):
+    """
+    Read-only section of an archive fetched with a positional read
+    function, so several threads can read one archive at once.
+    """
+
+    def __init__(self, preadfunc, offset=0, length=0):
+        super().__init__()
+        self._pread = preadfunc
+        self._offset = int(offset)
+        self._length = max(0, int(length))
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        remaining = self._length - self._pos
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        if size <= 0:
+            return b""
+        data = self._pread(self._offset + self._pos, size)
+        self._pos += len(data)
+        return data
+
+
+def _get_positional_reader(fp):
+    # Thread-safe read(offset, length) for fp, or None when fp has no
+    # position-independent way of reading (pipes, decompressors, ...)
+    if(isinstance(fp, FileMmapReader)):
+        return fp.getbuffer
+    if(isinstance(fp, BytesIO)):
+        def _bytesio_pread(offset, length):
+            with fp.getbuffer() as fpview:
+                return bytes(fpview[offset:offset + length])
+        return _bytesio_pread
+    if(hasattr(os, "pread") and isinstance(fp, (io.BufferedReader, io.BufferedRandom, io.FileIO))):
+        try:
+            fd = fp.fileno()
+            if(stat.S_ISREG(os.fstat(fd).st_mode)):
+                return lambda offset, length: os.pread(fd, length, offset)
+        except (io.UnsupportedOperation, AttributeError, OSError, ValueError):
+            pass
+    return None
+
+
+def _iter_entry_content_checksums(fileentries, workers=2, saltkey=None):
+    # Hash entry contents on a thread pool while the headers are walked,
+    # yielding (archive, entry, content checksum) in archive order.  At
+    # most a few entries per worker are in flight at any time.
+    pending = []
+    preaders = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        for listarrayfiles, curentry in fileentries:
+            future = None
+            if(curentry['fsize'] > 0):
+                formatspecs = listarrayfiles['fformatspecs']
+                checksumtype = curentry['fcontentchecksumtype'].lower()
+                entryfp = getattr(curentry, "fp", None)
+                if(entryfp is not None):
+                    if(id(entryfp) not in preaders):
+                        preaders[id(entryfp)] = _get_positional_reader(entryfp)
+                    preadfunc = preaders[id(entryfp)]
+                    fstoredsize = curentry['fcontentend'] - curentry['fcontentstart']
+                    if(preadfunc is not None):
+                        fcontents = _PositionalSectionReader(preadfunc, curentry['fcontentstart'], fstoredsize)
+                    else:
+                        fcontents = curentry.open_contents(False).read()
+                else:
+                    fcontents = curentry['fcontents']
+                    if(hasattr(fcontents, "read")):
+                        fcontents.seek(0, 0)
+                future = executor.submit(GetFileChecksum, fcontents, checksumtype, False, formatspecs, saltkey)
+            pending.append((listarrayfiles, curentry, future))
+            if(len(pending) > workers * 4):
+                listarrayfiles, curentry, future = pending.pop(0)
+                yield (listarrayfiles, curentry, future.result() if future is not None else None)
+        for listarrayfiles, curentry, future in pending:
+            yield (listarrayfiles, curentry, future.result() if future is not None else None)
+
+
+def _validate_archive_header(listarrayfiles, formatspecs=__file_format_dict__, saltkey=None, verbose=False):
+    inheader = listarrayfiles['frawheader']
+    fprechecksumtype = inheader[-2]
+    fprechecksum = inheader[-1]
+    headeroffset = listarrayfiles['fhstart']
+    headerjsonoffset = listarrayfiles['fjstart']
+    valid_archive = True
+    if(verbose):
+        VerbosePrintOut("Number of Records " + str(listarrayfiles['fnumfiles']))
+    headercheck = ValidateHeaderChecksum(inheader[:-1], fprechecksumtype, fprechecksum, formatspecs, saltkey)
+    newfcs = GetHeaderChecksum(inheader[:-1], fprechecksumtype, True, formatspecs, saltkey)
+    if(headercheck):
+        if(verbose):
+            VerbosePrintOut("File Header Checksum Passed at offset " + str(headeroffset))
+            VerbosePrintOut("'" + fprechecksum + "' == " + "'" + newfcs + "'")
+    else:
+        valid_archive = False
+        if(verbose):
+            VerbosePrintOut("File Header Checksum Failed at offset " + str(headeroffset))
+            VerbosePrintOut("'" + fprechecksum + "' != " + "'" + newfcs + "'")
+    if(listarrayfiles['fjsonsize'] > 0):
+        jsonfcs = GetFileChecksum(listarrayfiles['fjsonrawdata'], listarrayfiles['fjsonchecksumtype'], True, formatspecs, saltkey)
+        if(CheckChecksums(jsonfcs, listarrayfiles['fjsonchecksum'])):
+            if(verbose):
+                VerbosePrintOut("File JSON Data Checksum Passed at offset " + str(headerjsonoffset))
+                VerbosePrintOut("'" + listarrayfiles['fjsonchecksum'] + "' == " + "'" + jsonfcs + "'")
+        else:
+            valid_archive = False
+            if(verbose):
+                VerbosePrintOut("File JSON Data Checksum Error at offset " + str(headerjsonoffset))
+                VerbosePrintOut("'" + listarrayfiles['fjsonchecksum'] + "' != " + "'" + jsonfcs + "'")
+    if(verbose):
+        VerbosePrintOut("")
+    return valid_archive
+
+
+def _validate_archive_entry(curentry, formatspecs=__file_format_dict__, saltkey=None, verbose=False, infccs=None):
+    profiler = _profiler
+    if(profiler is not None):
+        start_real = time.perf_counter()
+    inheaderdata = curentry['frawheader']
+    outfhstart = curentry['fhstart']
+    outfjstart = curentry['fjstart']
+    outfcontentstart = curentry['fcontentstart']
+    outfcs = curentry['fheaderchecksum'].lower()
+    outfccs = curentry['fcontentchecksum'].lower()
+    valid_entry = True
+    if(verbose):
+        VerbosePrintOut(curentry['fname'])
+        VerbosePrintOut("Record Number " + str(curentry['fid']) + "; File ID " + str(curentry['fid']) + "; iNode Number " + str(curentry['finode']))
+    infcs = GetHeaderChecksum(inheaderdata[:-2], curentry['fheaderchecksumtype'].lower(), True, formatspecs, saltkey)
+    if(CheckChecksums(outfcs, infcs)):
+        if(verbose):
+            VerbosePrintOut("File Header Checksum Passed at offset " + str(outfhstart))
+            VerbosePrintOut("'" + outfcs + "' == " + "'" + infcs + "'")
+    else:
+        valid_entry = False
+        if(verbose):
+            VerbosePrintOut("File Header Checksum Failed at offset " + str(outfhstart))
+            VerbosePrintOut("'" + outfcs + "' != " + "'" + infcs + "'")
+    if(curentry['fjsonsize'] > 0):
+        injsonfcs = GetFileChecksum(curentry['fjsonrawdata'], curentry['fjsonchecksumtype'], True, formatspecs, saltkey)
+        if(CheckChecksums(injsonfcs, curentry['fjsonchecksum'])):
+            if(verbose):
+                VerbosePrintOut("File JSON Data Checksum Passed at offset " + str(outfjstart))
+                VerbosePrintOut("'" + curentry['fjsonchecksum'] + "' == " + "'" + injsonfcs + "'")
+        else:
+            valid_entry = False
+            if(verbose):
+                VerbosePrintOut("File JSON Data Checksum Error at offset " + str(outfjstart))
+                VerbosePrintOut("'" + curentry['fjsonchecksum'] + "' != " + "'" + injsonfcs + "'")
+    if(curentry['fsize'] > 0):
+        if(infccs is None):
+            outfcontents = curentry['fcontents']
+            if(not hasattr(outfcontents, "read")):
+                outfcontents = MkTempFile(outfcontents)
+            outfcontents.seek(0, 0)
+            infccs = GetFileChecksum(outfcontents, curentry['fcontentchecksumtype'].lower(), False, formatspecs, saltkey)
+        if(CheckChecksums(outfccs, infccs)):
+            if(verbose):
+                VerbosePrintOut("File Content Checksum Passed at offset " + str(outfcontentstart))
+                VerbosePrintOut("'" + outfccs + "' == " + "'" + infccs + "'")
+        else:
+            valid_entry = False
+            if(verbose):
+                VerbosePrintOut("File Content Checksum Failed at offset " + str(outfcontentstart))
+                VerbosePrintOut("'" + outfccs + "' != " + "'" + infccs + "'")
+    if(verbose):
+        VerbosePrintOut("")
+    if(profiler is not None):
+        profiler.entry('validate', curentry['fname'], time.perf_counter() - start_real, curentry['fsize'])
+    return valid_entry
+
+
+def ArchiveFileValidate(infile, fmttype="auto", filestart=0, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False, verbose=False, returnfp=False, workers=1):
     # ---------- Input handling ----------
+    if(workers is None or workers < 1):
+        workers = 1
+    archivelist = []
+    infp = None
     if isinstance(infile, dict):
-        listarrayfileslist = [infile]
+        archivelist = [infile]
+        fileentries = ((listarrayfiles, curentry) for listarrayfiles in archivelist for curentry in listarrayfiles['ffilelist'])
     elif isinstance(infile, list):
-        listarrayfileslist = infile
+        archivelist = infile
+        fileentries = ((listarrayfiles, curentry) for listarrayfiles in archivelist for curentry in listarrayfiles['ffilelist'])
     else:
         if (infile != "-" and not isinstance(infile, (bytes, bytearray, memoryview))  # bytes is str on Py2
             and not hasattr(infile, "read") and not hasattr(infile, "write")):
             infile = RemoveWindowsPath(infile)
-        listarrayfileslist = ArchiveFileToArray(
-            infile, fmttype, filestart, 0, 0,
-            False, True, False, True, formatspecs, saltkey, seektoend, returnfp
-        )
-    for listarrayfiles in listarrayfileslist:
-        fp = listarrayfiles['fp']
-        inheader = listarrayfiles['frawheader']
-        fnumfiles = int(inheader[9], 16)
-        fprechecksumtype = inheader[-2]
-        fprechecksum = inheader[-1]
-        fjsonsize = int(inheader[13], 16)
-        fjsonchecksumtype = inheader[14]
-        fjsonchecksum = inheader[15]
-        headeroffset = listarrayfiles['fhstart']
-        headerjsonoffset = listarrayfiles['fjstart']
-        fprejsoncontent = listarrayfiles['fjsonrawdata']
-        jsonfcs = GetFileChecksum(fprejsoncontent, fjsonchecksumtype, True, formatspecs, saltkey)
-        il = 0
-        headercheck = ValidateHeaderChecksum(inheader[:-1], fprechecksumtype, fprechecksum, formatspecs, saltkey)
-        newfcs = GetHeaderChecksum(inheader[:-1], fprechecksumtype, True, formatspecs, saltkey)
-        valid_archive = True
-        invalid_archive = False
-        if(verbose):
-            if(hasattr(infile, "read") or hasattr(infile, "write")):
-                try:
-                    VerbosePrintOut(infile.name)
-                except AttributeError:
-                    pass
-            elif(isinstance(infile, bytes)):
+        if(workers > 1):
+            # Header-only walk; the pool reads contents with positional
+            # reads, so the archive stays open until every entry is hashed
+            infp = _open_archive_infile(infile)
+            if(not infp):
+                return False
+            fileentries = ((curentry['farchive'], curentry) for curentry in IterArchiveFile(infp, fmttype, filestart, 0, 0, True, False, True, formatspecs, saltkey, archivelist, False))
+        else:
+            fileentries = ((curentry['farchive'], curentry) for curentry in IterArchiveFile(infile, fmttype, filestart, 0, 0, False, False, True, formatspecs, saltkey, archivelist, not returnfp))
+    if(verbose):
+        if(hasattr(infile, "read") or hasattr(infile, "write")):
+            try:
+                VerbosePrintOut(infile.name)
+            except AttributeError:
                 pass
-            else:
-                VerbosePrintOut(infile)
-            VerbosePrintOut("Number of Records " + str(fnumfiles))
-        if(headercheck):
-            if(verbose):
-                VerbosePrintOut("File Header Checksum Passed at offset " + str(headeroffset))
-                VerbosePrintOut("'" + fprechecksum + "' == " + "'" + newfcs + "'")
+        elif(isinstance(infile, (bytes, dict, list))):
+            pass
         else:
-            # always flip flags, even when not verbose
-            valid_archive = False
-            invalid_archive = True
-            if(verbose):
-                VerbosePrintOut("File Header Checksum Failed at offset " + str(headeroffset))
-                VerbosePrintOut("'" + fprechecksum + "' != " + "'" + newfcs + "'")
-        if(fjsonsize > 0):
-            if(CheckChecksums(jsonfcs, fjsonchecksum)):
-                if(verbose):
-                    VerbosePrintOut("File JSON Data Checksum Passed at offset " + str(headerjsonoffset))
-                    VerbosePrintOut("'" + outfjsonchecksum + "' == " + "'" + injsonfcs + "'")
-            else:
+            VerbosePrintOut(infile)
+    if(workers > 1):
+        fileentries = _iter_entry_content_checksums(fileentries, workers, saltkey)
+    else:
+        fileentries = ((listarrayfiles, curentry, None) for listarrayfiles, curentry in fileentries)
+    valid_archive = True
+    checkedarchives = []
+    for listarrayfiles, curentry, infccs in fileentries:
+        if(not checkedarchives or listarrayfiles is not checkedarchives[-1]):
+            checkedarchives.append(listarrayfiles)
+            if(not _validate_archive_header(listarrayfiles, listarrayfiles['fformatspecs'], saltkey, verbose)):
                 valid_archive = False
-                invalid_archive = True
-                if(verbose):
-                    VerbosePrintOut("File JSON Data Checksum Error at offset " + str(headerjsonoffset))
-                    VerbosePrintOut("'" + outfjsonchecksum + "' != " + "'" + injsonfcs + "'")
-        if(verbose):
-            VerbosePrintOut("")
-        while (il < fnumfiles):
-            cur_entry = listarrayfiles['ffilelist'][il]
-            outfhstart = cur_entry['fhstart']
-            inheaderdata = cur_entry['frawheader']
-            if(len(inheaderdata) == 0):
-                break
-            outfname = inheaderdata[5]
-            outfbasedir = os.path.dirname(outfname)
-            outfsize = int(inheaderdata[7], 16)
-            outfcompression = inheaderdata[17]
-            outfcsize = int(inheaderdata[18], 16)
-            fid = int(inheaderdata[23], 16)
-            finode = int(inheaderdata[24], 16)
-            outfseektojson = inheaderdata[28]
-            outfseektocontent = inheaderdata[29]
-            outfseeknextfile = inheaderdata[30]
-            outfjsonsize = int(inheaderdata[33], 16)
-            outfjsonchecksumtype = inheaderdata[35]
-            outfjsonchecksum = inheaderdata[36]
-            outfhend = cur_entry['fhend']  # (kept for parity; not used)
-            outfjstart = cur_entry['fjstart']
-            # Read JSON bytes; compute checksum on bytes for robustness
-            outfprejsoncontent_bytes = cur_entry['fjsonrawdata']
-            # Decode for any downstream text needs (not used further here)
-            try:
-                outfprejsoncontent = outfprejsoncontent_bytes.decode("UTF-8")
-            except Exception:
-                outfprejsoncontent = None
-            outfjend = cur_entry['fjend']
-            injsonfcs = GetFileChecksum(outfprejsoncontent_bytes, outfjsonchecksumtype, True, formatspecs, saltkey)
-            outfextrafields = int(inheaderdata[37], 16)
-            extrafieldslist = []
-            extrastart = 38
-            extraend = extrastart + outfextrafields
-            outfcs = inheaderdata[-2].lower()
-            outfccs = inheaderdata[-1].lower()
-            infcs = GetHeaderChecksum(inheaderdata[:-2], inheaderdata[-4].lower(), True, formatspecs, saltkey)
-            if(verbose):
-                VerbosePrintOut(outfname)
-                VerbosePrintOut("Record Number " + str(il) + "; File ID " + str(fid) + "; iNode Number " + str(finode))
-
-            if(CheckChecksums(outfcs, infcs)):
-                if(verbose):
-                    VerbosePrintOut("File Header Checksum Passed at offset " + str(outfhstart))
-                    VerbosePrintOut("'" + outfcs + "' == " + "'" + infcs + "'")
-            else:
+        if(not _validate_archive_entry(curentry, listarrayfiles['fformatspecs'], saltkey, verbose, infccs)):
+            valid_archive = False
+    for listarrayfiles in archivelist:
+        # archives without any entries still get their header checked
+        if(not any(listarrayfiles is checkedarchive for checkedarchive in checkedarchives)):
+            checkedarchives.append(listarrayfiles)
+            if(not _validate_archive_header(listarrayfiles, listarrayfiles['fformatspecs'], saltkey, verbose)):
                 valid_archive = False
-                invalid_archive = True
-                if(verbose):
-                    VerbosePrintOut("File Header Checksum Failed at offset " + str(outfhstart))
-                    VerbosePrintOut("'" + outfcs + "' != " + "'" + infcs + "'")
-            if(outfjsonsize > 0):
-                if(CheckChecksums(injsonfcs, outfjsonchecksum)):
-                    if(verbose):
-                        VerbosePrintOut("File JSON Data Checksum Passed at offset " + str(outfjstart))
-                        VerbosePrintOut("'" + outfjsonchecksum + "' == " + "'" + injsonfcs + "'")
-                else:
-                    valid_archive = False
-                    invalid_archive = True
-                    if(verbose):
-                        VerbosePrintOut("File JSON Data Checksum Error at offset " + str(outfjstart))
-                        VerbosePrintOut("'" + outfjsonchecksum + "' != " + "'" + injsonfcs + "'")
-            outfcontentstart = cur_entry['fcontentstart']
-            outfcontents = b""   # FIX: bytes for Py2/3 consistency
-            pyhascontents = False
-            if(outfsize > 0):
-                outfcontents = cur_entry['fcontents']
-                outfcontents.seek(0, 0)
-                infccs = GetFileChecksum(outfcontents, inheaderdata[-3].lower(), False, formatspecs, saltkey)
-                pyhascontents = True
-                if(CheckChecksums(outfccs, infccs)):
-                    if(verbose):
-                        VerbosePrintOut("File Content Checksum Passed at offset " + str(outfcontentstart))
-                        VerbosePrintOut("'" + outfccs + "' == " + "'" + infccs + "'")
-                else:
-                    valid_archive = False
-                    invalid_archive = True
-                    if(verbose):
-                        VerbosePrintOut("File Content Checksum Failed at offset " + str(outfcontentstart))
-                        VerbosePrintOut("'" + outfccs + "' != " + "'" + infccs + "'")
-            if(verbose):
-                VerbosePrintOut("")
-            il = il + 1
+    if(infp is not None and not returnfp and infp is not infile):
+        infp.close()
+    if(not archivelist):
+        return False
+    fp = archivelist[-1].get('fp')
     if(valid_archive):
         if(returnfp):
             return fp
         else:
-            fp.close()
             return True
     else:
-        fp.close()
+        if(fp is not None):
+            fp.close()
         return False
 
 
-def ArchiveFileValidateFile(infile, fmttype="auto", filestart=0, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False, verbose=False, returnfp=False):
-    return ArchiveFileValidate(infile, fmttype, filestart, formatspecs, saltkey, seektoend, verbose, returnfp)
+def ArchiveFileValidateFile(infile, fmttype="auto", filestart=0, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False, verbose=False, returnfp=False, workers=1):
+    return ArchiveFileValidate(infile, fmttype, filestart, formatspecs, saltkey, seektoend, verbose, returnfp, workers)
 
 
-def ArchiveFileValidateMultiple(infile, fmttype="auto", filestart=0, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False, verbose=False, returnfp=False):
+def ArchiveFileValidateMultiple(infile, fmttype="auto", filestart=0, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False, verbose=False, returnfp=False, workers=1):
     if(isinstance(infile, (list, tuple, ))):
         pass
     else:
         infile = [infile]
     outretval = True
     for curfname in infile:
-        curretfile = ArchiveFileValidate(curfname, fmttype, filestart, formatspecs, saltkey, seektoend, verbose, returnfp)
+        curretfile = ArchiveFileValidate(curfname, fmttype, filestart, formatspecs, saltkey, seektoend, verbose, returnfp, workers)
         if(not curretfile):
             outretval = False
     return outretval
 
-def ArchiveFileValidateMultipleFiles(infile, fmttype="auto", filestart=0, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False, verbose=False, returnfp=False):
-    return ArchiveFileValidateMultiple(infile, fmttype, filestart, formatspecs, saltkey, seektoend, verbose, returnfp)
+def ArchiveFileValidateMultipleFiles(infile, fmttype="auto", filestart=0, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False, verbose=False, returnfp=False, workers=1):
+    return ArchiveFileValidateMultiple(infile, fmttype, filestart, formatspecs, saltkey, seektoend, verbose, returnfp, workers)
 
 
-def StackedArchiveFileValidate(infile, fmttype="auto", filestart=0, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False, verbose=False, returnfp=False):
+def StackedArchiveFileValidate(infile, fmttype="auto", filestart=0, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False, verbose=False, returnfp=False, workers=1):
     outretval = []
     outstartfile = filestart
     outfsize = float('inf')
     while True:
         if outstartfile >= outfsize:   # stop when function signals False
             break
-        is_valid_file = ArchiveFileValidate(infile, fmttype, outstartfile, formatspecs, saltkey, seektoend, verbose, True)
+        is_valid_file = ArchiveFileValidate(infile, fmttype, outstartfile, formatspecs, saltkey, seektoend, verbose, True, workers)
         if is_valid_file is False:   # stop when function signals False
             outretval.append(is_valid_file)
             break
@@ -9184,28 +12266,238 @@ def StackedArchiveFileValidate(infile, fmttype="auto", filestart=0, formatspecs=
     
 
 
-def StackedArchiveFileValidateFile(infile, fmttype="auto", filestart=0, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False, verbose=False, returnfp=False):
-    return StackedArchiveFileValidate(infile, fmttype, filestart, formatspecs, saltkey, seektoend, verbose, returnfp)
+def StackedArchiveFileValidateFile(infile, fmttype="auto", filestart=0, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False, verbose=False, returnfp=False, workers=1):
+    return StackedArchiveFileValidate(infile, fmttype, filestart, formatspecs, saltkey, seektoend, verbose, returnfp, workers)
 
 
-def StackedArchiveFileValidateMultiple(infile, fmttype="auto", filestart=0, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False, verbose=False, returnfp=False):
+def StackedArchiveFileValidateMultiple(infile, fmttype="auto", filestart=0, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False, verbose=False, returnfp=False, workers=1):
     if(isinstance(infile, (list, tuple, ))):
         pass
     else:
         infile = [infile]
     outretval = True
     for curfname in infile:
-        curretfile = StackedArchiveFileValidate(curfname, fmttype, filestart, formatspecs, saltkey, seektoend, verbose, returnfp)
+        curretfile = StackedArchiveFileValidate(curfname, fmttype, filestart, formatspecs, saltkey, seektoend, verbose, returnfp, workers)
         if(not curretfile):
             outretval = False
     return outretval
 
-def StackedArchiveFileValidateMultipleFiles(infile, fmttype="auto", filestart=0, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False, verbose=False, returnfp=False):
-    return StackedArchiveFileValidateMultiple(infile, fmttype, filestart, formatspecs, saltkey, seektoend, verbose, returnfp)
+def StackedArchiveFileValidateMultipleFiles(infile, fmttype="auto", filestart=0, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False, verbose=False, returnfp=False, workers=1):
+    return StackedArchiveFileValidateMultiple(infile, fmttype, filestart, formatspecs, saltkey, seektoend, verbose, returnfp, workers)
+
+
+# ===== Listing cache =====
+# Opt-in, for services that list the same archives over and over.  A
+# listonly ArchiveFileToArray result is kept per (path, listing options)
+# along with the (st_dev, st_ino, st_size, st_mtime_ns) it was read at, so
+# while the file is unchanged a repeated listing costs one stat().  Memory
+# is an LRU bounded by the marshalled size of the listings; an optional
+# directory tier keeps them across restarts, bounded the same way with the
+# least recently used files removed first.  marshal is not safe against
+# crafted input, so the directory must only be writable by trusted users.
+DEFAULT_LIST_CACHE_MAX = 64 * BYTES_PER_MiB
+DEFAULT_LIST_CACHE_DISK_MAX = 256 * BYTES_PER_MiB
+LIST_CACHE_MAGIC = b"PYARCLST"
+LIST_CACHE_VERSION = 1
+# magic, version, python major, python minor (marshal is version specific)
+LIST_CACHE_HEADER_STRUCT = struct.Struct("<8sHBB")
+
+_list_cache = None
+
+
+def _strip_cached_listing(listarrays):
+    outarrays = []
+    for listarrayfiles in listarrays:
+        listarrayfiles = dict(listarrayfiles)
+        listarrayfiles.update({'fp': None, 'ffilelist': [dict(curentry, fcontents=None) for curentry in listarrayfiles['ffilelist']]})
+        outarrays.append(listarrayfiles)
+    return outarrays
+
+
+def _copy_cached_listing(listarrays):
+    # every hit gets its own archive and entry dicts, listonly contents are
+    # always empty
+    outarrays = []
+    for listarrayfiles in listarrays:
+        listarrayfiles = dict(listarrayfiles)
+        listarrayfiles['ffilelist'] = [dict(curentry, fcontents=(io.BytesIO() if curentry['fcontentasfile'] else b"")) for curentry in listarrayfiles['ffilelist']]
+        outarrays.append(listarrayfiles)
+    return outarrays
+
+
+class ArchiveListCache(object):
+    """LRU cache of archive listings, see EnableListCache()."""
+
+    def __init__(self, maxbytes=DEFAULT_LIST_CACHE_MAX, cachedir=None, diskmaxbytes=DEFAULT_LIST_CACHE_DISK_MAX):
+        self.maxbytes = maxbytes
+        self.cachedir = cachedir
+        self.diskmaxbytes = diskmaxbytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        if(cachedir is not None and not os.path.isdir(cachedir)):
+            os.makedirs(cachedir)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def fingerprint(infile):
+        try:
+            fstatinfo = os.stat(infile)
+        except OSError:
+            return None
+        return (fstatinfo.st_dev, fstatinfo.st_ino, fstatinfo.st_size, fstatinfo.st_mtime_ns)
+
+    def _disk_path(self, key):
+        return os.path.join(self.cachedir, hashlib.sha256(repr(key).encode("UTF-8")).hexdigest() + ".lst")
+
+    def _disk_get(self, key, fingerprint):
+        try:
+            with open(self._disk_path(key), "rb") as cachefp:
+                cachedata = cachefp.read()
+        except (IOError, OSError):
+            return None
+        if(len(cachedata) < LIST_CACHE_HEADER_STRUCT.size):
+            return None
+        if(LIST_CACHE_HEADER_STRUCT.unpack_from(cachedata, 0) != (LIST_CACHE_MAGIC, LIST_CACHE_VERSION, sys.version_info[0], sys.version_info[1])):
+            return None
+        try:
+            cachekey, cachefingerprint, listarrays = marshal.loads(cachedata[LIST_CACHE_HEADER_STRUCT.size:])
+        except (EOFError, ValueError, TypeError):
+            return None
+        if(cachekey != key or tuple(cachefingerprint) != fingerprint):
+            return None
+        try:
+            # the mtime is the last use for _disk_evict
+            os.utime(self._disk_path(key), None)
+        except OSError:
+            pass
+        return (listarrays, len(cachedata))
+
+    def _disk_evict(self):
+        diskentries = []
+        for cachename in os.listdir(self.cachedir):
+            if(not cachename.endswith(".lst")):
+                continue
+            try:
+                fstatinfo = os.stat(os.path.join(self.cachedir, cachename))
+            except OSError:
+                continue
+            diskentries.append((fstatinfo.st_mtime_ns, cachename, fstatinfo.st_size))
+        disksize = sum(x[2] for x in diskentries)
+        diskentries.sort()
+        while(disksize > self.diskmaxbytes and diskentries):
+            oldentry = diskentries.pop(0)
+            try:
+                os.unlink(os.path.join(self.cachedir, oldentry[1]))
+            except OSError:
+                pass
+            disksize = disksize - oldentry[2]
+
+    def _store(self, key, fingerprint, listarrays, size):
+        with self._lock:
+            oldentry = self._entries.pop(key, None)
+            if(oldentry is not None):
+                self.size = self.size - oldentry[2]
+            if(size > self.maxbytes):
+                return
+            self._entries[key] = (fingerprint, listarrays, size)
+            self.size = self.size + size
+            while(self.size > self.maxbytes):
+                oldentry = self._entries.popitem(last=False)[1]
+                self.size = self.size - oldentry[2]
+
+    def get(self, key, fingerprint):
+        with self._lock:
+            cachedentry = self._entries.get(key)
+            if(cachedentry is not None and cachedentry[0] == fingerprint):
+                self._entries.move_to_end(key)
+                self.hits = self.hits + 1
+                return _copy_cached_listing(cachedentry[1])
+        if(self.cachedir is not None):
+            diskentry = self._disk_get(key, fingerprint)
+            if(diskentry is not None):
+                self._store(key, fingerprint, diskentry[0], diskentry[1])
+                with self._lock:
+                    self.hits = self.hits + 1
+                return _copy_cached_listing(diskentry[0])
+        with self._lock:
+            self.misses = self.misses + 1
+        return None
+
+    def put(self, key, fingerprint, listarrays):
+        listarrays = _strip_cached_listing(listarrays)
+        try:
+            cachedata = LIST_CACHE_HEADER_STRUCT.pack(LIST_CACHE_MAGIC, LIST_CACHE_VERSION, sys.version_info[0], sys.version_info[1]) + marshal.dumps((key, fingerprint, listarrays))
+        except ValueError:
+            return False
+        self._store(key, fingerprint, listarrays, len(cachedata))
+        if(self.cachedir is not None and len(cachedata) <= self.diskmaxbytes):
+            try:
+                _atomic_write(self._disk_path(key), cachedata)
+                self._disk_evict()
+            except (IOError, OSError):
+                pass
+        return True
+
+    def clear(self, disk=False):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+        if(disk and self.cachedir is not None):
+            for cachename in os.listdir(self.cachedir):
+                if(cachename.endswith(".lst")):
+                    try:
+                        os.unlink(os.path.join(self.cachedir, cachename))
+                    except OSError:
+                        pass
+
 
+def EnableListCache(maxbytes=DEFAULT_LIST_CACHE_MAX, cachedir=None, diskmaxbytes=DEFAULT_LIST_CACHE_DISK_MAX):
+    global _list_cache
+    _list_cache = ArchiveListCache(maxbytes, cachedir, diskmaxbytes)
+    return _list_cache
 
-def ArchiveFileToArray(infile, fmttype="auto", filestart=0, seekstart=0, seekend=0, listonly=False, contentasfile=True, uncompress=True, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False, returnfp=False):
-    outfp = ReadInFileWithContentToArray(infile, fmttype, filestart, seekstart, seekend, listonly, contentasfile, uncompress, skipchecksum, formatspecs, saltkey, seektoend)
+
+def DisableListCache():
+    global _list_cache
+    _list_cache = None
+    return True
+
+
+def GetListCache():
+    return _list_cache
+
+
+def _list_cache_key(infile, formatspecs, options, saltkey=None):
+    if(_list_cache is None or not isinstance(infile, str) or infile == "-" or re.findall(__download_proto_support__, infile)):
+        return None
+    # custom format specs are not part of the key, those listings bypass the cache
+    if(formatspecs is not __file_format_multi_dict__ and formatspecs is not __file_format_dict__):
+        return None
+    infile = os.path.abspath(RemoveWindowsPath(infile))
+    fingerprint = ArchiveListCache.fingerprint(infile)
+    if(fingerprint is None):
+        return None
+    if(saltkey is not None):
+        if(not isinstance(saltkey, bytes)):
+            saltkey = str(saltkey).encode("UTF-8")
+        saltkey = hashlib.sha256(saltkey).hexdigest()
+    return ((infile, saltkey) + tuple(options), fingerprint)
+
+
+def ArchiveFileToArray(infile, fmttype="auto", filestart=0, seekstart=0, seekend=0, listonly=False, contentasfile=True, uncompress=True, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False, returnfp=False, usemmap=__use_mmap__, workers=1):
+    listcachekey = None
+    if(listonly and not returnfp):
+        listcachekey = _list_cache_key(infile, formatspecs, (fmttype, filestart, seekstart, seekend, contentasfile, skipchecksum, seektoend), saltkey)
+        if(listcachekey is not None):
+            cachedlist = _list_cache.get(*listcachekey)
+            if(cachedlist is not None):
+                return cachedlist
+    outfp = ReadInFileWithContentToArray(infile, fmttype, filestart, seekstart, seekend, listonly, contentasfile, uncompress, skipchecksum, formatspecs, saltkey, seektoend, usemmap, workers)
     if not returnfp:
         for item in outfp:
             fp = item.get('fp')
@@ -9216,6 +12508,8 @@ def ArchiveFileToArray(infile, fmttype="auto", filestart=0, seekstart=0, seekend
                 # optionally log/collect errors here
                 pass
             item['fp'] = None
+    if(listcachekey is not None and outfp and _list_cache is not None):
+        _list_cache.put(listcachekey[0], listcachekey[1], outfp)
     return outfp
 
 
@@ -9381,6 +12675,8 @@ def ArchiveFileArrayToArrayIndex(inarray, returnfp=True):
         'entries': { fid: {'name': fname, 'type': ftype} },
         'indexes': {
           'by_name': { fname: fid },
+          'by_path': ArchiveFilePathIndex,  # children/prefix/glob queries,
+                                            # built on first access
           'by_type': {
             <category>: {
               'by_name': { fname: fid },
@@ -9413,10 +12709,10 @@ def ArchiveFileArrayToArrayIndex(inarray, returnfp=True):
         "list": inarray,
         "fp": inarray.get("fp") if returnfp else None,
         "entries": {},
-        "indexes": {
+        "indexes": _ArchiveIndexes(inarray, {
             "by_name": {},
             "by_type": by_type,
-        },
+        }),
         "counts": {"total": 0, "by_type": {}},
         "unknown_types": {},
     }
@@ -9479,7 +12775,7 @@ def ArchiveFileArrayToArrayIndex(inarray, returnfp=True):
     return out
 
 
-def RePackArchiveFile(infile, outfile, fmttype="auto", compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt,  followlink=False, filestart=0, seekstart=0, seekend=0, checksumtype=["md5", "md5", "md5", "md5", "md5"], skipchecksum=False, extradata=[], jsondata={}, formatspecs=__file_format_multi_dict__, insaltkey=None, outsaltkey=None, seektoend=False, verbose=False, returnfp=False):
+def RePackArchiveFile(infile, outfile, fmttype="auto", compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt,  followlink=False, filestart=0, seekstart=0, seekend=0, checksumtype=["md5", "md5", "md5", "md5", "md5"], skipchecksum=False, extradata=[], jsondata={}, formatspecs=__file_format_multi_dict__, insaltkey=None, outsaltkey=None, seektoend=False, verbose=False, returnfp=False, durability=None):
     # ---------- Safe defaults ----------
     if compressionuselist is None:
         compressionuselist = compressionlistalt
@@ -9491,6 +12787,7 @@ def RePackArchiveFile(infile, outfile, fmttype="auto", compression="auto", compr
         jsondata = {}
     if formatspecs is None:
         formatspecs = __file_format_multi_dict__
+    durability = _get_durability(durability)
 
     # ---------- Input handling ----------
     if isinstance(infile, dict):
@@ -9580,7 +12877,7 @@ def RePackArchiveFile(infile, outfile, fmttype="auto", compression="auto", compr
         if lenlist != fnumfiles:
             fnumfiles = lenlist
 
-        AppendFileHeader(fp, fmttype, fnumfiles, listarrayfiles.get('fencoding', 'utf-8'), listarrayfiles['fextradata'], listarrayfiles['fjsondata'], [checksumtype[0], checksumtype[1]], formatspecs, outsaltkey)
+        AppendFileHeader(fp, fmttype, fnumfiles, listarrayfiles.get('fencoding', 'utf-8'), listarrayfiles['fextradata'], listarrayfiles['fjsondata'], [checksumtype[0], checksumtype[1]], formatspecs, outsaltkey, durability)
 
         # loop counters
         lcfi = 0
@@ -9825,7 +13122,7 @@ def RePackArchiveFile(infile, outfile, fmttype="auto", compression="auto", compr
             if(fvendorfields>0 and len(ffvendorfieldslist)>0):
                 extradata.extend(fvendorfields)
             
-            AppendFileHeaderWithContent(fp, fmttype, tmpoutlist, extradata, jsondata, fcontents.read(),[checksumtype[2], checksumtype[3], checksumtype[4]], formatspecs, outsaltkey)
+            AppendFileHeaderWithContent(fp, fmttype, tmpoutlist, extradata, jsondata, fcontents.read(),[checksumtype[2], checksumtype[3], checksumtype[4]], formatspecs, outsaltkey, None, durability)
             try:
                 fcontents.close()
             except Exception:
@@ -9834,15 +13131,10 @@ def RePackArchiveFile(infile, outfile, fmttype="auto", compression="auto", compr
             reallcfi += 1
 
     # ---------- Finalization ----------
+    durability.finish(fp)
     if (outfile == "-" or outfile is None
         or hasattr(outfile, "read") or hasattr(outfile, "write")):
         fp = CompressOpenFileAlt(fp, compression, compressionlevel, compressionuselist, formatspecs)
-        try:
-            fp.flush()
-            if hasattr(os, "sync"):
-                os.fsync(fp.fileno())
-        except (io.UnsupportedOperation, AttributeError, OSError):
-            pass
 
     if outfile == "-":
         fp.seek(0, 0)
@@ -9870,12 +13162,12 @@ def RePackArchiveFile(infile, outfile, fmttype="auto", compression="auto", compr
             pass
         return True
 
-def RePackMultipleArchiveFile(infiles, outfile, fmttype="auto", compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt,  followlink=False, filestart=0, seekstart=0, seekend=0, checksumtype=["md5", "md5", "md5", "md5", "md5"], skipchecksum=False, extradata=[], jsondata={}, formatspecs=__file_format_multi_dict__, insaltkey=None, outsaltkey=None, seektoend=False, verbose=False, returnfp=False):
+def RePackMultipleArchiveFile(infiles, outfile, fmttype="auto", compression="auto", compresswholefile=True, compressionlevel=None, compressionuselist=compressionlistalt,  followlink=False, filestart=0, seekstart=0, seekend=0, checksumtype=["md5", "md5", "md5", "md5", "md5"], skipchecksum=False, extradata=[], jsondata={}, formatspecs=__file_format_multi_dict__, insaltkey=None, outsaltkey=None, seektoend=False, verbose=False, returnfp=False, durability=None):
     if not isinstance(infiles, list):
         infiles = [infiles]
     returnout = False
     for infileslist in infiles:
-        returnout = RePackArchiveFile(infileslist, outfile, fmttype, compression, compresswholefile, compressionlevel, compressionuselist, followlink, filestart, seekstart, seekend, checksumtype, skipchecksum, extradata, jsondata, formatspecs, insaltkey, outsaltkey, seektoend, verbose, True)
+        returnout = RePackArchiveFile(infileslist, outfile, fmttype, compression, compresswholefile, compressionlevel, compressionuselist, followlink, filestart, seekstart, seekend, checksumtype, skipchecksum, extradata, jsondata, formatspecs, insaltkey, outsaltkey, seektoend, verbose, True, durability)
         if(not returnout):
             break
         else:
@@ -9893,265 +13185,293 @@ def PackArchiveFileFromListDir(infiles, outfile, dirlistfromtxt=False, fmttype="
     return listarrayfiles
 
 
-def UnPackArchiveFile(infile, outdir=None, followlink=False, filestart=0, seekstart=0, seekend=0, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None, preservepermissions=True, preservetime=True, seektoend=False, verbose=False, returnfp=False):
+def UnPackArchiveFile(infile, outdir=None, followlink=False, filestart=0, seekstart=0, seekend=0, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None, preservepermissions=True, preservetime=True, seektoend=False, verbose=False, returnfp=False, include=None, exclude=None, durability=None):
+    namefilter = _member_name_filter(include, exclude)
     if(outdir is not None):
         outdir = RemoveWindowsPath(outdir)
+    if(infile != "-" and not isinstance(infile, dict) and not hasattr(infile, "read") and not hasattr(infile, "write") and not isinstance(infile, bytes)):
+        infile = RemoveWindowsPath(infile)
+    archivelist = []
     if(isinstance(infile, dict)):
-        listarrayfilespre = infile
+        archivelist = [infile]
+    elif(followlink):
+        # links are resolved against other entries, so the listing is read up front
+        archivelist = ArchiveFileToArray(infile, "auto", filestart, seekstart, seekend, False, True, True, skipchecksum, formatspecs, saltkey, seektoend, returnfp)
+        if(not archivelist):
+            return False
+        if(not isinstance(archivelist, list)):
+            archivelist = [archivelist]
+    if(archivelist):
+        fileentries = ((listarrayfiles, curentry) for listarrayfiles in archivelist for curentry in listarrayfiles['ffilelist'] if namefilter is None or namefilter(curentry['fname']))
     else:
-        if(infile != "-" and not hasattr(infile, "read") and not hasattr(infile, "write") and not isinstance(infile, bytes)):
-            infile = RemoveWindowsPath(infile)
-        listarrayfilespre = ArchiveFileToArray(infile, "auto", filestart, seekstart, seekend, False, True, True, skipchecksum, formatspecs, saltkey, seektoend, returnfp)
-    if(not listarrayfilespre):
-        return False
-    if(not isinstance(listarrayfilespre, list)):
-        listarrayfilespre = [listarrayfilespre]
-    fplist = []
-    if os.path.exists(outdir) and os.path.isdir(outdir):
-        pass
-    elif os.path.exists(outdir) and os.path.isdir(outdir):
+        fileentries = ((curentry['farchive'], curentry) for curentry in IterArchiveFile(infile, "auto", filestart, seekstart, seekend, False, True, skipchecksum, formatspecs, saltkey, archivelist, not returnfp, namefilter))
+    if os.path.exists(outdir) and not os.path.isdir(outdir):
         return False
-    elif not os.path.exists(outdir):
+    elif not os.path.exists(outdir) and namefilter is None:
+        # with a filter, outdir is made along with the first selected entry
         os.makedirs(outdir)
-    for listarrayfiles in listarrayfilespre:
-        lenlist = len(listarrayfiles['ffilelist'])
-        fnumfiles = int(listarrayfiles['fnumfiles'])
-        lcfi = 0
-        lcfx = int(listarrayfiles['fnumfiles'])
-        if(lenlist > listarrayfiles['fnumfiles'] or lenlist < listarrayfiles['fnumfiles']):
-            lcfx = int(lenlist)
-        else:
-            lcfx = int(listarrayfiles['fnumfiles'])
-        while(lcfi < lcfx):
-            funame = ""
+    profiler = _profiler
+    durability = _get_durability(durability)
+    for listarrayfiles, curentry in fileentries:
+        funame = ""
+        try:
+            import pwd
             try:
-                import pwd
-                try:
-                    userinfo = pwd.getpwuid(
-                        listarrayfiles['ffilelist'][lcfi]['fuid'])
-                    funame = userinfo.pw_name
-                except KeyError:
-                    funame = ""
-            except ImportError:
+                userinfo = pwd.getpwuid(
+                    curentry['fuid'])
+                funame = userinfo.pw_name
+            except KeyError:
                 funame = ""
-            fgname = ""
+        except ImportError:
+            funame = ""
+        fgname = ""
+        try:
+            import grp
             try:
-                import grp
-                try:
-                    groupinfo = grp.getgrgid(
-                        listarrayfiles['ffilelist'][lcfi]['fgid'])
-                    fgname = groupinfo.gr_name
-                except KeyError:
-                    fgname = ""
-            except ImportError:
+                groupinfo = grp.getgrgid(
+                    curentry['fgid'])
+                fgname = groupinfo.gr_name
+            except KeyError:
                 fgname = ""
-            if(verbose):
-                VerbosePrintOut(PrependPath(
-                    outdir, listarrayfiles['ffilelist'][lcfi]['fname']))
-            if(listarrayfiles['ffilelist'][lcfi]['ftype'] == 0 or listarrayfiles['ffilelist'][lcfi]['ftype'] == 7):
-                with open(PrependPath(outdir, listarrayfiles['ffilelist'][lcfi]['fname']), "wb") as fpc:
-                    if(not listarrayfiles['ffilelist'][lcfi]['fcontentasfile']):
-                        listarrayfiles['ffilelist'][lcfi]['fcontents'] = MkTempFile(
-                            listarrayfiles['ffilelist'][lcfi]['fcontents'])
-                    listarrayfiles['ffilelist'][lcfi]['fcontents'].seek(0, 0)
-                    shutil.copyfileobj(
-                        listarrayfiles['ffilelist'][lcfi]['fcontents'], fpc, length=__filebuff_size__)
-                    try:
-                        fpc.flush()
-                        if(hasattr(os, "sync")):
-                            os.fsync(fpc.fileno())
-                    except (io.UnsupportedOperation, AttributeError, OSError):
-                        pass
-                if(hasattr(os, "chown") and funame == listarrayfiles['ffilelist'][lcfi]['funame'] and fgname == listarrayfiles['ffilelist'][lcfi]['fgname'] and preservepermissions):
-                    os.chown(PrependPath(outdir, listarrayfiles['ffilelist'][lcfi]['fname']),
-                             listarrayfiles['ffilelist'][lcfi]['fuid'], listarrayfiles['ffilelist'][lcfi]['fgid'])
-                if(preservepermissions):
-                    os.chmod(PrependPath(
-                        outdir, listarrayfiles['ffilelist'][lcfi]['fname']), listarrayfiles['ffilelist'][lcfi]['fchmode'])
-                if(preservetime):
-                    os.utime(PrependPath(outdir, listarrayfiles['ffilelist'][lcfi]['fname']), (
-                        listarrayfiles['ffilelist'][lcfi]['fatime'], listarrayfiles['ffilelist'][lcfi]['fmtime']))
-            elif(listarrayfiles['ffilelist'][lcfi]['ftype'] == 1):
-                if(followlink):
-                    getflinkpath = listarrayfiles['ffilelist'][lcfi]['flinkname']
-                    flinkid = prelistarrayfiles['filetoid'][getflinkpath]
-                    flinkinfo = listarrayfiles['ffilelist'][flinkid]
-                    funame = ""
+        except ImportError:
+            fgname = ""
+        if(verbose):
+            VerbosePrintOut(PrependPath(
+                outdir, curentry['fname']))
+        if(namefilter is not None):
+            # selected members may live below directories that were skipped
+            fparentdir = os.path.dirname(PrependPath(outdir, curentry['fname']))
+            if(fparentdir and not os.path.isdir(fparentdir)):
+                os.makedirs(fparentdir)
+        if(curentry['ftype'] == 0 or curentry['ftype'] == 7):
+            if(profiler is not None):
+                start_real = time.perf_counter()
+            with open(PrependPath(outdir, curentry['fname']), "wb") as fpc:
+                # entries from IterArchiveFile open a new reader on every
+                # 'fcontents' lookup, so fetch it once
+                fcontents = curentry['fcontents']
+                if(not curentry['fcontentasfile']):
+                    fcontents = curentry['fcontents'] = MkTempFile(fcontents)
+                fcontents.seek(0, 0)
+                if(profiler is not None):
+                    pstart = time.perf_counter()
+                shutil.copyfileobj(
+                    fcontents, fpc, length=__filebuff_size__)
+                if(profiler is not None):
+                    profiler.add('copy', time.perf_counter() - pstart, fpc.tell())
+                durability.extracted(fpc)
+            if(hasattr(os, "chown") and funame == curentry['funame'] and fgname == curentry['fgname'] and preservepermissions):
+                os.chown(PrependPath(outdir, curentry['fname']),
+                         curentry['fuid'], curentry['fgid'])
+            if(preservepermissions):
+                os.chmod(PrependPath(
+                    outdir, curentry['fname']), curentry['fchmode'])
+            if(preservetime):
+                os.utime(PrependPath(outdir, curentry['fname']), (
+                    curentry['fatime'], curentry['fmtime']))
+            if(profiler is not None):
+                profiler.entry('unpack', curentry['fname'], time.perf_counter() - start_real, curentry['fsize'])
+        elif(curentry['ftype'] == 1):
+            if(followlink):
+                getflinkpath = curentry['flinkname']
+                if('filetoid' not in listarrayfiles):
+                    listarrayfiles['filetoid'] = dict((linkentry['fname'], linkid) for linkid, linkentry in enumerate(listarrayfiles['ffilelist']))
+                flinkid = listarrayfiles['filetoid'][getflinkpath]
+                flinkinfo = listarrayfiles['ffilelist'][flinkid]
+                funame = ""
+                try:
+                    import pwd
                     try:
-                        import pwd
-                        try:
-                            userinfo = pwd.getpwuid(flinkinfo['fuid'])
-                            funame = userinfo.pw_name
-                        except KeyError:
-                            funame = ""
-                    except ImportError:
+                        userinfo = pwd.getpwuid(flinkinfo['fuid'])
+                        funame = userinfo.pw_name
+                    except KeyError:
                         funame = ""
-                    fgname = ""
+                except ImportError:
+                    funame = ""
+                fgname = ""
+                try:
+                    import grp
                     try:
-                        import grp
-                        try:
-                            groupinfo = grp.getgrgid(flinkinfo['fgid'])
-                            fgname = groupinfo.gr_name
-                        except KeyError:
-                            fgname = ""
-                    except ImportError:
+                        groupinfo = grp.getgrgid(flinkinfo['fgid'])
+                        fgname = groupinfo.gr_name
+                    except KeyError:
                         fgname = ""
-                    if(flinkinfo['ftype'] == 0 or flinkinfo['ftype'] == 7):
-                        with open(PrependPath(outdir, listarrayfiles['ffilelist'][lcfi]['fname']), "wb") as fpc:
-                            if(not flinkinfo['fcontentasfile']):
-                                flinkinfo['fcontents'] = MkTempFile(
-                                    flinkinfo['fcontents'])
-                            flinkinfo['fcontents'].seek(0, 0)
-                            shutil.copyfileobj(flinkinfo['fcontents'], fpc, length=__filebuff_size__)
-                            try:
-                                fpc.flush()
-                                if(hasattr(os, "sync")):
-                                    os.fsync(fpc.fileno())
-                            except (io.UnsupportedOperation, AttributeError, OSError):
-                                pass
-                        if(hasattr(os, "chown") and funame == flinkinfo['funame'] and fgname == flinkinfo['fgname'] and preservepermissions):
-                            os.chown(PrependPath(
-                                outdir, listarrayfiles['ffilelist'][lcfi]['fname']), flinkinfo['fuid'], flinkinfo['fgid'])
-                        if(preservepermissions):
-                            os.chmod(PrependPath(
-                                outdir, listarrayfiles['ffilelist'][lcfi]['fname']), flinkinfo['fchmode'])
-                        if(preservetime):
-                            os.utime(PrependPath(outdir, listarrayfiles['ffilelist'][lcfi]['fname']), (
-                                flinkinfo['fatime'], flinkinfo['fmtime']))
-                    if(flinkinfo['ftype'] == 1):
-                        os.link(flinkinfo['flinkname'], PrependPath(
-                            outdir, listarrayfiles['ffilelist'][lcfi]['fname']))
-                    if(flinkinfo['ftype'] == 2):
-                        os.symlink(flinkinfo['flinkname'], PrependPath(
-                            outdir, listarrayfiles['ffilelist'][lcfi]['fname']))
-                    if(flinkinfo['ftype'] == 5):
-                        if(preservepermissions):
-                            os.mkdir(PrependPath(
-                                outdir, listarrayfiles['ffilelist'][lcfi]['fname']), flinkinfo['fchmode'])
-                        else:
-                            os.mkdir(PrependPath(
-                                outdir, listarrayfiles['ffilelist'][lcfi]['fname']))
-                        if(hasattr(os, "chown") and funame == flinkinfo['funame'] and fgname == flinkinfo['fgname'] and preservepermissions):
-                            os.chown(PrependPath(
-                                outdir, listarrayfiles['ffilelist'][lcfi]['fname']), flinkinfo['fuid'], flinkinfo['fgid'])
-                        if(preservepermissions):
-                            os.chmod(PrependPath(
-                                outdir, listarrayfiles['ffilelist'][lcfi]['fname']), flinkinfo['fchmode'])
-                        if(preservetime):
-                            os.utime(PrependPath(outdir, listarrayfiles['ffilelist'][lcfi]['fname']), (
-                                flinkinfo['fatime'], flinkinfo['fmtime']))
-                    if(flinkinfo['ftype'] == 6 and hasattr(os, "mkfifo")):
-                        os.mkfifo(PrependPath(
-                            outdir, listarrayfiles['ffilelist'][lcfi]['fname']), flinkinfo['fchmode'])
-                else:
-                    os.link(listarrayfiles['ffilelist'][lcfi]['flinkname'], PrependPath(
-                        outdir, listarrayfiles['ffilelist'][lcfi]['fname']))
-            elif(listarrayfiles['ffilelist'][lcfi]['ftype'] == 2):
-                if(followlink):
-                    getflinkpath = listarrayfiles['ffilelist'][lcfi]['flinkname']
-                    flinkid = prelistarrayfiles['filetoid'][getflinkpath]
-                    flinkinfo = listarrayfiles['ffilelist'][flinkid]
-                    funame = ""
+                except ImportError:
+                    fgname = ""
+                if(flinkinfo['ftype'] == 0 or flinkinfo['ftype'] == 7):
+                    with open(PrependPath(outdir, curentry['fname']), "wb") as fpc:
+                        if(not flinkinfo['fcontentasfile']):
+                            flinkinfo['fcontents'] = MkTempFile(
+                                flinkinfo['fcontents'])
+                        flinkinfo['fcontents'].seek(0, 0)
+                        shutil.copyfileobj(flinkinfo['fcontents'], fpc, length=__filebuff_size__)
+                        durability.extracted(fpc)
+                    if(hasattr(os, "chown") and funame == flinkinfo['funame'] and fgname == flinkinfo['fgname'] and preservepermissions):
+                        os.chown(PrependPath(
+                            outdir, curentry['fname']), flinkinfo['fuid'], flinkinfo['fgid'])
+                    if(preservepermissions):
+                        os.chmod(PrependPath(
+                            outdir, curentry['fname']), flinkinfo['fchmode'])
+                    if(preservetime):
+                        os.utime(PrependPath(outdir, curentry['fname']), (
+                            flinkinfo['fatime'], flinkinfo['fmtime']))
+                if(flinkinfo['ftype'] == 1):
+                    os.link(flinkinfo['flinkname'], PrependPath(
+                        outdir, curentry['fname']))
+                if(flinkinfo['ftype'] == 2):
+                    os.symlink(flinkinfo['flinkname'], PrependPath(
+                        outdir, curentry['fname']))
+                if(flinkinfo['ftype'] == 5):
+                    if(preservepermissions):
+                        os.mkdir(PrependPath(
+                            outdir, curentry['fname']), flinkinfo['fchmode'])
+                    else:
+                        os.mkdir(PrependPath(
+                            outdir, curentry['fname']))
+                    if(hasattr(os, "chown") and funame == flinkinfo['funame'] and fgname == flinkinfo['fgname'] and preservepermissions):
+                        os.chown(PrependPath(
+                            outdir, curentry['fname']), flinkinfo['fuid'], flinkinfo['fgid'])
+                    if(preservepermissions):
+                        os.chmod(PrependPath(
+                            outdir, curentry['fname']), flinkinfo['fchmode'])
+                    if(preservetime):
+                        os.utime(PrependPath(outdir, curentry['fname']), (
+                            flinkinfo['fatime'], flinkinfo['fmtime']))
+                if(flinkinfo['ftype'] == 6 and hasattr(os, "mkfifo")):
+                    os.mkfifo(PrependPath(
+                        outdir, curentry['fname']), flinkinfo['fchmode'])
+            else:
+                os.link(curentry['flinkname'], PrependPath(
+                    outdir, curentry['fname']))
+                durability.track(PrependPath(outdir, curentry['fname']), 1)
+        elif(curentry['ftype'] == 2):
+            if(followlink):
+                getflinkpath = curentry['flinkname']
+                if('filetoid' not in listarrayfiles):
+                    listarrayfiles['filetoid'] = dict((linkentry['fname'], linkid) for linkid, linkentry in enumerate(listarrayfiles['ffilelist']))
+                flinkid = listarrayfiles['filetoid'][getflinkpath]
+                flinkinfo = listarrayfiles['ffilelist'][flinkid]
+                funame = ""
+                try:
+                    import pwd
                     try:
-                        import pwd
-                        try:
-                            userinfo = pwd.getpwuid(flinkinfo['fuid'])
-                            funame = userinfo.pw_name
-                        except KeyError:
-                            funame = ""
-                    except ImportError:
+                        userinfo = pwd.getpwuid(flinkinfo['fuid'])
+                        funame = userinfo.pw_name
+                    except KeyError:
                         funame = ""
-                    fgname = ""
+                except ImportError:
+                    funame = ""
+                fgname = ""
+                try:
+                    import grp
                     try:
-                        import grp
-                        try:
-                            groupinfo = grp.getgrgid(flinkinfo['fgid'])
-                            fgname = groupinfo.gr_name
-                        except KeyError:
-                            fgname = ""
-                    except ImportError:
+                        groupinfo = grp.getgrgid(flinkinfo['fgid'])
+                        fgname = groupinfo.gr_name
+                    except KeyError:
                         fgname = ""
-                    if(flinkinfo['ftype'] == 0 or flinkinfo['ftype'] == 7):
-                        with open(PrependPath(outdir, listarrayfiles['ffilelist'][lcfi]['fname']), "wb") as fpc:
-                            if(not flinkinfo['fcontentasfile']):
-                                flinkinfo['fcontents'] = MkTempFile(
-                                    flinkinfo['fcontents'])
-                            flinkinfo['fcontents'].seek(0, 0)
-                            shutil.copyfileobj(flinkinfo['fcontents'], fpc, length=__filebuff_size__)
-                            try:
-                                fpc.flush()
-                                if(hasattr(os, "sync")):
-                                    os.fsync(fpc.fileno())
-                            except (io.UnsupportedOperation, AttributeError, OSError):
-                                pass
-                        if(hasattr(os, "chown") and funame == flinkinfo['funame'] and fgname == flinkinfo['fgname'] and preservepermissions):
-                            os.chown(PrependPath(
-                                outdir, listarrayfiles['ffilelist'][lcfi]['fname']), flinkinfo['fuid'], flinkinfo['fgid'])
-                        if(preservepermissions):
-                            os.chmod(PrependPath(
-                                outdir, listarrayfiles['ffilelist'][lcfi]['fname']), flinkinfo['fchmode'])
-                        if(preservetime):
-                            os.utime(PrependPath(outdir, listarrayfiles['ffilelist'][lcfi]['fname']), (
-                                flinkinfo['fatime'], flinkinfo['fmtime']))
-                    if(flinkinfo['ftype'] == 1):
-                        os.link(flinkinfo['flinkname'], PrependPath(
-                            outdir, listarrayfiles['ffilelist'][lcfi]['fname']))
-                    if(flinkinfo['ftype'] == 2):
-                        os.symlink(flinkinfo['flinkname'], PrependPath(
-                            outdir, listarrayfiles['ffilelist'][lcfi]['fname']))
-                    if(flinkinfo['ftype'] == 5):
-                        if(preservepermissions):
-                            os.mkdir(PrependPath(
-                                outdir, listarrayfiles['ffilelist'][lcfi]['fname']), flinkinfo['fchmode'])
-                        else:
-                            os.mkdir(PrependPath(
-                                outdir, listarrayfiles['ffilelist'][lcfi]['fname']))
-                        if(hasattr(os, "chown") and funame == flinkinfo['funame'] and fgname == flinkinfo['fgname'] and preservepermissions):
-                            os.chown(PrependPath(
-                                outdir, listarrayfiles['ffilelist'][lcfi]['fname']), flinkinfo['fuid'], flinkinfo['fgid'])
-                        if(preservepermissions):
-                            os.chmod(PrependPath(
-                                outdir, listarrayfiles['ffilelist'][lcfi]['fname']), flinkinfo['fchmode'])
-                        if(preservetime):
-                            os.utime(PrependPath(outdir, listarrayfiles['ffilelist'][lcfi]['fname']), (
-                                flinkinfo['fatime'], flinkinfo['fmtime']))
-                    if(flinkinfo['ftype'] == 6 and hasattr(os, "mkfifo")):
-                        os.mkfifo(PrependPath(
-                            outdir, listarrayfiles['ffilelist'][lcfi]['fname']), flinkinfo['fchmode'])
-                else:
-                    os.symlink(listarrayfiles['ffilelist'][lcfi]['flinkname'], PrependPath(
-                        outdir, listarrayfiles['ffilelist'][lcfi]['fname']))
-            elif(listarrayfiles['ffilelist'][lcfi]['ftype'] == 5):
-                if(preservepermissions):
-                    os.mkdir(PrependPath(
-                        outdir, listarrayfiles['ffilelist'][lcfi]['fname']), listarrayfiles['ffilelist'][lcfi]['fchmode'])
-                else:
-                    os.mkdir(PrependPath(
-                        outdir, listarrayfiles['ffilelist'][lcfi]['fname']))
-                if(hasattr(os, "chown") and funame == listarrayfiles['ffilelist'][lcfi]['funame'] and fgname == listarrayfiles['ffilelist'][lcfi]['fgname'] and preservepermissions):
-                    os.chown(PrependPath(outdir, listarrayfiles['ffilelist'][lcfi]['fname']),
-                             listarrayfiles['ffilelist'][lcfi]['fuid'], listarrayfiles['ffilelist'][lcfi]['fgid'])
-                if(preservepermissions):
-                    os.chmod(PrependPath(
-                        outdir, listarrayfiles['ffilelist'][lcfi]['fname']), listarrayfiles['ffilelist'][lcfi]['fchmode'])
-                if(preservetime):
-                    os.utime(PrependPath(outdir, listarrayfiles['ffilelist'][lcfi]['fname']), (
-                        listarrayfiles['ffilelist'][lcfi]['fatime'], listarrayfiles['ffilelist'][lcfi]['fmtime']))
-            elif(listarrayfiles['ffilelist'][lcfi]['ftype'] == 6 and hasattr(os, "mkfifo")):
-                os.mkfifo(PrependPath(
-                    outdir, listarrayfiles['ffilelist'][lcfi]['fname']), listarrayfiles['ffilelist'][lcfi]['fchmode'])
-            elif((listarrayfiles['ffilelist'][lcfi]['ftype'] == 3 or listarrayfiles['ffilelist'][lcfi]['ftype'] == 4) and hasattr(os, "makedev") and hasattr(os, "mknod")):
-                outdev = os.makedev(listarrayfiles['ffilelist'][lcfi]['frdev_major'], listarrayfiles['ffilelist'][lcfi]['frdev_minor'])
-                os.mknod(PrependPath(
-                    outdir, listarrayfiles['ffilelist'][lcfi]['fname']), listarrayfiles['ffilelist'][lcfi]['fchmode'], outdev)
-            lcfi = lcfi + 1
-        if(returnfp):
-            fplist.append(listarrayfiles['fp'])
+                except ImportError:
+                    fgname = ""
+                if(flinkinfo['ftype'] == 0 or flinkinfo['ftype'] == 7):
+                    with open(PrependPath(outdir, curentry['fname']), "wb") as fpc:
+                        if(not flinkinfo['fcontentasfile']):
+                            flinkinfo['fcontents'] = MkTempFile(
+                                flinkinfo['fcontents'])
+                        flinkinfo['fcontents'].seek(0, 0)
+                        shutil.copyfileobj(flinkinfo['fcontents'], fpc, length=__filebuff_size__)
+                        durability.extracted(fpc)
+                    if(hasattr(os, "chown") and funame == flinkinfo['funame'] and fgname == flinkinfo['fgname'] and preservepermissions):
+                        os.chown(PrependPath(
+                            outdir, curentry['fname']), flinkinfo['fuid'], flinkinfo['fgid'])
+                    if(preservepermissions):
+                        os.chmod(PrependPath(
+                            outdir, curentry['fname']), flinkinfo['fchmode'])
+                    if(preservetime):
+                        os.utime(PrependPath(outdir, curentry['fname']), (
+                            flinkinfo['fatime'], flinkinfo['fmtime']))
+                if(flinkinfo['ftype'] == 1):
+                    os.link(flinkinfo['flinkname'], PrependPath(
+                        outdir, curentry['fname']))
+                if(flinkinfo['ftype'] == 2):
+                    os.symlink(flinkinfo['flinkname'], PrependPath(
+                        outdir, curentry['fname']))
+                if(flinkinfo['ftype'] == 5):
+                    if(preservepermissions):
+                        os.mkdir(PrependPath(
+                            outdir, curentry['fname']), flinkinfo['fchmode'])
+                    else:
+                        os.mkdir(PrependPath(
+                            outdir, curentry['fname']))
+                    if(hasattr(os, "chown") and funame == flinkinfo['funame'] and fgname == flinkinfo['fgname'] and preservepermissions):
+                        os.chown(PrependPath(
+                            outdir, curentry['fname']), flinkinfo['fuid'], flinkinfo['fgid'])
+                    if(preservepermissions):
+                        os.chmod(PrependPath(
+                            outdir, curentry['fname']), flinkinfo['fchmode'])
+                    if(preservetime):
+                        os.utime(PrependPath(outdir, curentry['fname']), (
+                            flinkinfo['fatime'], flinkinfo['fmtime']))
+                if(flinkinfo['ftype'] == 6 and hasattr(os, "mkfifo")):
+                    os.mkfifo(PrependPath(
+                        outdir, curentry['fname']), flinkinfo['fchmode'])
+            else:
+                os.symlink(curentry['flinkname'], PrependPath(
+                    outdir, curentry['fname']))
+                durability.track(PrependPath(outdir, curentry['fname']), 2)
+        elif(curentry['ftype'] == 5):
+            if(os.path.isdir(PrependPath(outdir, curentry['fname']))):
+                # already made as the parent of an earlier entry; the
+                # owner, mode and times below are still applied
+                pass
+            elif(preservepermissions):
+                os.mkdir(PrependPath(
+                    outdir, curentry['fname']), curentry['fchmode'])
+            else:
+                os.mkdir(PrependPath(
+                    outdir, curentry['fname']))
+            if(hasattr(os, "chown") and funame == curentry['funame'] and fgname == curentry['fgname'] and preservepermissions):
+                os.chown(PrependPath(outdir, curentry['fname']),
+                         curentry['fuid'], curentry['fgid'])
+            if(preservepermissions):
+                os.chmod(PrependPath(
+                    outdir, curentry['fname']), curentry['fchmode'])
+            if(preservetime):
+                os.utime(PrependPath(outdir, curentry['fname']), (
+                    curentry['fatime'], curentry['fmtime']))
+            durability.track(PrependPath(outdir, curentry['fname']), 5)
+        elif(curentry['ftype'] == 6 and hasattr(os, "mkfifo")):
+            os.mkfifo(PrependPath(
+                outdir, curentry['fname']), curentry['fchmode'])
+            durability.track(PrependPath(outdir, curentry['fname']), 6)
+        elif((curentry['ftype'] == 3 or curentry['ftype'] == 4) and hasattr(os, "makedev") and hasattr(os, "mknod")):
+            outdev = os.makedev(curentry['frdev_major'], curentry['frdev_minor'])
+            os.mknod(PrependPath(
+                outdir, curentry['fname']), curentry['fchmode'], outdev)
+            durability.track(PrependPath(outdir, curentry['fname']), curentry['ftype'])
+    durability.sync_tracked()
+    if(not archivelist):
+        return False
     if(returnfp):
-        return fplist
+        return [listarrayfiles['fp'] for listarrayfiles in archivelist]
     else:
         return True
 
+
+def ExtractMember(infile, name_or_pattern, outdir, followlink=False, filestart=0, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None, preservepermissions=True, preservetime=True, verbose=False):
+    """Extract the entries matching a name, pattern or list of patterns.
+
+    Returns False when nothing in the archive matched.
+    """
+    namefilter = _member_name_filter(name_or_pattern)
+    matchednames = []
+    def _record_match(fname):
+        if(not namefilter(fname)):
+            return False
+        matchednames.append(fname)
+        return True
+    if(not UnPackArchiveFile(infile, outdir, followlink, filestart, 0, 0, skipchecksum, formatspecs, saltkey, preservepermissions, preservetime, False, verbose, False, _record_match)):
+        return False
+    return len(matchednames) > 0
+
 def ftype_to_str(ftype):
     mapping = {
         0: "file",   # file
@@ -10199,73 +13519,67 @@ def calc_compression(fsize, fcsize, fmt="ratio"):
     return f"{ratio:.2f}:1 ({savings:.1f}%)"
 
 def ArchiveFileListFiles(infile, fmttype="auto", filestart=0, seekstart=0, seekend=0, skipchecksum=False, formatspecs=__file_format_multi_dict__, saltkey=None, seektoend=False, verbose=False, newstyle=False, returnfp=False):
+    archivelist = []
     if(isinstance(infile, dict)):
-        listarrayfileslist = [infile]
-    if(isinstance(infile, list)):
-        listarrayfileslist = infile
+        archivelist = [infile]
+        fileentries = (curentry for listarrayfiles in archivelist for curentry in listarrayfiles['ffilelist'])
+    elif(isinstance(infile, list)):
+        archivelist = infile
+        fileentries = (curentry for listarrayfiles in archivelist for curentry in listarrayfiles['ffilelist'])
     else:
         if(infile != "-" and not hasattr(infile, "read") and not hasattr(infile, "write") and not isinstance(infile, bytes)):
             infile = RemoveWindowsPath(infile)
-        listarrayfileslist = ArchiveFileToArray(infile, fmttype, filestart, seekstart, seekend, True, False, False, skipchecksum, formatspecs, saltkey, seektoend, returnfp)
-    if(not listarrayfileslist):
-        return False
-    for listarrayfiles in listarrayfileslist:
-        lenlist = len(listarrayfiles['ffilelist'])
-        fnumfiles = int(listarrayfiles['fnumfiles'])
-        lcfi = 0
-        lcfx = int(listarrayfiles['fnumfiles'])
-        if(lenlist > listarrayfiles['fnumfiles'] or lenlist < listarrayfiles['fnumfiles']):
-            lcfx = int(lenlist)
+        if(_list_cache is not None and not returnfp and isinstance(infile, str) and infile != "-"):
+            # go through ArchiveFileToArray so the listing cache is used
+            archivelist = ArchiveFileToArray(infile, fmttype, filestart, seekstart, seekend, True, True, False, skipchecksum, formatspecs, saltkey, seektoend) or []
+            fileentries = (curentry for listarrayfiles in archivelist for curentry in listarrayfiles['ffilelist'])
         else:
-            lcfx = int(listarrayfiles['fnumfiles'])
-        returnval = {}
-        while(lcfi < lcfx):
-            returnval.update({lcfi: listarrayfiles['ffilelist'][lcfi]['fname']})
-            if(not verbose):
-                VerbosePrintOut(listarrayfiles['ffilelist'][lcfi]['fname'])
-            if(verbose):
-                permissions = {'access': {'0': ('---'), '1': ('--x'), '2': ('-w-'), '3': ('-wx'), '4': (
-                    'r--'), '5': ('r-x'), '6': ('rw-'), '7': ('rwx')}, 'roles': {0: 'owner', 1: 'group', 2: 'other'}}
-                printfname = listarrayfiles['ffilelist'][lcfi]['fname']
-                if(listarrayfiles['ffilelist'][lcfi]['ftype'] == 1):
-                    printfname = listarrayfiles['ffilelist'][lcfi]['fname'] + \
-                        " link to " + listarrayfiles['ffilelist'][lcfi]['flinkname']
-                if(listarrayfiles['ffilelist'][lcfi]['ftype'] == 2):
-                    printfname = listarrayfiles['ffilelist'][lcfi]['fname'] + \
-                        " -> " + listarrayfiles['ffilelist'][lcfi]['flinkname']
-                fuprint = listarrayfiles['ffilelist'][lcfi]['funame']
-                if(len(fuprint) <= 0):
-                    fuprint = listarrayfiles['ffilelist'][lcfi]['fuid']
-                fgprint = listarrayfiles['ffilelist'][lcfi]['fgname']
-                if(len(fgprint) <= 0):
-                    fgprint = listarrayfiles['ffilelist'][lcfi]['fgid']
-                if(newstyle):
-                    compressiontype = listarrayfiles['ffilelist'][lcfi]['fcompression']
-                    if(compressiontype == ""):
+            fileentries = IterArchiveFile(infile, fmttype, filestart, seekstart, seekend, True, False, skipchecksum, formatspecs, saltkey, archivelist, not returnfp)
+    for curentry in fileentries:
+        if(not verbose):
+            VerbosePrintOut(curentry['fname'])
+        if(verbose):
+            printfname = curentry['fname']
+            if(curentry['ftype'] == 1):
+                printfname = curentry['fname'] + \
+                    " link to " + curentry['flinkname']
+            if(curentry['ftype'] == 2):
+                printfname = curentry['fname'] + \
+                    " -> " + curentry['flinkname']
+            fuprint = curentry['funame']
+            if(len(fuprint) <= 0):
+                fuprint = curentry['fuid']
+            fgprint = curentry['fgname']
+            if(len(fgprint) <= 0):
+                fgprint = curentry['fgid']
+            if(newstyle):
+                compressiontype = curentry['fcompression']
+                if(compressiontype == ""):
+                    compratio = ""
+                    compressprint = " "
+                    compressiontype = "none"
+                else:
+                    compratio = calc_compression(curentry['fsize'], curentry['fcsize'], "percent")
+                    if(compratio=="-"):
                         compratio = ""
+                        compressiontype = "none"
+                    else:
+                        compratio = str(""+compratio)
+                    if(curentry['fcsize']==0):
                         compressprint = " "
                         compressiontype = "none"
                     else:
-                        compratio = calc_compression(listarrayfiles['ffilelist'][lcfi]['fsize'], listarrayfiles['ffilelist'][lcfi]['fcsize'], "percent")
-                        if(compratio=="-"):
-                            compratio = ""
-                            compressiontype = "none"
-                        else:
-                            compratio = str(""+compratio)
-                        if(listarrayfiles['ffilelist'][lcfi]['fcsize']==0):
-                            compressprint = " "
-                            compressiontype = "none"
-                        else:
-                            compressprint = str(listarrayfiles['ffilelist'][lcfi]['fcsize']) + " "
-                    VerbosePrintOut(ftype_to_str(listarrayfiles['ffilelist'][lcfi]['ftype']).rjust(5) + " " + compressiontype.rjust(5) + " " + compratio.rjust(5) + " " + str(
-                    listarrayfiles['ffilelist'][lcfi]['fsize']).rjust(15) + " " + compressprint.rjust(15) + printfname)
-                else:
-                    dt = datetime.datetime.fromtimestamp(listarrayfiles['ffilelist'][lcfi]['fmtime'])
-                    VerbosePrintOut(PrintPermissionString(listarrayfiles['ffilelist'][lcfi]['fmode'], listarrayfiles['ffilelist'][lcfi]['ftype']) + " " + str(fuprint) + "/" + str(fgprint) + " " + str(
-                    listarrayfiles['ffilelist'][lcfi]['fsize']).rjust(15) + " " + dt.strftime('%Y-%m-%d %H:%M') + " " + printfname)
-            lcfi = lcfi + 1
+                        compressprint = str(curentry['fcsize']) + " "
+                VerbosePrintOut(ftype_to_str(curentry['ftype']).rjust(5) + " " + compressiontype.rjust(5) + " " + compratio.rjust(5) + " " + str(
+                curentry['fsize']).rjust(15) + " " + compressprint.rjust(15) + printfname)
+            else:
+                dt = datetime.datetime.fromtimestamp(curentry['fmtime'])
+                VerbosePrintOut(PrintPermissionString(curentry['fmode'], curentry['ftype']) + " " + str(fuprint) + "/" + str(fgprint) + " " + str(
+                curentry['fsize']).rjust(15) + " " + dt.strftime('%Y-%m-%d %H:%M') + " " + printfname)
+    if(not archivelist):
+        return False
     if(returnfp):
-        return listarrayfiles['fp']
+        return archivelist[-1]['fp']
     else:
         return True
 
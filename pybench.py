@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+
+'''
+    This program is free software; you can redistribute it and/or modify
+    it under the terms of the Revised BSD License.
+
+    This program is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    Revised BSD License for more details.
+
+    Copyright 2018-2026 Cool Dude 2k - http://idb.berlios.de/
+    Copyright 2018-2026 Game Maker 2k - http://intdb.sourceforge.net/
+    Copyright 2018-2026 Kazuki Przyborowski - https://github.com/KazukiPrzyborowski
+
+    $FileInfo: pybench.py - Last Update: 3/14/2026 Ver. 0.30.14 RC 1 - Author: cooldude2k $
+'''
+
+from __future__ import absolute_import, division, print_function, unicode_literals, generators, with_statement, nested_scopes
+import os
+import re
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import pyarchivefile
+
+
+def legacy_read_header_by_size(fp, delimiter="\x00", encoding="utf-8", errors="strict"):
+    # Byte-at-a-time size prefix reader used before the read-ahead parser
+    delimiter_b = delimiter.encode(encoding)
+    numhex_bytes = bytearray()
+    while True:
+        b = fp.read(1)
+        if not b:
+            break
+        c = b[0]
+        if 32 <= c <= 126:
+            numhex_bytes.append(c)
+            continue
+        fp.seek(-1, 1)
+        break
+    numhex = numhex_bytes.decode(encoding, errors)
+    numdec = int(numhex, 16)
+    got = fp.read(len(delimiter_b))
+    if got != delimiter_b:
+        raise ValueError("Delimiter mismatch: expected %r, got %r" % (delimiter_b, got))
+    headerdatasplit = fp.read(numdec).decode(encoding, errors).split(delimiter)
+    headerdatasplit.insert(0, numhex)
+    return headerdatasplit
+
+
+def legacy_seek_by_directive(fp, seekdirective):
+    if(re.findall("^\\+([0-9]+)", seekdirective)):
+        fp.seek(int(seekdirective.replace("+", "")), 1)
+    elif(re.findall("^\\-([0-9]+)", seekdirective)):
+        fp.seek(int(seekdirective), 1)
+    elif(re.findall("^([0-9]+)", seekdirective)):
+        fp.seek(int(seekdirective), 0)
+    else:
+        return False
+    return True
+
+
+def legacy_walk_headers(fp, archiveheader, formatspecs):
+    delimiter = formatspecs['format_delimiter']
+    fp.seek(archiveheader['ffirstentry'], 0)
+    headerlist = []
+    for _ in range(archiveheader['fnumfiles']):
+        HeaderOut = legacy_read_header_by_size(fp, delimiter)
+        headerints = [int(HeaderOut[i], 16) for i in (0, 1, 2, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 18, 19, 21, 23, 24, 25, 26, 27, 28, 29, 30, 31, 36, 37, 40, 41)]
+        legacy_seek_by_directive(fp, HeaderOut[32])
+        fp.seek(int(HeaderOut[37], 16), 1)
+        legacy_seek_by_directive(fp, HeaderOut[33])
+        if(HeaderOut[17] == "none" or HeaderOut[17] == "" or HeaderOut[17] == "auto"):
+            fp.seek(int(HeaderOut[7], 16), 1)
+        else:
+            fp.seek(int(HeaderOut[18], 16), 1)
+        legacy_seek_by_directive(fp, HeaderOut[34])
+        headerlist.append(headerints)
+    return headerlist
+
+
+def array_walk_headers(fp, archiveheader, formatspecs):
+    fp.seek(archiveheader['ffirstentry'], 0)
+    headerlist = []
+    for _ in range(archiveheader['fnumfiles']):
+        headerlist.append(pyarchivefile.ReadFileHeaderDataWithContentToArray(fp, True, True, False, True, formatspecs))
+    return headerlist
+
+
+def fast_walk_headers(fp, archiveheader, formatspecs):
+    fp.seek(archiveheader['ffirstentry'], 0)
+    headerlist = []
+    for _ in range(archiveheader['fnumfiles']):
+        headerlist.append(pyarchivefile.ReadFileHeaderDataToEntry(fp, False, True, formatspecs))
+    return headerlist
+
+
+DURABILITY_MODES = ("none", "end", "every_n_entries:1000", "every_n_bytes:16M", "full")
+
+
+def make_tree(tmpdir, numfiles):
+    srcdir = os.path.join(tmpdir, "src")
+    os.makedirs(srcdir)
+    for i in range(numfiles):
+        with open(os.path.join(srcdir, "file%06d.txt" % i), "wb") as fp:
+            fp.write(("small file %d\n" % i).encode("UTF-8"))
+    return srcdir
+
+
+def make_archive(tmpdir, numfiles):
+    srcdir = make_tree(tmpdir, numfiles)
+    outfile = os.path.join(tmpdir, "bench" + pyarchivefile.__file_format_dict__['format_extension'])
+    pyarchivefile.PackArchiveFile([srcdir], outfile, compression="none", compresswholefile=False)
+    return outfile
+
+
+def run_bench(name, func, fp, archiveheader, formatspecs, rounds):
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func(fp, archiveheader, formatspecs)
+        elapsed = time.perf_counter() - start
+        if(best is None or elapsed < best):
+            best = elapsed
+    rate = archiveheader['fnumfiles'] / best
+    print("%-10s %10d headers %10.4f s %12.0f headers/sec" % (name, archiveheader['fnumfiles'], best, rate))
+    return rate
+
+
+def run_durability_bench(tmpdir, numfiles, rounds):
+    # Packing throughput under each durability mode; run it on the disk
+    # you care about (-D), a tmpfs makes every sync free
+    srcdir = make_tree(tmpdir, numfiles)
+    outfile = os.path.join(tmpdir, "durability" + pyarchivefile.__file_format_dict__['format_extension'])
+    for mode in DURABILITY_MODES:
+        best = None
+        for _ in range(rounds):
+            start = time.perf_counter()
+            pyarchivefile.PackArchiveFile([srcdir], outfile, compression="none", compresswholefile=False, durability=mode)
+            elapsed = time.perf_counter() - start
+            if(best is None or elapsed < best):
+                best = elapsed
+        print("%-22s %10d entries %10.4f s %12.0f entries/sec" % (mode, numfiles, best, numfiles / best))
+    return 0
+
+
+def main(argv=None):
+    argparser = argparse.ArgumentParser(description="Benchmark archive header parsing.")
+    argparser.add_argument("-n", "--numfiles", type=int, default=20000, help="Number of small files in the test archive.")
+    argparser.add_argument("-r", "--rounds", type=int, default=3, help="Rounds per parser; the best is reported.")
+    argparser.add_argument("-i", "--input", default=None, help="Benchmark an existing archive instead of a generated one.")
+    argparser.add_argument("-w", "--durability", action="store_true", help="Benchmark packing under each durability mode instead of header parsing.")
+    argparser.add_argument("-D", "--dir", default=None, help="Directory to create the test files in.")
+    getargs = argparser.parse_args(argv)
+    if(getargs.durability):
+        tmpdir = tempfile.mkdtemp(prefix=pyarchivefile.__program_name__, dir=getargs.dir)
+        try:
+            return run_durability_bench(tmpdir, getargs.numfiles, getargs.rounds)
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+    tmpdir = None
+    infile = getargs.input
+    if(infile is None):
+        tmpdir = tempfile.mkdtemp(prefix=pyarchivefile.__program_name__)
+        infile = make_archive(tmpdir, getargs.numfiles)
+    try:
+        formatspecs = pyarchivefile.__file_format_dict__
+        with open(infile, "rb") as fp:
+            archiveheader = pyarchivefile.ReadFileDataHeaderToArray(fp, 0, True, formatspecs)
+            formatspecs = archiveheader['fformatspecs']
+            archiveheader['ffirstentry'] = fp.tell()
+            oldrate = run_bench("legacy", legacy_walk_headers, fp, archiveheader, formatspecs, getargs.rounds)
+            arrayrate = run_bench("array", array_walk_headers, fp, archiveheader, formatspecs, getargs.rounds)
+            newrate = run_bench("readahead", fast_walk_headers, fp, archiveheader, formatspecs, getargs.rounds)
+        print("speedup    %.2fx over legacy, %.2fx over array" % (newrate / oldrate, newrate / arrayrate))
+    finally:
+        if(tmpdir is not None):
+            shutil.rmtree(tmpdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())